@@ -0,0 +1,223 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from answer_stream import AnswerStream
+
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+# Words that don't change what a question asks; negations ("not", "no", "don t") are deliberately absent
+STOPWORDS = frozenset("""a an the is are was were be been am do does did what whats when where which who how i im my
+me we our us you your to of for in on at about this that these those it its can could should would will shall
+may might please tell there s""".split())
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+def content_words(question):
+    """Words of a normalized question that carry its meaning, plurals folded ("hours" → "hour")"""
+    return frozenset(word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+                     for word in question.split() if word not in STOPWORDS)
+
+def ngram_embedding(text):
+    """Sparse, unit-length bag of content words + character trigrams (offline, deterministic)"""
+    words = sorted(content_words(text))
+    text = " ".join(words)
+    padded = f" {text} "
+    counts = Counter(words)
+    counts.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {feature: value / norm for feature, value in counts.items()}
+
+def _cosine(a, b):
+    if isinstance(a, dict):
+        if len(a) > len(b):
+            a, b = b, a
+        return sum(value * b.get(feature, 0.0) for feature, value in a.items())
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+class SemanticAnswerCache:
+    """Answers to previously seen questions, matched exactly or by embedding similarity.
+
+    Entries are keyed by the courses a question was routed to as well as its
+    text, and only match questions with the same `scope`, so the same question
+    about two courses gets two answers. Entries carry the index version they
+    were answered against and are dropped once a different version is loaded. Eviction is LRU beyond `max_entries`
+    plus a TTL. `embed` can be any text → vector callable (e.g. an embeddings
+    model's embed_query); the default is a local n-gram embedding. A semantic
+    hit also needs the same content words (`content_words`), so questions that
+    differ by an extra, negating or different word ("grading" vs "regrading")
+    never share an answer, however closely they embed.
+    """
+    def __init__(self, embed=ngram_embedding, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL,
+                 max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.index_version = None
+        self.entries = OrderedDict()  # (scope, normalized question) → (embedding, answer, stored_at)
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+
+    def set_index_version(self, version):
+        """Drop every cached answer if the index the answers came from has changed"""
+        with self._lock:
+            if version != self.index_version:
+                if self.entries:
+                    self.stats["invalidations"] += 1
+                self.entries.clear()
+                self.index_version = version
+
+    def _expired(self, stored_at):
+        return time.time() - stored_at > self.ttl
+
+    def lookup(self, question, scope=()):
+        """Return a cached answer for the question within `scope` (e.g. its routed courses), or None"""
+        scope = tuple(sorted(scope))
+        question = normalize_question(question)
+        key = (scope, question)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and not self._expired(entry[2]):
+                self.entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry[1]
+
+        embedding = self.embed(question)
+        words = content_words(question)
+        with self._lock:
+            best_key, best_score = None, self.threshold
+            for other_key, (other_embedding, answer, stored_at) in list(self.entries.items()):
+                if self._expired(stored_at):
+                    del self.entries[other_key]
+                    self.stats["evictions"] += 1
+                    continue
+                # "homework 4" and "homework 5" embed closely but are different questions, as are "is it
+                # open book" and "is it not open book", and the same question about two courses
+                other_scope, other_question = other_key
+                if other_scope != scope or content_words(other_question) != words:
+                    continue
+                score = _cosine(embedding, other_embedding)
+                if score >= best_score:
+                    best_key, best_score = other_key, score
+            if best_key is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(best_key)
+            self.stats["semantic_hits"] += 1
+            return self.entries[best_key][1]
+
+    def store(self, question, answer, scope=()):
+        question = normalize_question(question)
+        key = (tuple(sorted(scope)), question)
+        embedding = self.embed(question)
+        with self._lock:
+            self.entries[key] = (embedding, answer, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def report(self):
+        with self._lock:
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            lookups = hits + self.stats["misses"]
+            return {**self.stats, "entries": len(self.entries), "hit_rate": hits / lookups if lookups else 0.0}
+
+class CachedChatBot:
+    """Wraps the compiled RAG graph so repeated questions skip retrieve + generate.
+
+    With a CourseRouter, questions are cached per routed course and the graph
+    is told the courses, so it doesn't route again. Follow-ups (inputs with
+    `history` or a `summary`) depend on the conversation, so they bypass the
+    cache entirely: only the first question of a session can be answered from
+    it (`python -m benchmarks.bench_answer_cache` measures what that costs).
+    """
+    def __init__(self, graph, cache, index_version=None, router=None):
+        self.graph = graph
+        self.cache = cache
+        self.router = router
+        cache.set_index_version(index_version)
+
+    def _scope(self, inputs):
+        """(inputs for the graph, cache scope); scope None means don't use the cache"""
+        if inputs.get("history") or inputs.get("summary"):
+            return inputs, None
+        courses = inputs.get("courses") or (self.router.route(inputs["question"]) if self.router else [])
+        return {**inputs, "courses": courses}, tuple(courses)
+
+    def _lookup(self, inputs):
+        """(inputs for the graph, cache scope, cached answer or None)"""
+        inputs, scope = self._scope(inputs)
+        return inputs, scope, self.cache.lookup(inputs["question"], scope) if scope is not None else None
+
+    def _store(self, inputs, scope, answer):
+        if scope is not None:
+            self.cache.store(inputs["question"], answer, scope)
+
+    def invoke(self, inputs, config=None):
+        started = time.perf_counter()
+        inputs, scope, answer = self._lookup(inputs)
+        if answer is not None:
+            return {**inputs, "context": [], "answer": answer, "cached": True,
+                    "latency_s": time.perf_counter() - started}
+        result = self.graph.invoke(inputs, config=config)
+        self._store(inputs, scope, result["answer"])
+        return {**result, "cached": False, "latency_s": time.perf_counter() - started}
+
+    async def ainvoke(self, inputs, config=None):
+        """Async `invoke` over `graph.ainvoke`"""
+        started = time.perf_counter()
+        inputs, scope, answer = self._lookup(inputs)
+        if answer is not None:
+            return {**inputs, "context": [], "answer": answer, "cached": True,
+                    "latency_s": time.perf_counter() - started}
+        result = await self.graph.ainvoke(inputs, config=config)
+        self._store(inputs, scope, result["answer"])
+        return {**result, "cached": False, "latency_s": time.perf_counter() - started}
+
+    async def abatch(self, inputs_list, config=None):
+        """Answer many questions concurrently; cache misses go through one `graph.abatch`.
+
+        `config={"max_concurrency": n}` caps how many graph runs are in flight.
+        """
+        started = time.perf_counter()
+        results = [None] * len(inputs_list)
+        misses = []
+        for i, inputs in enumerate(inputs_list):
+            inputs, scope, answer = self._lookup(inputs)
+            if answer is not None:
+                results[i] = {**inputs, "context": [], "answer": answer, "cached": True,
+                              "latency_s": time.perf_counter() - started}
+            else:
+                misses.append((i, inputs, scope))
+        if misses:
+            answered = await self.graph.abatch([inputs for _, inputs, _ in misses], config=config,
+                                               return_exceptions=True)
+            for (i, inputs, scope), result in zip(misses, answered):
+                if isinstance(result, Exception):
+                    results[i] = {**inputs, "answer": None, "error": str(result), "cached": False}
+                    continue
+                self._store(inputs, scope, result["answer"])
+                results[i] = {**result, "cached": False, "latency_s": time.perf_counter() - started}
+        return results
+
+    def stream(self, inputs, config=None):
+        """AnswerStream over the answer tokens; a cached answer arrives as a single chunk"""
+        started = time.perf_counter()
+        inputs, scope, answer = self._lookup(inputs)
+        if answer is not None:
+            return AnswerStream.from_answer(inputs, answer, started=started)
+        return AnswerStream(self.graph, inputs, config=config,
+                            on_complete=lambda result: self._store(inputs, scope, result["answer"]))
+
+# One cache per process, so every Streamlit session benefits from the others' questions
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,84 @@
+import time
+from telemetry import telemetry
+
+class AnswerStream:
+    """Iterate over the answer tokens of one graph run as the LLM produces them.
+
+    Tokens come from LangGraph's "messages" stream mode, filtered to the node
+    that writes the answer; the final state comes from "values" mode. After
+    iteration `result`, `ttft_s` (time to first token), `latency_s` and
+    `breakdown` (seconds per telemetry span of the turn) are set. Iterable, so
+    it can be handed straight to `st.write_stream`.
+    """
+    def __init__(self, graph, inputs, config=None, node="generate", on_complete=None):
+        self.graph = graph
+        self.inputs = inputs
+        self.config = config
+        self.node = node
+        self.on_complete = on_complete
+        self.result = None
+        self.cached = False
+        self.ttft_s = None
+        self.latency_s = None
+        self.breakdown = {}
+        self._started = None
+
+    @classmethod
+    def from_answer(cls, inputs, answer, started=None):
+        """A stream that yields an already known (e.g. cached) answer in one piece"""
+        stream = cls(None, inputs)
+        stream.cached = True
+        stream.result = {**inputs, "context": [], "answer": answer}
+        stream._started = started
+        return stream
+
+    def _mark_first_token(self, started):
+        if self.ttft_s is None:
+            self.ttft_s = time.perf_counter() - started
+
+    def __iter__(self):
+        with telemetry.trace("chat.turn", cached=self.cached) as trace:
+            yield from self._tokens()
+        self.breakdown = {**trace.breakdown(), "first_token": self.ttft_s}
+        # Keep the total last
+        self.breakdown["total"] = self.breakdown.pop("total")
+
+    def _tokens(self):
+        if self.graph is None:
+            started = self._started or time.perf_counter()
+            self._mark_first_token(started)
+            yield self.result["answer"]
+            self.latency_s = time.perf_counter() - started
+            return
+
+        started = time.perf_counter()
+        streamed = False
+        for mode, chunk in self.graph.stream(self.inputs, config=self.config, stream_mode=["messages", "values"]):
+            if mode == "values":
+                self.result = chunk
+                continue
+            message, metadata = chunk
+            if metadata.get("langgraph_node") != self.node or not isinstance(message.content, str):
+                continue
+            if message.content:
+                self._mark_first_token(started)
+                streamed = True
+                yield message.content
+
+        # Models that don't stream still produce the answer in the final state
+        if not streamed and self.result and self.result.get("answer"):
+            self._mark_first_token(started)
+            yield self.result["answer"]
+        self.latency_s = time.perf_counter() - started
+        if self.ttft_s is None:
+            self.ttft_s = self.latency_s
+        if self.on_complete is not None and self.result is not None:
+            self.on_complete(self.result)
+
+    @property
+    def answer(self):
+        return self.result["answer"] if self.result else None
+
+    def metrics(self):
+        return {"cached": self.cached, "ttft_s": self.ttft_s, "latency_s": self.latency_s,
+                "prompt_tokens": (self.result or {}).get("prompt_tokens"), "breakdown": self.breakdown}
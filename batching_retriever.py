@@ -0,0 +1,121 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from telemetry import telemetry
+
+RETRIEVAL_MAX_BATCH = int(os.environ.get("RETRIEVAL_MAX_BATCH", "16"))
+RETRIEVAL_BATCH_WAIT = float(os.environ.get("RETRIEVAL_BATCH_WAIT_MS", "5")) / 1000
+
+def _to_documents(hits):
+    from langchain_core.documents import Document
+
+    # Same shape as RAGatouille's langchain retriever, plus the document id
+    return [Document(id=hit.get("document_id"), page_content=hit["content"],
+                     metadata=hit.get("document_metadata") or {}) for hit in hits]
+
+_CALL = object()  # queue marker for `call` items
+
+class BatchingRetriever:
+    """Retriever that merges concurrent questions into one `rag.search([...])` call.
+
+    Every `invoke` queues its question and waits; a single worker thread
+    takes the first waiting question, collects whatever else arrives within
+    `max_wait` seconds (up to `max_batch`) and searches them together, so the
+    queries are encoded in one ColBERT forward pass. Questions restricted to
+    document ids (e.g. one course) are searched one at a time: RAGatouille
+    only applies `doc_ids` to single-string searches, and silently ignores
+    them for a list of queries. The worker is also the only caller of the
+    model, so searches never run concurrently on it; other model calls
+    (e.g. `rag.rerank`) go through `call` to share that guarantee.
+    """
+    def __init__(self, rag, k=8, max_batch=RETRIEVAL_MAX_BATCH, max_wait=RETRIEVAL_BATCH_WAIT):
+        self.rag = rag
+        self.k = k
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stats = {"queries": 0, "searches": 0, "largest_batch": 0}
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def _submit(self, question, doc_ids):
+        future = Future()
+        if doc_ids is not None and doc_ids is not _CALL:
+            doc_ids = tuple(doc_ids)
+        self._queue.put((question, doc_ids, future))
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True, name="batching-retriever")
+                self._worker.start()
+        return future
+
+    def invoke(self, question, config=None, doc_ids=None):
+        """Return the top-k Documents for one question, optionally only among `doc_ids`.
+
+        Blocks until its batch is searched.
+        """
+        return self._submit(question, doc_ids).result()
+
+    async def ainvoke(self, question, config=None, doc_ids=None):
+        """Async `invoke`: the event loop keeps running while the batch is searched"""
+        return await asyncio.wrap_future(self._submit(question, doc_ids))
+
+    def call(self, fn):
+        """Future for `fn(rag)`, run on the worker thread between searches"""
+        return self._submit(fn, _CALL)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _search(self, questions, doc_ids):
+        filters = {"doc_ids": list(doc_ids)} if doc_ids is not None else {}
+        # One span per batch: RAGatouille encodes the queries and searches in the same call
+        with telemetry.span("colbert.search", batch=len(questions), filtered=doc_ids is not None):
+            if len(questions) == 1 or doc_ids is not None:
+                # A list search would drop the filter (PLAIDModelIndex._batch_search takes no pids)
+                return [self.rag.search(question, k=self.k, **filters) for question in questions]
+            return self.rag.search(questions, k=self.k)
+
+    def _run(self):
+        while True:
+            groups = {}
+            for question, doc_ids, future in self._next_batch():
+                if doc_ids is _CALL:
+                    try:
+                        with telemetry.span(f"colbert.{getattr(question, '__name__', 'call')}"):
+                            future.set_result(question(self.rag))
+                    except Exception as e:
+                        future.set_exception(e)
+                    continue
+                groups.setdefault(doc_ids, []).append((question, future))
+            for doc_ids, group in groups.items():
+                try:
+                    results = self._search([question for question, _ in group], doc_ids)
+                except Exception as e:
+                    for _, future in group:
+                        future.set_exception(e)
+                    continue
+
+                batch = len(group) if doc_ids is None else 1
+                with self._lock:
+                    self.stats["queries"] += len(group)
+                    self.stats["searches"] += len(group) // batch
+                    self.stats["largest_batch"] = max(self.stats["largest_batch"], batch)
+                for (_, future), hits in zip(group, results):
+                    future.set_result(_to_documents(hits))
+
+    def report(self):
+        with self._lock:
+            searches = self.stats["searches"]
+            return {**self.stats, "mean_batch": self.stats["queries"] / searches if searches else 0.0}
@@ -0,0 +1,93 @@
+"""Semantic answer cache: near-miss questions and the hit rate of real sessions.
+
+    python -m benchmarks.bench_answer_cache --sessions 200 --turns 4
+
+First checks questions that embed closely but ask something else ("grading"
+vs "regrading", a negated question, an extra word, another homework number,
+another course): none may be answered from the cache, and the paraphrases
+(dropped articles, plurals, punctuation) must be. Exits non-zero otherwise.
+
+Then replays synthetic sessions through CachedChatBot over a stub graph:
+each session asks `--turns` questions drawn from a pool of common ones, and
+every turn after the first carries history, so it bypasses the cache.
+Reports the hit rate, the share of turns that could be cached at all, and how
+many follow-ups repeated a question the cache already held.
+"""
+import argparse
+import json
+import random
+
+from answer_cache import CachedChatBot, SemanticAnswerCache
+from benchmarks.fixtures import StubGraph
+
+SCOPE = ("Geology",)
+# (cached question, new question, scope of the new question)
+NEAR_MISSES = [
+    ("what is the grading policy", "what is the regrading policy", SCOPE),
+    ("is the midterm open book", "is the midterm not open book", SCOPE),
+    ("can I use a calculator on the exam", "can't I use a calculator on the exam", SCOPE),
+    ("what is the late policy", "what is the late submission policy", SCOPE),
+    ("when is the midterm", "when is the midterm review", SCOPE),
+    ("when is homework 4 due", "when is homework 5 due", SCOPE),
+    ("when is the midterm", "when is the midterm", ("Astronomy",)),
+]
+PARAPHRASES = [
+    ("what is the grading policy", "What's the grading policy?"),
+    ("when are office hours", "When are the office hours"),
+    ("where are the lecture slides", "where are lecture slides?"),
+    ("when is homework 4 due", "When is homework 4 due?"),
+]
+POOL = ["When is the midterm?", "What is the late policy?", "When are office hours?", "Is the final cumulative?",
+        "Where are the lecture slides?", "How is the course graded?", "When is homework 3 due?",
+        "Can I use a calculator on the exam?"]
+
+
+def check_near_misses():
+    """Questions that wrongly hit (near misses) or wrongly miss (paraphrases)"""
+    failures = []
+    for cached, asked, scope in NEAR_MISSES:
+        cache = SemanticAnswerCache()
+        cache.store(cached, "cached answer", SCOPE)
+        if cache.lookup(asked, scope) is not None:
+            failures.append({"cached": cached, "asked": asked, "expected": "miss"})
+    for cached, asked in PARAPHRASES:
+        cache = SemanticAnswerCache()
+        cache.store(cached, "cached answer", SCOPE)
+        if cache.lookup(asked, SCOPE) is None:
+            failures.append({"cached": cached, "asked": asked, "expected": "hit"})
+    return failures
+
+
+def replay_sessions(sessions, turns, seed=0):
+    rng = random.Random(seed)
+    bot = CachedChatBot(StubGraph(), SemanticAnswerCache())
+    asked, hits, repeated_follow_ups = set(), 0, 0
+    for _ in range(sessions):
+        history = []
+        for question in rng.sample(POOL, turns):
+            if history and question in asked:
+                repeated_follow_ups += 1
+            hits += bot.invoke({"question": question, "history": list(history)})["cached"]
+            asked.add(question)
+            history += [("user", question), ("assistant", "...")]
+    total = sessions * turns
+    return {"turns": total, "hit_rate": hits / total, "cacheable_turns": sessions / total,
+            "first_turn_hit_rate": hits / sessions, "repeated_follow_ups": repeated_follow_ups / total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=4)
+    args = parser.parse_args()
+
+    failures = check_near_misses()
+    report = {"near_miss_failures": failures, "sessions": replay_sessions(args.sessions, args.turns)}
+    print(json.dumps(report, indent=1))
+    if failures:
+        raise SystemExit(f"❌ {len(failures)} near-miss or paraphrase question(s) matched wrongly")
+    print("✅ No near-miss question was answered from the cache")
+
+
+if __name__ == "__main__":
+    main()
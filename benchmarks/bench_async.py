@@ -0,0 +1,124 @@
+"""Throughput of the RAG graph: one question at a time vs. the async/batched API and HTTP server.
+
+    python -m benchmarks.bench_async --questions 64 --concurrency 16
+
+Uses the real graph (chat_interface.build_rag_graph) over a BatchingRetriever
+on benchmarks.stubs.StubColbert and a fake async chat model (fixed latency,
+token-bucket rate limited like create_chat_model):
+  sequential  graph.invoke per question (CLI / old Streamlit path)
+  ainvoke     graph.ainvoke per question, `--concurrency` in flight on one event loop
+  abatch      one graph.abatch call with max_concurrency (no per-question latency)
+  http        rag_server over localhost, `--concurrency` client threads on POST /ask
+"""
+import argparse
+import contextlib
+import io
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_retrieval import percentiles
+from benchmarks.corpus import synthetic_documents, synthetic_questions
+from benchmarks.stubs import StubColbert, fake_streaming_chat_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--requests-per-second", type=float, default=50)
+    args = parser.parse_args()
+
+    from http.server import ThreadingHTTPServer
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.rate_limiters import InMemoryRateLimiter
+
+    from batching_retriever import BatchingRetriever
+    from chat_interface import build_rag_graph
+    from rag_server import RAGService, make_handler
+
+    docs = synthetic_documents()
+    questions = [q["question"] for q in synthetic_questions(docs, n=args.questions)]
+    rag = StubColbert([d["text"] for d in docs], footprint_mb=1)
+    retriever = BatchingRetriever(rag)
+    rate_limiter = InMemoryRateLimiter(requests_per_second=args.requests_per_second, check_every_n_seconds=0.01,
+                                       max_bucket_size=args.concurrency)
+    llm = fake_streaming_chat_model("See the course syllabus.", args.llm_latency, 0, rate_limiter=rate_limiter)
+    prompt = ChatPromptTemplate.from_messages([("system", "{context}"), ("human", "{history}\n{question}")])
+    graph = build_rag_graph(retriever, llm, prompt)
+    inputs = [{"question": question, "history": []} for question in questions]
+    results = {}
+
+    def measure(name, run):
+        calls_before = rag.calls
+        started = time.perf_counter()
+        latencies = run()
+        elapsed = time.perf_counter() - started
+        results[name] = {"questions_per_s": len(questions) / elapsed, "wall_s": elapsed,
+                         "search_calls": rag.calls - calls_before,
+                         "latency": percentiles(latencies) if latencies else None}
+
+    def sequential():
+        latencies = []
+        for item in inputs:
+            started = time.perf_counter()
+            graph.invoke(item)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def ainvoke():
+        import asyncio
+
+        async def timed(item, semaphore):
+            async with semaphore:
+                started = time.perf_counter()
+                await graph.ainvoke(item)
+                return time.perf_counter() - started
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(args.concurrency)
+            return await asyncio.gather(*(timed(item, semaphore) for item in inputs))
+
+        return asyncio.run(run_all())
+
+    def abatch():
+        import asyncio
+
+        asyncio.run(graph.abatch(inputs, config={"max_concurrency": args.concurrency}))
+        return None
+
+    def http():
+        service = RAGService(graph, args.concurrency)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/ask"
+
+        def ask(question):
+            started = time.perf_counter()
+            request = urllib.request.Request(url, data=json.dumps({"question": question}).encode(),
+                                             headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request) as response:
+                assert json.load(response)["answer"]
+            return time.perf_counter() - started
+
+        try:
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                return list(pool.map(ask, questions))
+        finally:
+            server.shutdown()
+            service.close()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        measure("sequential", sequential)
+        measure("ainvoke", ainvoke)
+        measure("abatch", abatch)
+        measure("http", http)
+    results["retriever"] = retriever.report()
+    print(json.dumps(results, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Chunking stage: raw pages vs. chunker.Chunker (boilerplate stripping, structure-aware chunks, SimHash dedup).
+
+    python -m benchmarks.bench_chunking --docs-per-course 20 --duplicate-share 0.2
+
+Builds a synthetic corpus of slide decks shaped like parsed course files: every
+page carries the deck's header and a "Page n of N" / copyright footer,
+syllabi are LlamaParse-style markdown, and `--duplicate-share` of the files are
+uploaded a second time to another module (with a different footer). Compares
+  pages    every page as parsed, windowed into ColBERT-sized passages
+           (what split_documents=True indexed before)
+  chunker  rag_indexer's chunking stage
+Reports passages, words encoded, duplicates and boilerplate removed, chunking
+time and the estimated index size (ColBERT stores one code plus an
+nbits-compressed residual per wordpiece, about 1.3 wordpieces per word).
+Also checks that a numbered course schedule ("Week 1", "Quiz 4", ...) keeps
+every line through boilerplate stripping, and exits non-zero if it does not.
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.corpus import synthetic_documents
+
+WORDPIECES_PER_WORD = 1.3
+
+
+def slide_corpus(docs_per_course, pages_per_doc, duplicate_share, seed=0):
+    """{s3 key: [(page text, page number)]} with headers, footers, markdown syllabi and re-uploaded files"""
+    rng = random.Random(seed)
+    files = {}
+    for doc in synthetic_documents(docs_per_course=docs_per_course, pages_per_doc=pages_per_doc):
+        files.setdefault(doc["key"], []).append(doc)
+    corpus = {}
+    for key, pages in files.items():
+        course = pages[0]["course"]
+        if pages[0]["module"] == "Syllabus":
+            corpus[key] = [(f"# {course} Syllabus\n## Exams\n{pages[0]['text']}\n## Policies\n"
+                            "| Item | Weight |\n|---|---|\n| Homework | 40% |\n| Exams | 60% |", 1)]
+            continue
+        corpus[key] = [(f"{course} — Fall 2024\n{page['text']}\nPage {n + 1} of {len(pages)}\n"
+                        f"© 2024 University course materials", n + 1) for n, page in enumerate(pages)]
+    for key in rng.sample(sorted(corpus), int(duplicate_share * len(corpus))):
+        course, module, name = key.split("/")
+        copy = [(text.replace("© 2024 University course materials", "Posted for review week"), page)
+                for text, page in corpus[key]]
+        corpus[f"{course}/Review/{name}"] = copy
+    return corpus
+
+
+def schedule_pages(weeks=18, pages=6):
+    """A course schedule whose pages differ only in their numbers, with a header and "Page n of N" footer"""
+    per_page = -(-weeks // pages)
+    schedule = []
+    for page in range(pages):
+        lines = ["Geology 101 — Course Schedule"]
+        for week in range(page * per_page + 1, min(weeks, (page + 1) * per_page) + 1):
+            lines += [f"Week {week}", f"Lecture {week}: Topic {week}", f"Homework {week} due Feb {week + 2}",
+                      f"Quiz {week}"]
+        schedule.append(("\n".join(lines + [f"Page {page + 1} of {pages}"]), page + 1))
+    return schedule
+
+
+def schedule_lines_lost(chunker_class):
+    """Schedule lines missing from the chunks of schedule_pages()"""
+    pages = schedule_pages()
+    # Chunks are whitespace-joined windows, so compare word sequences
+    kept = " ".join(" ".join(chunk for chunk, _, _ in chunker_class().chunk_file(pages)).split()) + " "
+    lines = [line for text, _ in pages for line in text.splitlines()[1:-1]]
+    return [line for line in lines if f"{line} " not in kept]
+
+
+def raw_pages(corpus, max_words):
+    """Each page as parsed, cut into consecutive max_words windows"""
+    passages = []
+    for pages in corpus.values():
+        for text, _ in pages:
+            words = text.split()
+            passages += [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]
+    return passages
+
+
+def summarize(passages, nbits, seconds, extra=None):
+    words = sum(len(passage.split()) for passage in passages)
+    embeddings = words * WORDPIECES_PER_WORD
+    return {"passages": len(passages), "words": words, "chunking_s": seconds,
+            "index_mb_estimate": embeddings * (4 + 128 * nbits / 8) / 1e6, **(extra or {})}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs-per-course", type=int, default=20)
+    parser.add_argument("--pages-per-doc", type=int, default=8)
+    parser.add_argument("--duplicate-share", type=float, default=0.2)
+    parser.add_argument("--nbits", type=int, default=4)
+    args = parser.parse_args()
+
+    from chunker import CHUNK_MAX_WORDS, Chunker
+
+    corpus = slide_corpus(args.docs_per_course, args.pages_per_doc, args.duplicate_share)
+    report = {"files": len(corpus), "pages": sum(len(pages) for pages in corpus.values())}
+
+    started = time.perf_counter()
+    passages = raw_pages(corpus, CHUNK_MAX_WORDS)
+    report["pages_mode"] = summarize(passages, args.nbits, time.perf_counter() - started)
+
+    chunker = Chunker()
+    started = time.perf_counter()
+    # Deduplicated per course, as rag_indexer does
+    chunks = [chunk for key, pages in corpus.items() for chunk, _, _ in chunker.chunk_file(pages, key.split("/")[0])]
+    report["chunker"] = summarize(chunks, args.nbits, time.perf_counter() - started, chunker.report())
+
+    before, after = report["pages_mode"], report["chunker"]
+    report["words_saved"] = 1 - after["words"] / before["words"]
+    lost = schedule_lines_lost(Chunker)
+    report["schedule_lines_lost"] = len(lost)
+    print(json.dumps(report, indent=1))
+    if lost:
+        raise SystemExit(f"❌ Boilerplate stripping removed schedule lines: {lost[:5]}")
+
+
+if __name__ == "__main__":
+    main()
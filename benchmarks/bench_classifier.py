@@ -0,0 +1,62 @@
+"""Evaluate local_classifier.LocalFileClassifier against relevant_documents.csv.
+
+    python -m benchmarks.bench_classifier --threshold 0.9
+
+Leave-one-out: each labelled file is predicted by a model trained on all the
+others. Reports coverage (share answered locally), accuracy on those answers,
+accuracy if every prediction were trusted, and per-file latency.
+"""
+import argparse
+import csv
+import json
+import time
+
+from local_classifier import CONFIDENCE_THRESHOLD, LocalFileClassifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--csv", default="relevant_documents.csv")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD)
+    args = parser.parse_args()
+
+    with open(args.csv, newline="") as f:
+        rows = [row for row in csv.DictReader(f) if row.get("source") != "local"]
+
+    answered = correct_answered = correct_all = 0
+    escalated, mistakes, latencies = [], [], []
+    for i, row in enumerate(rows):
+        model = LocalFileClassifier(args.threshold).fit(
+            (other["filename"], other["classification"]) for j, other in enumerate(rows) if j != i
+        )
+        started = time.perf_counter()
+        label, confidence = model.predict(row["filename"])
+        latencies.append(time.perf_counter() - started)
+
+        correct_all += label == row["classification"]
+        if confidence >= args.threshold:
+            answered += 1
+            correct_answered += label == row["classification"]
+            if label != row["classification"]:
+                mistakes.append({"file": row["filename"], "predicted": label, "expected": row["classification"]})
+        else:
+            escalated.append(row["filename"])
+
+    latencies.sort()
+    report = {
+        "files": len(rows),
+        "threshold": args.threshold,
+        "coverage": answered / len(rows),
+        "accuracy_answered": correct_answered / answered if answered else None,
+        "accuracy_all": correct_all / len(rows),
+        "llm_calls_avoided_pct": 100 * answered / len(rows),
+        "latency_ms_p50": 1000 * latencies[len(latencies) // 2],
+        "latency_ms_max": 1000 * latencies[-1],
+        "escalated": escalated,
+        "mistakes": mistakes,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
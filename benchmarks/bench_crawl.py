@@ -0,0 +1,87 @@
+"""Benchmark canvas_api.sync_courses against a local mock Canvas server.
+
+    python -m benchmarks.bench_crawl --workers 1 4 8 16
+    python -m benchmarks.bench_crawl --workers 16 --rate-limit 700 --per-page 10 100
+
+With --incremental each worker count runs a cold sync followed by a warm
+sync against the same manifest, which should transfer no bytes (listing pages
+come back 304 Not Modified). --rate-limit gives the mock Canvas a
+rate-limit bucket of that size that throttles with 403s once drained; every run
+reports API requests, throttled responses and whether all files arrived, and
+the benchmark exits non-zero if a throttled run lost any file.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.fake_s3 import FakeS3
+from benchmarks.fixtures import benchmark_env
+from benchmarks.mock_canvas import MockCanvas
+
+
+def synced(canvas, workers, per_page, **kwargs):
+    import canvas_api
+
+    before = (canvas.requests, canvas.throttled, canvas.not_modified)
+    report = canvas_api.sync_courses(max_workers=workers, enrolled_courses=canvas.course_names, **kwargs)
+    report.update(workers=workers, per_page=per_page, requests=canvas.requests - before[0],
+                  throttled=canvas.throttled - before[1], not_modified=canvas.not_modified - before[2],
+                  complete=report["files"] == canvas.total_files)
+    return report
+
+
+def run(workers, per_page, canvas, incremental=False):
+    import canvas_api
+    import common
+    from sync_manifest import SyncManifest
+
+    canvas_api.BASE_URL = canvas.base_url
+    canvas_api.CANVAS_PER_PAGE = per_page
+    common.s3 = FakeS3(keep_bodies=False)
+    if not incremental:
+        return [synced(canvas, workers, per_page)]
+
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for phase in ("cold", "warm"):
+            manifest = SyncManifest(path=os.path.join(tmp, "manifest.json")).load()
+            report = synced(canvas, workers, per_page, manifest=manifest)
+            report["phase"] = phase
+            reports.append(report)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--courses", type=int, default=2)
+    parser.add_argument("--modules", type=int, default=6)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--file-size", type=int, default=256 * 1024)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated per-request latency (s)")
+    parser.add_argument("--incremental", action="store_true", help="run a cold and a warm sync with a manifest")
+    parser.add_argument("--per-page", type=int, nargs="+", default=[100], help="items per listing page")
+    parser.add_argument("--rate-limit", type=float, help="mock Canvas rate-limit bucket size (Canvas: 700)")
+    parser.add_argument("--rate-refill", type=float, default=200, help="bucket refill per second")
+    args = parser.parse_args()
+
+    benchmark_env()
+    results = []
+    with MockCanvas(args.courses, args.modules, args.files, args.file_size, latency=args.latency,
+                    rate_limit=args.rate_limit, rate_refill=args.rate_refill) as canvas:
+        for per_page in args.per_page:
+            for workers in args.workers:
+                results.extend(run(workers, per_page, canvas, args.incremental))
+
+    print(json.dumps(results, indent=2))
+    if args.rate_limit is not None:
+        lost = [r for r in results if not r["complete"] or r["failed"]]
+        if lost:
+            sys.exit(f"❌ {len(lost)} throttled run(s) lost files: {json.dumps(lost)}")
+        print("✅ No files lost to throttling")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Prompt size over a long conversation: full history vs. the token-budgeted ConversationMemory.
+
+    python -m benchmarks.bench_history --turns 50
+
+Drives the real retrieve → generate graph (chat_interface.build_rag_graph)
+with a stub retriever returning 8 chunks from the synthetic corpus and a fake
+chat model, and records the prompt tokens of every turn:
+  unbounded  every previous turn verbatim, all 8 chunks (old generate node)
+  budgeted   ConversationMemory (offline extractive summarizer) + trimmed chunks
+"""
+import argparse
+import contextlib
+import io
+import json
+
+from benchmarks.corpus import synthetic_documents, synthetic_questions
+from benchmarks.stubs import fake_streaming_chat_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--answer-words", type=int, default=120)
+    parser.add_argument("--k", type=int, default=8)
+    args = parser.parse_args()
+
+    from langchain_core.documents import Document
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.runnables import RunnableLambda
+
+    from chat_interface import build_rag_graph
+    from conversation_memory import ConversationMemory, extractive_summarizer
+
+    docs = synthetic_documents()
+    questions = [q["question"] for q in synthetic_questions(docs, n=args.turns)]
+    chunks = [Document(page_content=d["text"]) for d in docs]
+    retriever = RunnableLambda(lambda question: [chunks[(len(question) * 7 + i) % len(chunks)] for i in range(args.k)])
+    answer = " ".join(f"word{i}" for i in range(args.answer_words))
+    llm = fake_streaming_chat_model(answer, first_token_delay=0, token_delay=0)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "Answer the student's question about their courses using the context.\n{context}"),
+        ("human", "Conversation so far:\n{history}\n\nQuestion: {question}"),
+    ])
+
+    unbounded_graph = build_rag_graph(retriever, llm, prompt, prompt_budget=10 ** 9)
+    budgeted_graph = build_rag_graph(retriever, llm, prompt)
+    history, memory = [], ConversationMemory(summarize=extractive_summarizer)
+    unbounded, budgeted = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for question in questions:
+            result = unbounded_graph.invoke({"question": question, "history": history})
+            history.append({"question": question, "answer": result["answer"]})
+            unbounded.append(result["prompt_tokens"])
+
+            result = budgeted_graph.invoke({"question": question, **memory.inputs()})
+            memory.add_turn(question, result["answer"])
+            budgeted.append(result["prompt_tokens"])
+
+    checkpoints = sorted({1, 10, 25, args.turns} & set(range(1, args.turns + 1)))
+    print(json.dumps({
+        "turns": args.turns,
+        "unbounded": {f"turn_{t}": unbounded[t - 1] for t in checkpoints} | {"total": sum(unbounded)},
+        "budgeted": {f"turn_{t}": budgeted[t - 1] for t in checkpoints} | {"total": sum(budgeted),
+                                                                           "max": max(budgeted)},
+        "summarized_turns": memory.summarized_turns,
+        "saved": 1 - sum(budgeted) / sum(unbounded),
+    }, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Hybrid retrieval: ColBERT vs. BM25 vs. BM25 → ColBERT rerank vs. rank fusion.
+
+    python -m benchmarks.bench_hybrid --docs-per-course 20 --questions 100
+
+Builds a synthetic ColBERT index in a temporary directory (requires
+ragatouille and the colbertv2.0 checkpoint) plus the BM25 index rag_indexer
+builds next to it, then answers a labelled question set through
+HybridRetriever in every mode. Half the questions are topical ("What does
+Geology teach about erosion?"), half exact-term lookups ("What is in
+Lecture 7 of Geology?"). Reports recall@k (share of questions whose source
+document is retrieved) and p50/p95 latency, per question type and overall.
+`--stub` swaps ColBERT for benchmarks.stubs.StubColbert to exercise the code
+paths offline; its recall numbers say nothing about ColBERT.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.bench_retrieval import percentiles
+from benchmarks.corpus import lookup_questions, synthetic_documents, synthetic_questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs-per-course", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--stub", action="store_true", help="use a stub instead of ColBERT")
+    args = parser.parse_args()
+
+    from batching_retriever import BatchingRetriever
+    from hybrid_retriever import MODES, HybridRetriever
+    from lexical_index import BM25Index
+
+    docs = synthetic_documents(docs_per_course=args.docs_per_course)
+    labelled = {"topical": synthetic_questions(docs, n=args.questions // 2),
+                "lookup": lookup_questions(docs, n=args.questions - args.questions // 2)}
+    texts = [f"Document: {doc['text']}" for doc in docs]
+    doc_ids = [f"{doc['key']}#{doc['page'] - 1}" for doc in docs]
+    metadatas = [{"source_key": doc["key"], "course": doc["course"], "file": doc["key"].rsplit("/", 1)[1],
+                  "page": doc["page"]} for doc in docs]
+    lexical_index = BM25Index().add(texts, doc_ids, metadatas)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.stub:
+            from benchmarks.stubs import StubColbert
+            passages = [{"content": text, "document_id": doc_id, "document_metadata": metadata}
+                        for text, doc_id, metadata in zip(texts, doc_ids, metadatas)]
+            rag = StubColbert(passages, footprint_mb=1, call_overhead=0.005, per_candidate=0.0001)
+        else:
+            from ragatouille import RAGPretrainedModel
+            os.chdir(tmp)
+            builder = RAGPretrainedModel.from_pretrained("colbert-ir/colbertv2.0")
+            index_path = builder.index(collection=texts, document_ids=doc_ids, document_metadatas=metadatas,
+                                       index_name="bench", split_documents=True)
+            del builder
+            rag = RAGPretrainedModel.from_index(index_path)
+
+        report = {}
+        for mode in MODES:
+            retriever = HybridRetriever(BatchingRetriever(rag, k=args.k, max_wait=0), lexical_index, mode=mode,
+                                        k=args.k, candidates=args.candidates)
+            retriever.invoke("What is the course schedule?")  # warm-up
+            report[mode] = {}
+            every_latency, every_found = [], 0
+            for kind, questions in labelled.items():
+                latencies, found = [], 0
+                for question in questions:
+                    started = time.perf_counter()
+                    results = retriever.invoke(question["question"])
+                    latencies.append(time.perf_counter() - started)
+                    found += any(doc.metadata.get("source_key") in question["expected_sources"] for doc in results)
+                report[mode][kind] = {f"recall@{args.k}": found / len(questions), "latency": percentiles(latencies)}
+                every_latency += latencies
+                every_found += found
+            report[mode]["all"] = {f"recall@{args.k}": every_found / len(every_latency),
+                                   "latency": percentiles(every_latency)}
+    print(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Import time of every entry point, from `python -X importtime`.
+
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --rev HEAD~1   # also measure an earlier commit
+
+Each module is imported in a fresh interpreter with stdin closed and without
+the API key variables, so an import that prompts for a key (input() at import
+time) shows up as "prompted" instead of blocking. Reports the cumulative import
+time of the module, the slowest packages it pulls in, and whether heavy
+dependencies (torch, ragatouille, langgraph, boto3) were loaded. `--dummy-keys`
+sets placeholder keys instead, to time revisions that prompt. `--rev` extracts
+that commit with `git archive` into a temporary directory and measures it the
+same way, for a before/after comparison.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ENTRY_POINTS = ("common", "canvas_api", "document_classifer", "rag_indexer", "chat_interface", "rag_server",
+                "streamlit_app")
+SECRETS = ("OPENAI_API_KEY", "LANGCHAIN_API_KEY", "CANVAS_API_TOKEN", "LLAMA_CLOUD_API_KEY")
+HEAVY = ("torch", "ragatouille", "langgraph", "langchain_openai", "llama_parse", "boto3")
+
+
+def measure(module, cwd, repeats, dummy_keys=False):
+    env = {key: value for key, value in os.environ.items() if key not in SECRETS}
+    if dummy_keys:
+        env.update({key: "benchmark-placeholder" for key in SECRETS})
+    env["PYTHONPATH"] = os.pathsep.join([cwd] + [path for path in env.get("PYTHONPATH", "").split(os.pathsep) if path])
+    best = None
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=cwd, env=env,
+                                stdin=subprocess.DEVNULL, capture_output=True, text=True)
+        imports = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            imports[name.strip()] = int(cumulative) / 1e6
+        if result.returncode != 0:
+            errors = [line for line in result.stderr.splitlines()
+                      if line.strip() and not line.startswith("import time:")]
+            error = errors[-1] if errors else "failed"
+            return {"module": module, "status": "prompted" if "EOFError" in error else "failed", "error": error}
+        run = {"module": module, "status": "ok", "import_s": imports.get(module, 0.0),
+               "heavy": sorted(name for name in imports if name in HEAVY),
+               "slowest": {name: round(seconds, 3) for name, seconds in sorted(
+                   ((name, seconds) for name, seconds in imports.items() if "." not in name and name != module),
+                   key=lambda item: item[1], reverse=True)[:5]}}
+        if best is None or run["import_s"] < best["import_s"]:
+            best = run
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", nargs="+", default=list(ENTRY_POINTS))
+    parser.add_argument("--repeats", type=int, default=3, help="best of N fresh interpreters")
+    parser.add_argument("--rev", help="also measure this git revision")
+    parser.add_argument("--dummy-keys", action="store_true", help="set placeholder API keys instead of none")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    report = {"current": [measure(module, root, args.repeats, args.dummy_keys) for module in args.modules]}
+    if args.rev:
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = subprocess.run(["git", "archive", args.rev], cwd=root, capture_output=True, check=True).stdout
+            subprocess.run(["tar", "-x", "-C", tmp], input=archive, check=True)
+            report[args.rev] = [measure(module, tmp, args.repeats, args.dummy_keys) for module in args.modules]
+
+    for label, results in report.items():
+        for result in results:
+            timing = f"{result['import_s']:.2f}s" if result["status"] == "ok" else result["status"]
+            print(f"{label:>10} {result['module']:<20} {timing:>9}  {', '.join(result.get('heavy', []))}",
+                  file=sys.stderr)
+    print(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark common.download_index_from_s3: cold, warm and resumed starts.
+
+    python -m benchmarks.bench_index_download --shards 20 --shard-mb 4
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fake_s3 import FakeS3
+from benchmarks.fixtures import benchmark_env
+
+MB = 1024 * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shards", type=int, default=20)
+    parser.add_argument("--shard-mb", type=float, default=4)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated per-request latency (s)")
+    parser.add_argument("--bandwidth-mb", type=float, default=50, help="simulated per-stream bandwidth (MB/s)")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    benchmark_env()
+    import common
+
+    fake = FakeS3(latency=args.latency, bandwidth=args.bandwidth_mb * MB)
+    shard_size = int(args.shard_mb * MB)
+    for i in range(args.shards):
+        fake.put_object(Bucket=common.S3_BUCKET_NAME, Key=f"{common.S3_INDEX_KEY}/{i}.codes.pt",
+                        Body=os.urandom(shard_size))
+    common.s3 = fake
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+
+        def timed(phase, workers=args.workers):
+            before = fake.bytes_read
+            started = time.perf_counter()
+            ok = common.download_index_from_s3(max_workers=workers)
+            results.append({
+                "phase": phase,
+                "workers": workers,
+                "ok": ok,
+                "seconds": time.perf_counter() - started,
+                "bytes": fake.bytes_read - before,
+            })
+
+        timed("cold-serial", workers=1)
+        for root, dirs, files in os.walk(common.get_index_dir()):
+            for file in files:
+                os.remove(os.path.join(root, file))
+        timed("cold")
+        timed("warm")
+
+        # Simulate a crash halfway through one shard and a changed shard in S3
+        index_dir = common.get_index_dir()
+        first = os.path.join(index_dir, "0.codes.pt")
+        etag = fake._etag(fake.objects[(common.S3_BUCKET_NAME, f"{common.S3_INDEX_KEY}/0.codes.pt")]).strip('"')
+        with open(first, "rb") as f:
+            half = f.read(shard_size // 2)
+        os.remove(first)
+        with open(f"{first}.{etag}.part", "wb") as f:
+            f.write(half)
+        fake.put_object(Bucket=common.S3_BUCKET_NAME, Key=f"{common.S3_INDEX_KEY}/1.codes.pt",
+                        Body=os.urandom(shard_size))
+        timed("resume+changed")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Index compression and loading: resident memory, load time and query latency per nbits, in RAM vs. mmap.
+
+    python -m benchmarks.bench_index_memory --nbits 1 2 4 --docs-per-course 40 --questions 50
+
+Builds one synthetic ColBERT index per `--nbits` value in a temporary directory
+(requires ragatouille and the colbertv2.0 checkpoint; built the way
+rag_indexer does, through index_modes.index_nbits), then loads each index in a
+fresh subprocess, as chat_interface.load_rag_model does:
+  ram   RAGPretrainedModel.from_index, codes and residuals read into the process
+  mmap  the same, plus index_modes.load_searcher_mmap (INDEX_MMAP=1)
+Load time covers from_index plus the first search, since the searcher is
+created lazily. Resident memory is split into private (RssAnon, paid by every
+chat process) and file-backed (RssFile, the shared page cache of a mapped index)
+after loading and after the queries. Query latency is p50/p95 over
+`--questions` single searches.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_retrieval import percentiles
+from benchmarks.corpus import synthetic_documents, synthetic_questions
+
+LOAD_MODES = ("ram", "mmap")
+
+
+def rss_mb():
+    """Private and file-backed resident memory of this process"""
+    rss = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                rss[line.split(":")[0]] = int(line.split()[1]) / 1024
+    return {"private_mb": rss.get("RssAnon", 0.0), "file_mb": rss.get("RssFile", 0.0)}
+
+
+def run(index_path, mode, args):
+    from ragatouille import RAGPretrainedModel
+    from index_modes import index_info, load_searcher_mmap
+
+    docs = synthetic_documents(docs_per_course=args.docs_per_course)
+    questions = [q["question"] for q in synthetic_questions(docs, n=args.questions)]
+    before = rss_mb()
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rag = RAGPretrainedModel.from_index(index_path)
+        mapped = mode == "mmap" and load_searcher_mmap(rag)
+        rag.search(questions[0], k=args.k)
+    load_s = time.perf_counter() - started
+    loaded = rss_mb()
+
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for question in questions:
+            started = time.perf_counter()
+            rag.search(question, k=args.k)
+            latencies.append(time.perf_counter() - started)
+
+    after = rss_mb()
+    return {"mode": mode, "mapped": bool(mapped), **index_info(index_path), "load_s": load_s,
+            "loaded": {key: loaded[key] - before[key] for key in loaded},
+            "after_queries": {key: after[key] - before[key] for key in after},
+            "latency": percentiles(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nbits", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--modes", nargs="+", choices=LOAD_MODES, default=list(LOAD_MODES))
+    parser.add_argument("--docs-per-course", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--child", nargs=2, metavar=("INDEX_PATH", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run(args.child[0], args.child[1], args)))
+        return
+
+    from ragatouille import RAGPretrainedModel
+    from index_modes import index_nbits
+
+    docs = synthetic_documents(docs_per_course=args.docs_per_course)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        builder = RAGPretrainedModel.from_pretrained("colbert-ir/colbertv2.0")
+        index_paths = {}
+        for nbits in args.nbits:
+            with index_nbits(nbits), contextlib.redirect_stdout(io.StringIO()):
+                index_paths[nbits] = builder.index(collection=[d["text"] for d in docs], index_name=f"bench-{nbits}bit",
+                                                   split_documents=True)
+        del builder
+
+        for nbits, index_path in index_paths.items():
+            for mode in args.modes:
+                output = subprocess.run([sys.executable, "-m", "benchmarks.bench_index_memory", *sys.argv[1:],
+                                         "--child", str(index_path), mode],
+                                        capture_output=True, text=True, check=True,
+                                        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
+                result = json.loads(output.stdout.strip().splitlines()[-1])
+                results.append(result)
+                print(f"{nbits}-bit {mode:>4}: {result['codes_residuals_mb']:6.1f} MB on disk, "
+                      f"{result['after_queries']['private_mb']:7.1f} MB private + "
+                      f"{result['after_queries']['file_mb']:6.1f} MB file-backed, load {result['load_s']:.1f} s, "
+                      f"p50 {result['latency']['p50_ms']:.0f} ms", file=sys.stderr)
+    print(json.dumps(results, indent=1))
+
+
+if __name__ == "__main__":
+    main()
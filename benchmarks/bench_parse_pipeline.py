@@ -0,0 +1,67 @@
+"""Benchmark document_pipeline.DocumentPipeline offline.
+
+    python -m benchmarks.bench_parse_pipeline --files 40 --remote 6
+
+Uses the in-memory S3 stand-in (with per-request latency), a CPU-bound stub
+for local parsing and an async stub with fixed latency for LlamaParse. The
+"serial" configuration (one worker per stage) approximates the previous
+one-file-at-a-time loop; the "cached" runs go through a fresh ParseCache
+twice (cold, then warm).
+"""
+import argparse
+import json
+import tempfile
+
+from benchmarks.fake_s3 import FakeS3
+from benchmarks.stubs import StubRemoteParser, cpu_parse
+from document_pipeline import PARSE_WORKERS, DocumentPipeline
+from parse_cache import ParseCache
+
+BUCKET = "canvas-files-autodoc"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--remote", type=int, default=6, help="how many files go to the remote parser")
+    parser.add_argument("--s3-latency", type=float, default=0.05)
+    parser.add_argument("--remote-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    fake = FakeS3(latency=args.s3_latency)
+    keys = [f"Course {i % 3}/Module {i % 5}/Lecture {i}.pdf" for i in range(args.files)]
+    for key in keys:
+        fake.put_object(Bucket=BUCKET, Key=key, Body=(f"Slides for {key}. " * 2000).encode())
+    remote_keys = keys[:args.remote]
+
+    results = []
+    cache = ParseCache(directory=tempfile.mkdtemp(prefix="parse-cache-"))
+    configs = (
+        ("serial", (1, 1, 1), None),
+        ("pipelined", (8, PARSE_WORKERS, 4), None),
+        ("cached-cold", (8, PARSE_WORKERS, 4), cache),
+        ("cached-warm", (8, PARSE_WORKERS, 4), cache),
+    )
+    for name, limits, cache in configs:
+        download_workers, parse_workers, remote_concurrency = limits
+        pipeline = DocumentPipeline(
+            fake, BUCKET,
+            remote_parser=StubRemoteParser(args.remote_latency),
+            remote_keys=remote_keys,
+            download_workers=download_workers,
+            parse_workers=parse_workers,
+            remote_concurrency=remote_concurrency,
+            local_parse_fn=cpu_parse,
+            cache=cache,
+        )
+        docs = sum(len(d) for _, d in pipeline.run(keys))
+        report = pipeline.report()
+        report.update(config=name, documents=docs)
+        results.append(report)
+        pipeline.print_report()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
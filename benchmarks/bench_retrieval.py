@@ -0,0 +1,74 @@
+"""Per-turn retrieval latency: rebuilt retriever per question vs. a persistent, warmed one.
+
+    python -m benchmarks.bench_retrieval --docs-per-course 20 --questions 50
+
+Builds a synthetic ColBERT index in a temporary directory (requires
+ragatouille and the colbertv2.0 checkpoint), then reports p50/p95 for:
+  per_turn   rag.as_langchain_retriever(k=8) created inside every turn (old retrieve node)
+  persistent one retriever built at startup and warmed with a query (current retrieve node)
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.corpus import synthetic_documents, synthetic_questions
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"p50_ms": 1000 * pick(0.50), "p95_ms": 1000 * pick(0.95), "p99_ms": 1000 * pick(0.99), "n": len(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs-per-course", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--k", type=int, default=8)
+    args = parser.parse_args()
+
+    from ragatouille import RAGPretrainedModel
+
+    docs = synthetic_documents(docs_per_course=args.docs_per_course)
+    questions = [q["question"] for q in synthetic_questions(docs, n=args.questions)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        builder = RAGPretrainedModel.from_pretrained("colbert-ir/colbertv2.0")
+        index_path = builder.index(collection=[d["text"] for d in docs], index_name="bench", split_documents=True)
+        del builder
+
+        started = time.perf_counter()
+        rag = RAGPretrainedModel.from_index(index_path)
+        load_seconds = time.perf_counter() - started
+
+        per_turn = []
+        for question in questions:
+            started = time.perf_counter()
+            rag.as_langchain_retriever(k=args.k).invoke(question)
+            per_turn.append(time.perf_counter() - started)
+
+        rag = RAGPretrainedModel.from_index(index_path)
+        retriever = rag.as_langchain_retriever(k=args.k)
+        started = time.perf_counter()
+        retriever.invoke("What is the course schedule?")
+        warmup_seconds = time.perf_counter() - started
+        persistent = []
+        for question in questions:
+            started = time.perf_counter()
+            retriever.invoke(question)
+            persistent.append(time.perf_counter() - started)
+
+    print(json.dumps({
+        "passages": len(docs),
+        "index_load_s": load_seconds,
+        "warmup_s": warmup_seconds,
+        "per_turn": percentiles(per_turn),
+        "persistent": percentiles(persistent),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
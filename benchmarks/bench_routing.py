@@ -0,0 +1,93 @@
+"""Course routing: searching every course vs. only the course(s) a question is about.
+
+    python -m benchmarks.bench_routing --questions 100
+
+Indexes the synthetic corpus into benchmarks.stubs.StubColbert with the
+document ids and metadata rag_indexer.to_collection produces, then answers
+questions through the real graph (chat_interface.build_rag_graph) with and
+without a CourseRouter built from the document registry. Half the questions
+are about a lecture topic (half of those don't name the course), half are
+syllabus logistics ("When is the midterm for Geology?"). Reports how often
+a chunk of the right course and topic is retrieved, the share of retrieved
+chunks from the right course, off-course context tokens and per-question latency (the stub charges per candidate passage,
+as a search over fewer passages would cost less).
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from benchmarks.bench_retrieval import percentiles
+from benchmarks.corpus import synthetic_documents, synthetic_questions
+from benchmarks.fixtures import indexed_passages
+from benchmarks.stubs import StubColbert, fake_streaming_chat_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--docs-per-course", type=int, default=40)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--per-candidate-ms", type=float, default=0.1)
+    args = parser.parse_args()
+
+    from langchain_core.prompts import ChatPromptTemplate
+
+    from batching_retriever import BatchingRetriever
+    from chat_interface import build_rag_graph
+    from conversation_memory import count_tokens
+    from course_router import CourseRouter
+
+    docs = synthetic_documents(docs_per_course=args.docs_per_course)
+    passages, registry = indexed_passages(docs)
+
+    topics = {doc["key"]: doc["topic"] for doc in docs}
+    questions = [question for question in synthetic_questions(docs, n=args.questions)
+                 if topics[question["expected_sources"][0]] != "syllabus"][:args.questions // 2]
+    for question in questions:
+        question["topic"] = topics[question["expected_sources"][0]]
+    for question in questions[::2]:
+        # Drop the course name so only the topic can route the question
+        question["question"] = question["question"].replace(f"does {question['course']} teach", "is taught")
+    # Logistics questions: every course's syllabus uses the same words, only the course name tells them apart
+    courses = sorted({doc["course"] for doc in docs})
+    logistics = ["When is the midterm for {}?", "What is the late policy in {}?", "When are office hours for {}?"]
+    for i in range(args.questions - len(questions)):
+        course = courses[i % len(courses)]
+        questions.append({"question": logistics[i % len(logistics)].format(course), "course": course,
+                          "topic": "syllabus"})
+
+    rag = StubColbert(passages, footprint_mb=1, call_overhead=0.005, per_query=0.002,
+                      per_candidate=args.per_candidate_ms / 1000)
+    llm = fake_streaming_chat_model("See the syllabus.", 0, 0)
+    prompt = ChatPromptTemplate.from_messages([("system", "{context}"), ("human", "{history}\n{question}")])
+    report = {}
+    for mode, router in (("all_courses", None), ("routed", CourseRouter(registry))):
+        graph = build_rag_graph(BatchingRetriever(rag, k=args.k), llm, prompt, router=router)
+        hits, on_course, off_course_tokens, latencies, routed = 0, 0, 0, [], 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for question in questions:
+                started = time.perf_counter()
+                result = graph.invoke({"question": question["question"], "history": []})
+                latencies.append(time.perf_counter() - started)
+                hits += any(doc.metadata["course"] == question["course"] and question["topic"] in doc.page_content
+                            for doc in result["context"])
+                for doc in result["context"]:
+                    if doc.metadata["course"] == question["course"]:
+                        on_course += 1
+                    else:
+                        off_course_tokens += count_tokens(doc.page_content)
+                routed += bool(result.get("courses"))
+        report[mode] = {
+            f"relevant@{args.k}": hits / len(questions),
+            "on_course_chunks": on_course / (len(questions) * args.k),
+            "off_course_tokens_per_question": off_course_tokens / len(questions),
+            "routed_questions": routed / len(questions),
+            "latency": percentiles(latencies),
+        }
+    print(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    main()
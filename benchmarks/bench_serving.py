@@ -0,0 +1,141 @@
+"""Multi-user load test: per-session models vs. one shared, batching retriever.
+
+    python -m benchmarks.bench_serving --users 1 10 50 --questions 5
+
+Each (mode, users) pair runs in a fresh subprocess. N simulated users chat
+concurrently, each asking `--questions` questions through the real
+retrieve → generate graph (chat_interface.build_rag_graph) with a fake chat
+model. The index is benchmarks.stubs.StubColbert (resident footprint plus
+a per-call + per-query search cost on one encoder); pass `--index PATH` to
+use a real RAGatouille index instead.
+  per_session     every session builds its own model + graph (old st.session_state)
+  shared          one model and graph, one rag.search per question
+  shared_batched  one model and graph behind BatchingRetriever
+Reports resident memory per session, throughput and per-question latency.
+"""
+import argparse
+import contextlib
+import io
+import json
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.bench_retrieval import percentiles
+from benchmarks.corpus import synthetic_documents, synthetic_questions
+from benchmarks.stubs import StubColbert, fake_streaming_chat_model
+
+MODES = ("per_session", "shared", "shared_batched")
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class PlainRetriever:
+    """One rag.search per question, like rag.as_langchain_retriever"""
+    def __init__(self, rag, k):
+        self.rag = rag
+        self.k = k
+
+    def invoke(self, question, config=None):
+        from batching_retriever import _to_documents
+        return _to_documents(self.rag.search(question, k=self.k))
+
+
+def run(mode, users, questions_per_user, args):
+    from langchain_core.prompts import ChatPromptTemplate
+
+    from batching_retriever import BatchingRetriever
+    from chat_interface import build_rag_graph
+    from conversation_memory import ConversationMemory, extractive_summarizer
+
+    docs = synthetic_documents()
+    questions = [q["question"] for q in synthetic_questions(docs, n=users * questions_per_user)]
+    passages = [d["text"] for d in docs]
+    prompt = ChatPromptTemplate.from_messages([("system", "{context}"), ("human", "{history}\n{question}")])
+
+    def load_model():
+        if args.index:
+            from ragatouille import RAGPretrainedModel
+            return RAGPretrainedModel.from_index(args.index)
+        return StubColbert(passages, footprint_mb=args.footprint_mb)
+
+    def make_graph(rag):
+        llm = fake_streaming_chat_model("The answer is in the syllabus.", args.llm_delay, 0)
+        retriever = BatchingRetriever(rag, k=args.k) if mode == "shared_batched" else PlainRetriever(rag, args.k)
+        return build_rag_graph(retriever, llm, prompt), retriever
+
+    baseline = rss_mb()
+    shared_graph, shared_retriever = make_graph(load_model()) if mode != "per_session" else (None, None)
+    latencies, lock = [], threading.Lock()
+    sessions_ready = threading.Barrier(users + 1)
+
+    def user(u):
+        graph = shared_graph or make_graph(load_model())[0]
+        memory = ConversationMemory(summarize=extractive_summarizer)
+        sessions_ready.wait()
+        for question in questions[u * questions_per_user:(u + 1) * questions_per_user]:
+            started = time.perf_counter()
+            result = graph.invoke({"question": question, **memory.inputs()})
+            with lock:
+                latencies.append(time.perf_counter() - started)
+            memory.add_turn(question, result["answer"])
+
+    threads = [threading.Thread(target=user, args=(u,)) for u in range(users)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        sessions_ready.wait()
+        loaded = rss_mb()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "users": users,
+        "rss_mb": loaded,
+        "rss_per_session_mb": (loaded - baseline) / users,
+        "questions_per_s": len(latencies) / elapsed,
+        "latency": percentiles(latencies),
+        "retriever": shared_retriever.report() if mode == "shared_batched" else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--footprint-mb", type=int, default=100)
+    parser.add_argument("--llm-delay", type=float, default=0.05)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--index", help="path to a real RAGatouille index instead of the stub")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "USERS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run(args.child[0], int(args.child[1]), args.questions, args)))
+        return
+
+    results = []
+    for users in args.users:
+        for mode in args.modes:
+            output = subprocess.run([sys.executable, "-m", "benchmarks.bench_serving", *sys.argv[1:],
+                                     "--child", mode, str(users)], capture_output=True, text=True, check=True)
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{mode:>14} {users:>4} users: {result['rss_per_session_mb']:7.1f} MB/session, "
+                  f"{result['questions_per_s']:6.1f} q/s, p95 {result['latency']['p95_ms']:.0f} ms", file=sys.stderr)
+    print(json.dumps(results, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Perceived latency of an answer: blocking invoke vs. token streaming.
+
+    python -m benchmarks.bench_streaming --questions 10 --answer-words 150
+
+Builds the real retrieve → generate graph (chat_interface.build_rag_graph)
+around a stub retriever and a fake chat model that streams word by word,
+then reports for each mode the time until the user sees text:
+  invoke  graph.invoke, nothing is shown until the completion is done
+  stream  AnswerStream over stream_mode="messages", time to first token
+The streamed tokens are checked to join up to the same answer.
+"""
+import argparse
+import json
+import time
+
+from benchmarks.bench_retrieval import percentiles
+from benchmarks.stubs import fake_streaming_chat_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--answer-words", type=int, default=150)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    from langchain_core.documents import Document
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.runnables import RunnableLambda
+
+    from answer_stream import AnswerStream
+    from chat_interface import build_rag_graph
+
+    answer = " ".join(f"word{i}" for i in range(args.answer_words))
+    llm = fake_streaming_chat_model(answer, args.first_token_delay, args.token_delay)
+    retriever = RunnableLambda(lambda question: [Document(page_content=f"Context for {question}")])
+    prompt = ChatPromptTemplate.from_messages([("human", "{history}\n{context}\n{question}")])
+    graph = build_rag_graph(retriever, llm, prompt)
+
+    invoke, first_token, total = [], [], []
+    for i in range(args.questions):
+        inputs = {"question": f"Question {i}?", "history": []}
+        started = time.perf_counter()
+        result = graph.invoke(inputs)
+        invoke.append(time.perf_counter() - started)
+
+        stream = AnswerStream(graph, inputs)
+        tokens = list(stream)
+        assert "".join(tokens) == result["answer"] == stream.answer, "streamed tokens differ from the answer"
+        first_token.append(stream.ttft_s)
+        total.append(stream.latency_s)
+
+    print(json.dumps({
+        "answer_tokens": len(tokens),
+        "invoke_visible": percentiles(invoke),
+        "stream_first_token": percentiles(first_token),
+        "stream_total": percentiles(total),
+    }, indent=1))
+
+
+if __name__ == "__main__":
+    main()
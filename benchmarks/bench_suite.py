@@ -0,0 +1,230 @@
+"""End-to-end offline benchmark suite: crawl, index build, index download and chat turns in one JSON report.
+
+    python -m benchmarks.bench_suite --size small --output before.json
+    python -m benchmarks.bench_suite --size small --output after.json --compare before.json
+
+Runs the real canvas_api, rag_indexer and chat_interface code paths against
+local stand-ins, in a temporary working directory:
+  Canvas    benchmarks.mock_canvas.MockCanvas, paginated with `Link` headers,
+            serving a synthetic corpus (benchmarks.corpus) as plain-text files
+  S3        benchmarks.fake_s3.FakeS3, in memory, with per-request latency and bandwidth
+  parsing   stubs.text_parse for the local (unstructured) stage and
+            StubRemoteParser for LlamaParse (syllabi are classified as important)
+  LLM       fake_streaming_chat_model for the chat model, the prompt hub and the classifier
+ColBERT is not replaced: ragatouille and the colbertv2.0 checkpoint must be
+available locally. Stages, each with its telemetry spans:
+  crawl           canvas_api.sync_courses into the fake bucket
+  index_build     rag_indexer.ingest_pdfs_into_rag: parse, chunk, encode, upload
+  index_download  common.download_index_from_s3 into an empty directory
+  chat            create_rag_chat_bot, then AnswerStream turns: first token and total p50/p95/p99
+`--size` picks the corpus size; the other flags override single settings.
+The report records the configuration and git revision, so reports from two
+commits can be compared with `--compare` (timings only, new vs. old).
+"""
+import argparse
+import contextlib
+import functools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks.bench_retrieval import percentiles
+from benchmarks.corpus import TOPICS, synthetic_documents, synthetic_questions
+from benchmarks.fake_s3 import FakeS3
+from benchmarks.fixtures import benchmark_env
+from benchmarks.mock_canvas import MockCanvas
+from benchmarks.stubs import StubRemoteParser, fake_streaming_chat_model, text_parse
+
+SIZES = {
+    "small": {"courses": 2, "modules": 3, "files": 4, "pages": 3, "questions": 20},
+    "medium": {"courses": 4, "modules": 5, "files": 8, "pages": 6, "questions": 50},
+    "large": {"courses": 8, "modules": 8, "files": 12, "pages": 10, "questions": 100},
+}
+MB = 1024 * 1024
+
+
+def git_revision():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def course_corpus(courses, modules, files, pages):
+    """Synthetic documents for `courses` courses of `modules` x `files` files, plus the files as served by Canvas"""
+    names = (list(TOPICS) + [f"Course {c}" for c in range(len(TOPICS), courses)])[:courses]
+    # One syllabus per course is added by synthetic_documents
+    docs = synthetic_documents(docs_per_course=modules * files - 1, pages_per_doc=pages, courses=names)
+    by_key = defaultdict(list)
+    for doc in docs:
+        by_key[doc["key"]].append(doc["text"])
+    # Pages are separated by form feeds, which stubs.text_parse splits on
+    served = [(key.rsplit("/", 1)[1], "\f".join(texts).encode()) for key, texts in by_key.items()]
+    return names, docs, served
+
+
+def span_delta(before, after):
+    """Telemetry spans recorded between two telemetry.report() snapshots"""
+    spans = {}
+    for name, stats in after["spans"].items():
+        old = before["spans"].get(name, {"count": 0, "sum_s": 0.0})
+        if stats["count"] > old["count"]:
+            spans[name] = {"count": stats["count"] - old["count"], "sum_s": stats["sum_s"] - old["sum_s"]}
+    return spans
+
+
+@contextlib.contextmanager
+def stage(report, name, telemetry):
+    """Time a stage and attach the spans it recorded; progress goes to stderr so stdout stays JSON"""
+    print(f"▶️ {name}", file=sys.stderr)
+    result = report[name] = {}
+    before = telemetry.report()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        yield result
+    result["seconds"] = time.perf_counter() - started
+    result["spans"] = span_delta(before, telemetry.report())
+
+
+def run(args, workdir):
+    benchmark_env()
+    # rag_indexer reads the classification store and parse cache relative to the working directory
+    os.chdir(os.path.join(workdir, "indexer"))
+
+    import canvas_api
+    import chat_interface
+    import common
+    import rag_indexer
+    from document_classifer import CourseFileClassifier
+    from document_pipeline import DocumentPipeline
+    from index_modes import index_info
+    from langchain_core.prompts import ChatPromptTemplate
+    from telemetry import telemetry
+
+    fake_s3 = FakeS3(latency=args.s3_latency, bandwidth=args.s3_bandwidth_mb * MB)
+    common.s3 = fake_s3
+    names, docs, served = course_corpus(args.courses, args.modules, args.files, args.pages)
+    report = {}
+
+    with MockCanvas(args.courses, args.modules, args.files, latency=args.canvas_latency,
+                    course_names=names, documents=served) as canvas:
+        canvas_api.BASE_URL = canvas.base_url
+        with stage(report, "crawl", telemetry) as result:
+            sync = canvas_api.sync_courses(max_workers=args.workers, enrolled_courses=canvas.course_names)
+        result.update(files=sync["files"], failed=sync["failed"], bytes=sync["bytes"], requests=canvas.requests)
+
+    # Syllabi are answered by the local classifier; the LLM only ever sees ambiguous names. Labels go to a
+    # store in the work directory, never the tracked relevant_documents.csv
+    rag_indexer._doc_classifier = CourseFileClassifier(
+        llm=fake_streaming_chat_model("{}", first_token_delay=0, token_delay=0),
+        store_path=os.path.join(workdir, "indexer", "classifications.csv"))
+    rag_indexer._parser = StubRemoteParser(latency=args.parse_latency)
+    rag_indexer.DocumentPipeline = functools.partial(DocumentPipeline, local_parse_fn=text_parse)
+    written_before = fake_s3.bytes_written
+    with stage(report, "index_build", telemetry) as result:
+        built = rag_indexer.ingest_pdfs_into_rag() is not None
+    result["ok"] = built
+    if not built:
+        return report
+    result.update(index_info(common.get_index_dir()), bytes_uploaded=fake_s3.bytes_written - written_before,
+                  chunks=sum(len(entry["doc_ids"]) for entry in common.load_document_registry().values()))
+
+    os.chdir(os.path.join(workdir, "chat"))
+    read_before = fake_s3.bytes_read
+    with stage(report, "index_download", telemetry) as result:
+        result["ok"] = common.download_index_from_s3()
+    result["bytes"] = fake_s3.bytes_read - read_before
+
+    answer = " ".join(f"word{i}" for i in range(args.answer_words))
+    llm = fake_streaming_chat_model(answer, args.first_token_delay, args.token_delay)
+    prompt = ChatPromptTemplate.from_messages([("human", "{history}\n{context}\n{question}")])
+    chat_interface.create_chat_model = lambda *_, **__: llm
+    chat_interface.load_prompt = lambda *_, **__: prompt
+    with stage(report, "chat", telemetry) as result:
+        started = time.perf_counter()
+        graph = chat_interface.create_rag_chat_bot(use_answer_cache=False)
+        result["startup_s"] = time.perf_counter() - started
+        first_token, total, breakdown = [], [], defaultdict(float)
+        questions = synthetic_questions(docs, n=args.questions)
+        for question in questions:
+            stream = chat_interface.stream_answer(graph, {"question": question["question"], "history": []})
+            "".join(stream)
+            first_token.append(stream.ttft_s)
+            total.append(stream.latency_s)
+            for name, seconds in stream.breakdown.items():
+                breakdown[name] += seconds or 0.0
+    result.update(first_token=percentiles(first_token), total=percentiles(total),
+                  mean_breakdown_ms={name: 1000 * seconds / len(questions) for name, seconds in breakdown.items()})
+    return report
+
+
+def timings(report, prefix=""):
+    """{dotted path: value} of every timing (keys ending in _s or _ms, and stage seconds) in a report"""
+    found = {}
+    for key, value in report.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            found.update(timings(value, f"{path}."))
+        elif isinstance(value, (int, float)) and key.endswith(("_s", "_ms", "seconds")):
+            found[path] = value
+    return found
+
+
+def compare(old, new):
+    print(f"📊 {new['revision']} vs. {old['revision']}:", file=sys.stderr)
+    if old["config"] != new["config"]:
+        print("⚠️ The reports were run with different settings", file=sys.stderr)
+    old_timings, new_timings = timings(old["stages"]), timings(new["stages"])
+    for path in sorted(new_timings.keys() & old_timings.keys()):
+        before, after = old_timings[path], new_timings[path]
+        change = f"{(after - before) / before:+.0%}" if before else "n/a"
+        print(f"   {path:<52} {before:10.3f} → {after:10.3f}  {change}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=SIZES, default="small")
+    for name in SIZES["small"]:
+        parser.add_argument(f"--{name}", type=int, help="override the --size preset")
+    parser.add_argument("--workers", type=int, default=8, help="crawl workers")
+    parser.add_argument("--canvas-latency", type=float, default=0.01, help="simulated Canvas latency per request (s)")
+    parser.add_argument("--s3-latency", type=float, default=0.005, help="simulated S3 latency per request (s)")
+    parser.add_argument("--s3-bandwidth-mb", type=float, default=200, help="simulated S3 bandwidth per read (MB/s)")
+    parser.add_argument("--parse-latency", type=float, default=0.2, help="stub LlamaParse latency per file (s)")
+    parser.add_argument("--answer-words", type=int, default=60)
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.001)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--compare", help="an earlier report to compare timings with")
+    args = parser.parse_args()
+    for name, value in SIZES[args.size].items():
+        if getattr(args, name) is None:
+            setattr(args, name, value)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    report = {"revision": git_revision(), "python": platform.python_version(), "config": config}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        for directory in ("indexer", "chat"):
+            os.makedirs(os.path.join(workdir, directory))
+        try:
+            report["stages"] = run(args, workdir)
+        finally:
+            os.chdir(cwd)
+
+    output = json.dumps(report, indent=1)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
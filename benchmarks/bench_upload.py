@@ -0,0 +1,82 @@
+"""Peak-RSS benchmark for canvas_api.upload_s3 against local Canvas/S3 stand-ins.
+
+    python -m benchmarks.bench_upload --sizes 10 100 1000
+
+Each (mode, size) pair runs in a fresh subprocess so ru_maxrss reflects only
+that transfer. "buffered" reproduces the old response.content + put_object
+path; "streaming" is the current upload_s3.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.fake_s3_server import FakeS3Server, client_for
+from benchmarks.fixtures import benchmark_env
+from benchmarks.mock_canvas import MockCanvas
+
+MB = 1024 * 1024
+
+
+def child(mode, canvas_url, s3_url):
+    benchmark_env()
+    import canvas_api
+    import common
+
+    common.s3 = client_for(s3_url)
+    canvas_api.BASE_URL = canvas_url
+    file_url = f"{canvas_url}/courses/0/files/0"
+
+    started = time.perf_counter()
+    if mode == "streaming":
+        status, size = canvas_api.upload_s3("Course 0", "Module 0", "big.pdf", file_url)
+    else:
+        session = canvas_api.get_session()
+        download_url = session.get(file_url).json()["url"]
+        body = session.get(download_url, stream=True).content
+        common.s3.put_object(Bucket=canvas_api.S3_BUCKET_NAME, Key="Course 0/Module 0/big.pdf", Body=body)
+        size = len(body)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "mode": mode,
+        "bytes": size,
+        "seconds": elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="file sizes in MB")
+    parser.add_argument("--modes", nargs="+", default=["buffered", "streaming"])
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "CANVAS_URL", "S3_URL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(*args.child)
+
+    results = []
+    with FakeS3Server() as s3_server:
+        for size in args.sizes:
+            with MockCanvas(courses=1, modules_per_course=1, files_per_module=1,
+                            file_size=size * MB, latency=0) as canvas:
+                for mode in args.modes:
+                    out = subprocess.run(
+                        [sys.executable, "-m", "benchmarks.bench_upload", "--child", mode,
+                         canvas.base_url, s3_server.endpoint_url],
+                        capture_output=True, text=True, check=True,
+                    ).stdout
+                    result = json.loads(out.strip().splitlines()[-1])
+                    result["size_mb"] = size
+                    results.append(result)
+                    print(f"{mode:>9} {size:>5} MB: peak RSS {result['peak_rss_mb']:.0f} MB "
+                          f"in {result['seconds']:.2f}s")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Focused checks of the indexing, routing, caching and sync building blocks, offline and in a second or so.
+
+    python -m benchmarks.check_units
+    python -m benchmarks.check_units --only bm25 router
+
+Each check builds its input from benchmarks.fixtures and asserts on the
+result: boilerplate stripping, course-scoped SimHash deduplication (and the
+files each dropped duplicate depends on), BM25 add/delete, the router's IDF
+scoring, answer cache scope keys and manifest tombstoning. Prints one line per
+check and exits non-zero if any fails.
+"""
+import argparse
+import json
+import tempfile
+import time
+
+from benchmarks.corpus import synthetic_documents
+from benchmarks.fixtures import StubGraph, benchmark_env, indexed_passages, slide_deck
+
+
+def check_boilerplate():
+    from chunker import Chunker
+
+    chunker = Chunker()
+    pages = chunker.strip_boilerplate([text for text, _ in slide_deck(pages=6)])
+    text = "\n".join(pages)
+    assert "Geology 101" not in text, "repeated header kept"
+    assert "Page 3 of 6" not in text, "page counter footer kept"
+    # Lines that differ only by a number other than a page counter are content
+    assert all(f"Week {i} covers" in pages[i - 1] for i in range(1, 7)), "per-page content dropped"
+    assert pages[0].count("| Week | Reading |") == 1, "markdown table row dropped"
+    assert chunker.stats["boilerplate_lines"] == 12, chunker.stats
+
+
+def check_simhash_scope():
+    from chunker import Chunker
+
+    deck = [(" ".join(f"word{i}" for i in range(120)), 1)]
+    chunker = Chunker()
+    assert len(chunker.chunk_file(deck, scope="Geology", owner="Geology/a.pdf")) == 1
+    # The same deck in another module of the course is dropped, in another course it is kept
+    assert chunker.chunk_file(deck, scope="Geology", owner="Geology/b.pdf") == []
+    assert len(chunker.chunk_file(deck, scope="French", owner="French/a.pdf")) == 1
+    assert chunker.duplicates_of == {"Geology/a.pdf": set(), "Geology/b.pdf": {"Geology/a.pdf"},
+                                     "French/a.pdf": set()}, chunker.duplicates_of
+    # A near-duplicate (one word changed) matches an already indexed chunk passed as `seen`
+    (_, _, fingerprint), = Chunker().chunk_file(deck)
+    near = [(deck[0][0].replace("word60", "changed"), 1)]
+    incremental = Chunker(seen=[("Geology", fingerprint, "Geology/a.pdf")])
+    assert incremental.chunk_file(near, scope="Geology", owner="Geology/c.pdf") == []
+    assert incremental.duplicates_of["Geology/c.pdf"] == {"Geology/a.pdf"}
+
+
+def check_dependents():
+    from rag_indexer import dependent_files
+
+    registry = {"G/a.pdf": {"duplicates_of": []}, "G/b.pdf": {"duplicates_of": ["G/a.pdf"]},
+                "G/c.pdf": {"duplicates_of": ["G/b.pdf"]}, "G/d.pdf": {}}
+    assert dependent_files(registry, ["G/a.pdf"]) == ["G/b.pdf", "G/c.pdf"]
+    assert dependent_files(registry, ["G/d.pdf"]) == []
+
+
+def check_bm25():
+    from lexical_index import BM25Index
+
+    passages, _ = indexed_passages(synthetic_documents(docs_per_course=4, pages_per_doc=1))
+    index = BM25Index().add([p["content"] for p in passages], [p["document_id"] for p in passages],
+                            [p["document_metadata"] for p in passages])
+    hits = index.search("igneous rocks", k=3)
+    assert hits and "igneous" in hits[0]["content"], hits
+    top = hits[0]["document_id"]
+    index.delete([top])
+    assert top not in {hit["document_id"] for hit in index.search("igneous rocks", k=len(passages))}
+    assert all(top not in postings for postings in index.postings.values()), "deleted document left in postings"
+    assert index.total_length == sum(doc["length"] for doc in index.documents.values())
+    # Re-adding an id replaces the document instead of counting it twice
+    index.add(["igneous igneous"], [top]).add(["igneous"], [top])
+    assert index.documents[top]["length"] == 1 and index.postings["igneous"][top] == 1
+    with tempfile.TemporaryDirectory() as tmp:
+        index.save(tmp)
+        loaded = BM25Index.load(tmp)
+    assert loaded.search("igneous rocks", k=3) == index.search("igneous rocks", k=3), "save/load changed results"
+
+
+def check_router():
+    from course_router import CourseRouter
+
+    _, registry = indexed_passages(synthetic_documents(docs_per_course=6, pages_per_doc=1))
+    router = CourseRouter(registry)
+    assert router.route("When is the midterm for Geology?") == ["Geology"]
+    assert router.route("Is there a French quiz?") == ["Elementary French"]
+    # Words in every course's paths (syllabus, module names) have zero IDF and never route
+    assert router.name_idf["geology"] > 0 and router.path_idf["syllabu"] == 0
+    assert router.route("Where is the syllabus?") == []
+    # One course-specific path word is not enough, two are
+    assert router.route("What about erosion?") == []
+    assert router.route("Compare igneous and sedimentary rocks") == ["Geology"]
+    assert set(router.doc_ids_for(["Geology"])) == {doc_id for key, entry in registry.items()
+                                                    if key.startswith("Geology/") for doc_id in entry["doc_ids"]}
+
+
+def check_cache_scope():
+    from answer_cache import CachedChatBot, SemanticAnswerCache
+    from course_router import CourseRouter
+
+    _, registry = indexed_passages(synthetic_documents(docs_per_course=2, pages_per_doc=1))
+    cache = SemanticAnswerCache()
+    graph = StubGraph()
+    bot = CachedChatBot(graph, cache, router=CourseRouter(registry))
+    geology = bot.invoke({"question": "When is the midterm for Geology?", "history": []})
+    french = bot.invoke({"question": "When is the midterm for Elementary French?", "history": []})
+    assert not geology["cached"] and not french["cached"] and geology["answer"] != french["answer"]
+    assert set(cache.entries) == {(("Geology",), "when is the midterm for geology"),
+                                  (("Elementary French",), "when is the midterm for elementary french")}
+    again = bot.invoke({"question": "when is the Geology midterm", "history": []})
+    assert again["cached"] and again["answer"] == geology["answer"], again
+    # The same text with explicit courses is a different key, and follow-ups bypass the cache
+    assert not bot.invoke({"question": "When is the midterm for Geology?", "courses": ["Elementary French"],
+                           "history": []})["cached"]
+    assert not bot.invoke({"question": "When is the midterm for Geology?", "history": [("user", "hi")]})["cached"]
+    assert graph.calls == 4
+
+
+def check_tombstones():
+    from sync_manifest import SyncManifest
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = SyncManifest(path=f"{tmp}/manifest.json")
+        meta = {"updated_at": "2026-01-01", "size": 10}
+        manifest.record(1, meta, "Geology/Module 1/notes.pdf", "aaa")
+        manifest.record(1, meta, "Geology/Module 2/notes.pdf", "aaa")
+        manifest.record(2, meta, "Geology/Module 1/old.pdf", "bbb")
+        manifest.record(3, meta, "French/Module 1/old.pdf", "ccc")
+        # Next sync: only the first copy of file 1 is still listed
+        manifest.seen_keys = {"Geology/Module 1/notes.pdf"}
+        removed = manifest.tombstone_missing({"Geology"})
+    assert sorted(removed) == ["Geology/Module 1/old.pdf", "Geology/Module 2/notes.pdf"], removed
+    assert manifest.get(1)["s3_keys"] == ["Geology/Module 1/notes.pdf"] and not manifest.get(1).get("deleted_at")
+    assert manifest.get(2)["deleted_at"] and manifest.lookup(2, meta) is None
+    # French wasn't fully crawled, so its unseen file is left alone
+    assert not manifest.get(3).get("deleted_at")
+
+
+CHECKS = {
+    "boilerplate": check_boilerplate,
+    "simhash_scope": check_simhash_scope,
+    "dependents": check_dependents,
+    "bm25": check_bm25,
+    "router": check_router,
+    "cache_scope": check_cache_scope,
+    "tombstones": check_tombstones,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--only", nargs="+", choices=sorted(CHECKS), help="run only these checks")
+    args = parser.parse_args()
+
+    benchmark_env()
+    results = {}
+    for name in args.only or CHECKS:
+        started = time.perf_counter()
+        try:
+            CHECKS[name]()
+            results[name] = {"ok": True}
+        except Exception as e:
+            results[name] = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        results[name]["seconds"] = time.perf_counter() - started
+        print(f"{'✅' if results[name]['ok'] else '❌'} {name}", flush=True)
+    print(json.dumps(results, indent=1))
+    failed = [name for name, result in results.items() if not result["ok"]]
+    if failed:
+        raise SystemExit(f"❌ {len(failed)} check(s) failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
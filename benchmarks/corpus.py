@@ -0,0 +1,67 @@
+"""Deterministic synthetic course corpora for the offline benchmarks."""
+import random
+
+TOPICS = {
+    "Geology": ["igneous rocks", "sedimentary rocks", "weathering", "plate tectonics", "minerals", "erosion"],
+    "Semiconductor Devices": ["pn junction", "carrier density", "diode equation", "mobility", "diffusion", "solar cells"],
+    "Elementary French": ["passé composé", "articles", "verb conjugation", "pronunciation", "vocabulary", "culture"],
+    "ECE Design Experience": ["design review", "project proposal", "final report", "poster", "interim demo", "ethics"],
+}
+FILLER = ("students will", "the lecture covers", "examples include", "see the textbook for", "recall that",
+          "in this module we discuss", "an important result is", "practice problems on")
+
+
+def synthetic_documents(docs_per_course=20, pages_per_doc=3, words_per_page=180, seed=0, courses=None):
+    """Return [{"key", "course", "module", "page", "topic", "text"}] with topic-specific vocabulary"""
+    rng = random.Random(seed)
+    docs = []
+    for course in courses or TOPICS:
+        topics = TOPICS.get(course, [f"{course.lower()} topic {i}" for i in range(6)])
+        for d in range(docs_per_course):
+            topic = topics[d % len(topics)]
+            module = f"Module {d % 5 + 1}"
+            key = f"{course}/{module}/Lecture {d + 1} {topic.title()}.pdf"
+            for page in range(pages_per_doc):
+                words = []
+                while len(words) < words_per_page:
+                    words += rng.choice(FILLER).split() + topic.split() + [rng.choice(topics)]
+                header = f"{course} — Lecture {d + 1}: {topic}. Page {page + 1}."
+                docs.append({"key": key, "course": course, "module": module, "page": page + 1, "topic": topic,
+                             "text": header + " " + " ".join(words[:words_per_page])})
+        # Every course gets a syllabus with dates and policies
+        syllabus_key = f"{course}/Syllabus/{course} Syllabus.pdf"
+        docs.append({"key": syllabus_key, "course": course, "module": "Syllabus", "page": 1, "topic": "syllabus",
+                     "text": f"{course} syllabus. The midterm exam is on March {rng.randint(1, 28)}. "
+                             f"Late policy: assignments lose 10% per day. Office hours are Tuesdays."})
+    return docs
+
+
+def synthetic_questions(docs, n=50, seed=1):
+    """Questions labelled with the S3 key(s) that answer them"""
+    rng = random.Random(seed)
+    questions = []
+    by_key = {}
+    for doc in docs:
+        by_key.setdefault(doc["key"], doc)
+    keys = sorted(by_key)
+    for _ in range(n):
+        doc = by_key[rng.choice(keys)]
+        if doc["module"] == "Syllabus":
+            text = f"When is the midterm for {doc['course']}?"
+        else:
+            text = f"What does {doc['course']} teach about {doc['topic']}?"
+        questions.append({"question": text, "expected_sources": [doc["key"]], "course": doc["course"]})
+    return questions
+
+
+def lookup_questions(docs, n=50, seed=2):
+    """Exact-term lookups ("What is in Lecture 7 of Geology?") labelled with the S3 key that answers them"""
+    rng = random.Random(seed)
+    lectures = sorted({(doc["course"], doc["key"]) for doc in docs if doc["module"] != "Syllabus"})
+    questions = []
+    for _ in range(n):
+        course, key = rng.choice(lectures)
+        number = key.rsplit("/", 1)[1].split()[1]
+        questions.append({"question": f"What is in Lecture {number} of {course}?", "expected_sources": [key],
+                          "course": course})
+    return questions
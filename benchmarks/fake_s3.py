@@ -0,0 +1,135 @@
+"""In-memory stand-in for the subset of the boto3 S3 client the repo uses."""
+import hashlib
+import io
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+
+class FakeS3:
+    """Stores objects in a dict; only counts bytes unless keep_bodies is set"""
+    def __init__(self, keep_bodies=True, latency=0.0, bandwidth=None):
+        self.keep_bodies = keep_bodies
+        # Simulated per-request latency (s) and per-request bandwidth (bytes/s) for reads
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.bytes_read = 0
+        self.objects = {}
+        self.bytes_written = 0
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _store(self, bucket, key, body):
+        with self._lock:
+            self.bytes_written += len(body)
+            self.objects[(bucket, key)] = body if self.keep_bodies else b""
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        self._count("put_object")
+        if isinstance(Body, str):
+            Body = Body.encode()
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+        self._store(Bucket, Key, bytes(Body))
+        return {"ETag": '"fake"'}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, Config=None, **kwargs):
+        self._count("upload_fileobj")
+        chunk_size = getattr(Config, "multipart_chunksize", 8 * 1024 * 1024)
+        parts = []
+        while True:
+            chunk = Fileobj.read(chunk_size)
+            if not chunk:
+                break
+            if self.keep_bodies:
+                parts.append(chunk)
+            with self._lock:
+                self.bytes_written += len(chunk)
+        with self._lock:
+            self.objects[(Bucket, Key)] = b"".join(parts)
+
+    def download_fileobj(self, Bucket, Key, Fileobj, **kwargs):
+        Fileobj.write(self.get_object(Bucket=Bucket, Key=Key)["Body"].read())
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        with open(Filename, "wb") as f:
+            self.download_fileobj(Bucket, Key, f)
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        self._count("upload_file")
+        with open(Filename, "rb") as f:
+            self._store(Bucket, Key, f.read())
+
+    def _etag(self, body):
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def _error(self, code, operation, key):
+        """The ClientError boto3 raises, so callers' error handling is exercised as against S3"""
+        return ClientError({"Error": {"Code": code, "Message": key}}, operation)
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._count("head_object")
+        if (Bucket, Key) not in self.objects:
+            raise self._error("404", "HeadObject", Key)
+        body = self.objects[(Bucket, Key)]
+        return {"ContentLength": len(body), "ETag": self._etag(body)}
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None, **kwargs):
+        self._count("get_object")
+        time.sleep(self.latency)
+        if (Bucket, Key) not in self.objects:
+            raise self._error("NoSuchKey", "GetObject", Key)
+        body = self.objects[(Bucket, Key)]
+        if IfMatch is not None and IfMatch != self._etag(body):
+            raise self._error("PreconditionFailed", "GetObject", Key)
+        if Range:
+            body = body[int(Range.split("=")[1].split("-")[0]):]
+        if self.bandwidth:
+            time.sleep(len(body) / self.bandwidth)
+        with self._lock:
+            self.bytes_read += len(body)
+        return {"Body": io.BytesIO(body), "ContentLength": len(body), "ETag": self._etag(body)}
+
+    def list_objects_v2(self, Bucket, Prefix="", Delimiter=None, **kwargs):
+        self._count("list_objects_v2")
+        time.sleep(self.latency)
+        with self._lock:
+            items = sorted((key, body) for (bucket, key), body in self.objects.items()
+                           if bucket == Bucket and key.startswith(Prefix))
+        response = {}
+        if Delimiter:
+            # Keys with the delimiter past the prefix roll up into one CommonPrefixes entry each
+            prefixes = sorted({Prefix + key[len(Prefix):].split(Delimiter)[0] + Delimiter
+                               for key, _ in items if Delimiter in key[len(Prefix):]})
+            items = [(key, body) for key, body in items if Delimiter not in key[len(Prefix):]]
+            if prefixes:
+                response["CommonPrefixes"] = [{"Prefix": prefix} for prefix in prefixes]
+        contents = [{"Key": key, "Size": len(body), "ETag": self._etag(body)} for key, body in items]
+        if contents:
+            response["Contents"] = contents
+        response["KeyCount"] = len(contents) + len(response.get("CommonPrefixes", []))
+        return response
+
+    def get_paginator(self, name):
+        client = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                yield getattr(client, name)(**kwargs)
+
+        return Paginator()
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self._count("copy_object")
+        with self._lock:
+            self.objects[(Bucket, Key)] = self.objects[(CopySource["Bucket"], CopySource["Key"])]
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._count("delete_object")
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
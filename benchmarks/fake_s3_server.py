@@ -0,0 +1,133 @@
+"""Minimal S3-compatible HTTP endpoint for exercising real boto3 transfers.
+
+Implements PutObject and the multipart upload calls (create / upload part /
+complete / abort). Bodies are read and discarded; only byte counts are kept,
+so multi-GB uploads cost the server no memory.
+"""
+import hashlib
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def client_for(endpoint_url):
+    """boto3 S3 client for a FakeS3Server endpoint"""
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id="fake",
+        aws_secret_access_key="fake",
+        region_name="us-east-2",
+        config=Config(
+            s3={"addressing_style": "path"},
+            retries={"max_attempts": 5, "mode": "standard"},
+            request_checksum_calculation="when_required",
+            response_checksum_validation="when_required",
+        ),
+    )
+
+
+class FakeS3Server:
+    def __init__(self):
+        self.objects = {}
+        self.parts = 0
+        self._uploads = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def endpoint_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def client(self):
+        """boto3 S3 client pointed at this server"""
+        return client_for(self.endpoint_url)
+
+    def _handler(self):
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _drain(self):
+                remaining = int(self.headers.get("Content-Length", "0"))
+                digest = hashlib.md5()
+                size = 0
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    remaining -= len(chunk)
+                return size, digest.hexdigest()
+
+            def _send(self, status, body=b"", headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_PUT(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                size, etag = self._drain()
+                with store._lock:
+                    if "uploadId" in query:
+                        store.parts += 1
+                        store._uploads[query["uploadId"][0]] += size
+                    else:
+                        store.objects[parsed.path] = size
+                self._send(200, headers={"ETag": f'"{etag}"'})
+
+            def do_POST(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query, keep_blank_values=True)
+                self._drain()
+                if "uploads" in query:
+                    upload_id = uuid.uuid4().hex
+                    with store._lock:
+                        store._uploads[upload_id] = 0
+                    bucket, key = parsed.path.lstrip("/").split("/", 1)
+                    body = (f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                            f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>")
+                    return self._send(200, body.encode())
+                with store._lock:
+                    store.objects[parsed.path] = store._uploads.pop(query["uploadId"][0], 0)
+                body = '<CompleteMultipartUploadResult><ETag>"done"</ETag></CompleteMultipartUploadResult>'
+                self._send(200, body.encode())
+
+            def do_DELETE(self):
+                query = parse_qs(urlparse(self.path).query)
+                with store._lock:
+                    store._uploads.pop(query.get("uploadId", [""])[0], None)
+                self._send(204)
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,44 @@
+"""Fixtures shared by the benchmarks and checks: credentials, indexed corpora, slide decks and a stub graph."""
+import os
+
+BENCHMARK_SECRETS = ("CANVAS_API_TOKEN", "OPENAI_API_KEY", "LANGCHAIN_API_KEY", "LLAMA_CLOUD_API_KEY")
+
+
+def benchmark_env():
+    """Placeholder API keys, so nothing prompts for a real one (already-set keys are kept)"""
+    for name in BENCHMARK_SECRETS:
+        os.environ.setdefault(name, "benchmark")
+
+
+def indexed_passages(docs):
+    """RAGatouille-shaped passages and a document registry for corpus.synthetic_documents, one chunk per page.
+
+    Ids ("<s3 key>#<n>") and metadata match what rag_indexer.to_collection produces.
+    """
+    passages, registry = [], {}
+    for doc in docs:
+        doc_id = f"{doc['key']}#{doc['page'] - 1}"
+        registry.setdefault(doc["key"], {"doc_ids": []})["doc_ids"].append(doc_id)
+        parts = doc["key"].split("/")
+        passages.append({"content": f"Document: {doc['text']}", "document_id": doc_id, "document_metadata": {
+            "source_key": doc["key"], "course": parts[0], "module": "/".join(parts[1:-1]), "file": parts[-1],
+            "page": doc["page"]}})
+    return passages, registry
+
+
+def slide_deck(pages=6, course="Geology 101", topics=None):
+    """[(page text, page number)] of a deck with a course header, a "Page i of n" footer and a table per page"""
+    topics = topics or [f"Week {i} covers topic {i} with worked examples and practice problems" for i in
+                        range(1, pages + 1)]
+    return [(f"{course} — Spring Term\n{topic}\n| Week | Reading |\n| --- | --- |\nPage {i} of {pages}", i)
+            for i, topic in enumerate(topics[:pages], 1)]
+
+
+class StubGraph:
+    """Compiled-graph stand-in that answers every question with a new numbered answer"""
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, inputs, config=None):
+        self.calls += 1
+        return {**inputs, "context": [], "answer": f"answer {self.calls}"}
@@ -0,0 +1,225 @@
+"""Local stand-in for the Canvas REST API used by the benchmarks.
+
+Serves courses → modules → module items → file metadata → file bytes with
+Canvas-style `Link` pagination headers and an optional per-request delay.
+Files are a repeated byte pattern of `file_size` bytes, or the given
+`documents` ((title, body) pairs, assigned to file ids in order). Listing
+pages carry an ETag and answer a matching If-None-Match with 304. With
+`rate_limit` set, API calls draw `rate_cost` units from a bucket of that size
+refilled at `rate_refill` units/s, reported in `X-Rate-Limit-Remaining`; an
+empty bucket answers 403 "Rate Limit Exceeded", as Canvas does.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class MockCanvas:
+    """Synthetic course tree served over HTTP on localhost"""
+    def __init__(self, courses=2, modules_per_course=4, files_per_module=5,
+                 file_size=64 * 1024, page_size=10, latency=0.01, course_names=None, documents=None,
+                 rate_limit=None, rate_cost=50, rate_refill=200):
+        self.courses = courses
+        self.names = list(course_names or [f"Course {c}" for c in range(courses)])
+        self.documents = documents
+        self.modules_per_course = modules_per_course
+        self.files_per_module = files_per_module
+        self.file_size = file_size
+        self.page_size = page_size
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_cost = rate_cost
+        self.rate_refill = rate_refill
+        self.requests = 0
+        self.throttled = 0
+        self.not_modified = 0
+        self._bucket = rate_limit
+        self._bucket_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def course_names(self):
+        return set(self.names)
+
+    @property
+    def total_files(self):
+        return self.courses * self.modules_per_course * self.files_per_module
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/api/v1"
+
+    def file_block(self, file_id, block_size=64 * 1024):
+        pattern = f"file-{file_id}-".encode()
+        return (pattern * (block_size // len(pattern) + 1))[:block_size - block_size % len(pattern)]
+
+    def document(self, file_id):
+        """(title, body) of a file, or None when serving the byte pattern"""
+        return self.documents[file_id % len(self.documents)] if self.documents else None
+
+    def file_title(self, file_id):
+        return self.document(file_id)[0] if self.documents else f"Lecture {file_id}.pdf"
+
+    def file_length(self, file_id):
+        return len(self.document(file_id)[1]) if self.documents else self.file_size
+
+    def file_bytes(self, file_id):
+        if self.documents:
+            return self.document(file_id)[1]
+        block = self.file_block(file_id)
+        return (block * (self.file_size // len(block) + 1))[:self.file_size]
+
+    def _draw(self):
+        """Take one API call from the rate-limit bucket; returns the units left (negative: throttled)"""
+        with self._lock:
+            now = time.monotonic()
+            self._bucket = min(self.rate_limit, self._bucket + (now - self._bucket_at) * self.rate_refill)
+            self._bucket_at = now
+            if self._bucket < self.rate_cost:
+                self.throttled += 1
+                return -1
+            self._bucket -= self.rate_cost
+            return self._bucket
+
+    def _courses(self):
+        return [{"id": c, "name": self.names[c]} for c in range(self.courses)]
+
+    def _modules(self, course_id):
+        return [
+            {"id": m, "name": f"Module {m}",
+             "items_url": f"{self.base_url}/courses/{course_id}/modules/{m}/items"}
+            for m in range(self.modules_per_course)
+        ]
+
+    def _items(self, course_id, module_id):
+        items = []
+        for f in range(self.files_per_module):
+            file_id = (course_id * self.modules_per_course + module_id) * self.files_per_module + f
+            items.append({
+                "id": file_id,
+                "type": "File",
+                "title": self.file_title(file_id),
+                "url": f"{self.base_url}/courses/{course_id}/files/{file_id}",
+            })
+        # Non-file items are skipped by the crawler but still cost a page
+        items.append({"id": -1, "type": "Page", "title": "Overview", "url": ""})
+        return items
+
+    def _file_metadata(self, file_id):
+        host, port = self._server.server_address
+        return {
+            "id": file_id,
+            "display_name": self.file_title(file_id),
+            "size": self.file_length(file_id),
+            "updated_at": "2025-01-01T00:00:00Z",
+            "url": f"http://{host}:{port}/files/{file_id}/download",
+        }
+
+    def _handler(self):
+        canvas = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_file(self, file_id):
+                # Stream the body in blocks so multi-GB files never sit in the server's memory
+                start = 0
+                match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+                if match:
+                    start = int(match[1])
+                self.send_response(206 if match else 200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(canvas.file_length(file_id) - start))
+                self.end_headers()
+                if canvas.documents:
+                    self.wfile.write(canvas.file_bytes(file_id)[start:])
+                    return
+                block = canvas.file_block(file_id)
+                offset = start
+                while offset < canvas.file_size:
+                    piece = block[offset % len(block):][:canvas.file_size - offset]
+                    self.wfile.write(piece)
+                    offset += len(piece)
+
+            def _send_page(self, items, path, query):
+                page = int(query.get("page", ["1"])[0])
+                per_page = int(query.get("per_page", [str(canvas.page_size)])[0])
+                start = (page - 1) * per_page
+                headers = dict(self.rate_headers)
+                if start + per_page < len(items):
+                    headers["Link"] = f'<{canvas.base_url.rsplit("/api/v1", 1)[0]}{path}?page={page + 1}&per_page={per_page}>; rel="next"'
+                body = json.dumps(items[start:start + per_page]).encode()
+                headers["ETag"] = f'"{hashlib.md5(body).hexdigest()}"'
+                if self.headers.get("If-None-Match") == headers["ETag"]:
+                    with canvas._lock:
+                        canvas.not_modified += 1
+                    return self._send(304, b"", headers=headers)
+                self._send(200, body, headers=headers)
+
+            def do_GET(self):
+                with canvas._lock:
+                    canvas.requests += 1
+                if canvas.latency:
+                    time.sleep(canvas.latency)
+                parsed = urlparse(self.path)
+                path, query = parsed.path, parse_qs(parsed.query)
+                self.rate_headers = {}
+                if canvas.rate_limit and path.startswith("/api/"):
+                    remaining = canvas._draw()
+                    self.rate_headers["X-Rate-Limit-Remaining"] = f"{max(remaining, 0):.1f}"
+                    if remaining < 0:
+                        return self._send(403, b"403 Forbidden (Rate Limit Exceeded)", "text/plain", self.rate_headers)
+
+                if path == "/api/v1/courses":
+                    return self._send_page(canvas._courses(), path, query)
+                match = re.fullmatch(r"/api/v1/courses/(\d+)/modules", path)
+                if match:
+                    return self._send_page(canvas._modules(int(match[1])), path, query)
+                match = re.fullmatch(r"/api/v1/courses/(\d+)/modules/(\d+)/items", path)
+                if match:
+                    return self._send_page(canvas._items(int(match[1]), int(match[2])), path, query)
+                match = re.fullmatch(r"/api/v1/courses/\d+/files/(\d+)", path)
+                if match:
+                    return self._send(200, json.dumps(canvas._file_metadata(int(match[1]))).encode(),
+                                      headers=self.rate_headers)
+                match = re.fullmatch(r"/files/(\d+)/download", path)
+                if match:
+                    return self._send_file(int(match[1]))
+                self._send(404, b'{"errors": [{"message": "not found"}]}')
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
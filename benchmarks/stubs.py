@@ -0,0 +1,155 @@
+"""Deterministic offline stand-ins for the remote/CPU-heavy parsers."""
+import asyncio
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+
+def cpu_parse(path, source, work=2_000_000):
+    """CPU-bound stand-in for unstructured: hashes the file repeatedly"""
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = data[:64]
+    for _ in range(work // 100):
+        digest = hashlib.sha256(digest).digest()
+    text = data.decode("utf-8", errors="ignore")
+    return [(text, {"source": source})]
+
+
+def text_parse(path, source):
+    """Local parser stand-in for plain-text files: one document per form-feed separated page"""
+    with open(path, "rb") as f:
+        pages = f.read().decode("utf-8", errors="ignore").split("\f")
+    return [(text, {"source": source, "page_number": page}) for page, text in enumerate(pages, 1) if text.strip()]
+
+
+class StubText:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubRemoteParser:
+    """Async stand-in for LlamaParse with a fixed per-call latency"""
+    def __init__(self, latency=0.3):
+        self.latency = latency
+        self.calls = 0
+
+    async def aload_data(self, path):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        with open(path, "rb") as f:
+            return [StubText("# Parsed\n" + f.read().decode("utf-8", errors="ignore"))]
+
+    def load_data(self, path):
+        self.calls += 1
+        time.sleep(self.latency)
+        with open(path, "rb") as f:
+            return [StubText("# Parsed\n" + f.read().decode("utf-8", errors="ignore"))]
+
+
+def fake_streaming_chat_model(answer, first_token_delay=0.3, token_delay=0.02, rate_limiter=None):
+    """Chat model that streams `answer` word by word with model-like latencies"""
+    import re
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    class FakeStreamingChatModel(BaseChatModel):
+        @property
+        def _llm_type(self):
+            return "fake-streaming"
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(first_token_delay)
+            for token in re.split(r"(\s)", answer):
+                time.sleep(token_delay)
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+                if run_manager:
+                    run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            text = "".join(chunk.message.content for chunk in self._stream(messages, stop, run_manager))
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            await asyncio.sleep(first_token_delay)
+            for token in re.split(r"(\s)", answer):
+                await asyncio.sleep(token_delay)
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+                if run_manager:
+                    await run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            text = "".join([chunk.message.content async for chunk in self._astream(messages, stop, run_manager)])
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    return FakeStreamingChatModel(rate_limiter=rate_limiter)
+
+
+class StubColbert:
+    """Stand-in for a loaded RAGPretrainedModel: fixed resident footprint, batched search cost.
+
+    `search` accepts a string or a list of strings like RAGatouille, plus an
+    optional `doc_ids` filter that, as in RAGatouille, only applies to a
+    single-string query (a list search covers every passage). Passages are strings or dicts with "content",
+    "document_id" and "document_metadata"; hits are ranked by the idf-weighted
+    overlap of query and passage words.
+    All instances share one lock while "encoding", as models in one process
+    share the CPU/GPU. A call costs a fixed overhead, plus a per-query cost,
+    plus `per_candidate` for every passage each query is scored against.
+    """
+    _device = threading.Lock()
+
+    def __init__(self, passages, footprint_mb=200, call_overhead=0.03, per_query=0.004, per_candidate=0.0):
+        self.passages = [p if isinstance(p, dict) else {"content": p, "document_id": str(i)}
+                         for i, p in enumerate(passages)]
+        self._words = [set(re.findall(r"\w+", p["content"].lower())) for p in self.passages]
+        document_frequency = Counter(word for words in self._words for word in words)
+        self._idf = {word: math.log(len(self.passages) / df) for word, df in document_frequency.items()}
+        self.call_overhead = call_overhead
+        self.per_query = per_query
+        self.per_candidate = per_candidate
+        self.calls = 0
+        # Touch every page so the footprint is actually resident
+        self._weights = bytearray(footprint_mb * 1024 * 1024)
+        self._weights[::4096] = b"\x01" * len(range(0, len(self._weights), 4096))
+
+    def _hits(self, query, k, candidates):
+        query_words = set(re.findall(r"\w+", query.lower()))
+        scores = {i: sum(self._idf[word] for word in query_words & self._words[i]) for i in candidates}
+        ranked = sorted(candidates, key=lambda i: (-scores[i], i))[:k]
+        return [{"content": self.passages[i]["content"], "score": scores[i], "rank": rank + 1,
+                 "document_id": self.passages[i]["document_id"],
+                 "document_metadata": self.passages[i].get("document_metadata")}
+                for rank, i in enumerate(ranked)]
+
+    def rerank(self, query, documents, k=8):
+        """Score only `documents` (RAGatouille's rerank): pays `per_candidate` for each"""
+        with self._device:
+            self.calls += 1
+            time.sleep(self.call_overhead + self.per_query + self.per_candidate * len(documents))
+        query_words = set(re.findall(r"\w+", query.lower()))
+        scores = [sum(self._idf.get(word, 0.0) for word in query_words & set(re.findall(r"\w+", document.lower())))
+                  for document in documents]
+        ranked = sorted(range(len(documents)), key=lambda i: (-scores[i], i))[:k]
+        return [{"content": documents[i], "score": scores[i], "rank": rank + 1, "result_index": i}
+                for rank, i in enumerate(ranked)]
+
+    def search(self, query, k=8, doc_ids=None):
+        queries = [query] if isinstance(query, str) else query
+        if doc_ids is None or not isinstance(query, str):
+            candidates = range(len(self.passages))
+        else:
+            allowed = set(doc_ids)
+            candidates = [i for i, p in enumerate(self.passages) if p["document_id"] in allowed]
+        with self._device:
+            self.calls += 1
+            time.sleep(self.call_overhead + len(queries) * (self.per_query + self.per_candidate * len(candidates)))
+        results = [self._hits(q, k, candidates) for q in queries]
+        # RAGatouille returns a flat list for a single query
+        return results[0] if len(results) == 1 else results
@@ -1,184 +1,536 @@
 import requests
+import collections
+import contextlib
 import os
-import boto3
+import io
+import hashlib
+import random
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+from requests.adapters import HTTPAdapter
+from common import get_s3, require_secret
+from sync_manifest import SyncManifest
+from telemetry import telemetry
 
-# Set up API credentials
-os.environ["OPENAI_API_KEY"] = input("Enter your Canvas API key: ")
+BASE_URL = os.environ.get("CANVAS_BASE_URL", "https://canvas.instructure.com/api/v1")
 
-BASE_URL = "https://canvas.instructure.com/api/v1"
-HEADERS = {"Authorization": f"Bearer {API_TOKEN}"}
-
-ENROLLED_COURSES = {"Geology", 
-                    "Fundamentals of Semiconductor Devices", 
-                    "Elementary French I Online", 
+ENROLLED_COURSES = {"Geology",
+                    "Fundamentals of Semiconductor Devices",
+                    "Elementary French I Online",
                     "ECE Design Experience - S25"
                     }
+
+# Upper bound on concurrent Canvas requests / S3 uploads during a sync
+MAX_WORKERS = int(os.environ.get("CANVAS_MAX_WORKERS", "8"))
+CANVAS_PER_PAGE = int(os.environ.get("CANVAS_PER_PAGE", "100"))  # Canvas defaults to 10 items per page, 100 at most
+CANVAS_MAX_RETRIES = int(os.environ.get("CANVAS_MAX_RETRIES", "5"))
+CANVAS_BACKOFF_BASE = 0.5  # seconds; the backoff cap doubles with every retry
+CANVAS_BACKOFF_MAX = 30.0
+RETRY_STATUSES = {500, 502, 503, 504}
+# Requests are paced once X-Rate-Limit-Remaining drops below this (a full bucket is 700)
+RATE_LIMIT_LOW_WATER = float(os.environ.get("CANVAS_RATE_LIMIT_LOW_WATER", "200"))
+RATE_LIMIT_FULL_BUCKET = 700
+RATE_LIMIT_WINDOW = 200  # recent header changes used to estimate the refill rate and request cost
+RATE_LIMIT_MIN_STEPS = 8
+RATE_LIMIT_DEFAULT_INTERVAL = 0.25  # seconds between paced requests until the refill rate is estimated
+RATE_LIMIT_RELAX = 0.9  # the post-throttle slowdown shrinks by this factor with every successful response
+RATE_LIMIT_MAX_SLOWDOWN = 4
+RATE_LIMIT_REQUEST_COST = 50  # Canvas holds back this much for every request in flight
+# Throttled requests are retried (not counted against CANVAS_MAX_RETRIES) for up to this long
+CANVAS_THROTTLE_TIMEOUT = float(os.environ.get("CANVAS_THROTTLE_TIMEOUT", "600"))
+
 # made canvas access token
 # make S3 bucket
 # aws configure
 S3_BUCKET_NAME = "canvas-files-autodoc"
 AWS_REGION = "us-east-2"
-s3 = boto3.client("s3")
-existing_buckets = [bucket['Name'] for bucket in s3.list_buckets()['Buckets']]
-if S3_BUCKET_NAME in existing_buckets:
-    print(f"✅ Bucket '{S3_BUCKET_NAME}' already exists. Skipping creation.")
-else:
-    # Create bucket if it doesn’t exist
-    s3.create_bucket(
-        Bucket=S3_BUCKET_NAME,
-        CreateBucketConfiguration={"LocationConstraint": AWS_REGION},
-    )
-    print(f"🚀 Created new bucket: {S3_BUCKET_NAME}")
+STREAM_CHUNK_SIZE = 1024 * 1024
+# Parts are retried individually by botocore; only ~max_concurrency parts are buffered at once
+TRANSFER_SETTINGS = {
+    "multipart_threshold": 8 * 1024 * 1024,
+    "multipart_chunksize": 8 * 1024 * 1024,
+    "max_concurrency": 4,
+}
+
+# The crawler's S3 client (common.get_s3) retries throttled and failed S3 calls
+S3_RETRIES = {"max_attempts": 5, "mode": "standard"}
+
+# One keep-alive session per worker thread so pages reuse TLS connections
+_thread_local = threading.local()
+
+def _record_response(response, *args, **kwargs):
+    """requests hook: time to response headers of every Canvas call"""
+    telemetry.observe("canvas.request", response.elapsed.total_seconds(), status=response.status_code,
+                      path=response.request.path_url.split("?")[0])
+    telemetry.count("canvas.requests")
+
+def get_session():
+    """Return this thread's pooled requests session"""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        # The Canvas token is only needed (and asked for) once the crawl starts
+        token = require_secret("CANVAS_API_TOKEN", "Enter your Canvas API key")
+        session.headers.update({"Authorization": f"Bearer {token}"})
+        session.hooks["response"].append(_record_response)
+        _thread_local.session = session
+    return session
+
+def ensure_bucket():
+    """Create the S3 bucket if it doesn't exist yet"""
+    existing_buckets = [bucket['Name'] for bucket in get_s3(S3_RETRIES).list_buckets()['Buckets']]
+    if S3_BUCKET_NAME in existing_buckets:
+        print(f"✅ Bucket '{S3_BUCKET_NAME}' already exists. Skipping creation.")
+    else:
+        # Create bucket if it doesn’t exist
+        get_s3(S3_RETRIES).create_bucket(
+            Bucket=S3_BUCKET_NAME,
+            CreateBucketConfiguration={"LocationConstraint": AWS_REGION},
+        )
+        print(f"🚀 Created new bucket: {S3_BUCKET_NAME}")
 
 # desired_courses = {'18500', }
 
-# Function to fetch all courses with pagination
-def get_all_courses():
-    url = f"{BASE_URL}/courses"
-    courses = []
-    
-    while url:
-        response = requests.get(url, headers=HEADERS)
-        
-        if response.status_code == 200:
-            data = response.json()
-            courses.extend(data)
-
-            # Check if there's another page
-            if "next" in response.links:
-                url = response.links["next"]["url"]
-            else:
-                url = None
+class CanvasPacer:
+    """Spaces out Canvas requests so the API token's rate-limit bucket never runs dry.
+
+    Canvas reports what is left of the token's bucket in `X-Rate-Limit-Remaining`
+    (700 when full); every request costs some units, the bucket refills at a
+    fixed rate, and an empty bucket answers 403 "Rate Limit Exceeded". Neither
+    the cost nor the refill rate is published, so both are estimated from how
+    the header changes between consecutive responses: each step is
+    `refill rate * elapsed - cost`, fitted by least squares over recent steps.
+    Requests still in flight will draw on the bucket too (Canvas charges each
+    one up front), so the level used is what remains after them. Above
+    `low_water` requests go out unpaced; below it they are spaced at the
+    sustainable interval (cost / refill rate), so the bucket holds steady. A
+    throttled response pauses every worker (for Retry-After, if sent) and
+    doubles the spacing, which then relaxes with each successful response. One pacer is shared by every
+    thread, since they all draw on the same token.
+    """
+    def __init__(self, low_water=RATE_LIMIT_LOW_WATER, window=RATE_LIMIT_WINDOW):
+        self.low_water = low_water
+        self.remaining = None
+        self.refill_rate = None  # units per second
+        self.cost = None  # units per request
+        self.slowdown = 1.0
+        self._steps = collections.deque(maxlen=window)  # (seconds since previous response, change in remaining)
+        self._last = None  # (time, remaining) of the previous usable response
+        self._in_flight = 0
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, response):
+        try:
+            remaining = float(response.headers["X-Rate-Limit-Remaining"])
+        except (KeyError, ValueError):
+            return
+        now = time.monotonic()
+        with self._lock:
+            self.remaining = remaining
+            # A bucket capped at full hides the refill, so only steps well below the top count
+            if self._last is not None and max(self._last[1], remaining) < RATE_LIMIT_FULL_BUCKET / 2:
+                self._steps.append((now - self._last[0], remaining - self._last[1]))
+                self._fit()
+            self._last = (now, remaining)
+            self.slowdown = max(1.0, self.slowdown * RATE_LIMIT_RELAX)
+
+    def _fit(self):
+        """Least-squares refill rate (slope) and request cost (-intercept) of the recorded steps"""
+        if len(self._steps) < RATE_LIMIT_MIN_STEPS:
+            return
+        n = len(self._steps)
+        mean_t = sum(t for t, _ in self._steps) / n
+        mean_r = sum(r for _, r in self._steps) / n
+        spread = sum((t - mean_t) ** 2 for t, _ in self._steps)
+        if spread <= 1e-9:
+            return
+        rate = sum((t - mean_t) * (r - mean_r) for t, r in self._steps) / spread
+        cost = rate * mean_t - mean_r
+        if rate > 0 and cost > 0:
+            self.refill_rate, self.cost = rate, cost
+
+    def throttled(self, retry_after=None):
+        """Pause every worker and back off: the bucket is empty"""
+        with self._lock:
+            self.remaining = 0.0
+            # The header on a throttled response doesn't show the real level, so don't fit a step from it
+            self._last = None
+            self.slowdown = min(RATE_LIMIT_MAX_SLOWDOWN, self.slowdown * 2)
+            pause = retry_after if retry_after is not None else self._interval()
+            self._next_at = max(self._next_at, time.monotonic() + pause)
+
+    def _interval(self):
+        if self.cost is None:
+            base = RATE_LIMIT_DEFAULT_INTERVAL
         else:
-            print("Error:", response.json())
-            break
+            base = self.cost / self.refill_rate
+        return base * self.slowdown
 
-    return courses
+    def _projected(self):
+        """The last reported bucket level, less what the requests in flight will take"""
+        return self.remaining - self._in_flight * (self.cost or RATE_LIMIT_REQUEST_COST)
 
-def get_course_files(course_id):
-    url = f"{BASE_URL}/courses/{course_id}/files"
-    files = []
+    def interval(self):
+        """Seconds between requests at the last reported bucket level"""
+        with self._lock:
+            if self.remaining is None or self._projected() >= self.low_water:
+                return 0.0
+            return self._interval()
 
-    while url:
-        response = requests.get(url, headers=HEADERS)
-        
-        if response.status_code == 200:
-            data = response.json()
-            files.extend(data)
-
-            # Check if there's another page
-            if "next" in response.links:
-                url = response.links["next"]["url"]
-            else:
-                url = None
+    def wait(self):
+        """Block until this thread's request may go out; `release` once it has completed (see `slot`)"""
+        interval = self.interval()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + interval
+            self._in_flight += 1
+        delay = start - now
+        if delay > 0:
+            telemetry.observe("canvas.pacing", delay)
+            time.sleep(delay)
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Wait for a request's turn and count it as in flight until the block exits"""
+        self.wait()
+        try:
+            yield
+        finally:
+            self.release()
+
+pacer = CanvasPacer()
+
+def _is_throttled(response):
+    return response.status_code == 429 or (response.status_code == 403 and "rate limit" in response.text.lower())
+
+def _retry_after(response):
+    """Seconds in the response's Retry-After header, or None"""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+def _backoff(attempt, response=None):
+    """Full-jitter exponential backoff, at least as long as any Retry-After the server sent"""
+    delay = random.uniform(0, min(CANVAS_BACKOFF_MAX, CANVAS_BACKOFF_BASE * 2 ** attempt))
+    retry_after = _retry_after(response) if response is not None else None
+    return max(delay, retry_after) if retry_after is not None else delay
+
+def canvas_get(url, max_retries=CANVAS_MAX_RETRIES, throttle_timeout=CANVAS_THROTTLE_TIMEOUT, **kwargs):
+    """GET a Canvas API URL, paced by the rate-limit bucket and retried with jittered backoff.
+
+    5xx responses and connection errors are retried up to `max_retries` times.
+    Throttling (403 "Rate Limit Exceeded" or 429) is only temporary, so it is
+    retried for up to `throttle_timeout` seconds, with every worker paused
+    through the shared pacer. Any other response (or the last failed one) is
+    returned for the caller to check.
+    """
+    session = get_session()
+    started = time.monotonic()
+    attempt = throttles = 0
+    while True:
+        try:
+            with pacer.slot():
+                response = session.get(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            reason, delay = type(e).__name__, _backoff(attempt)
+            attempt += 1
         else:
-            print("Error:", response.json())
-            break
+            if _is_throttled(response):
+                # The pacer holds every worker back; this request just goes to the back of the line
+                pacer.throttled(_retry_after(response))
+                telemetry.count("canvas.throttled")
+                throttles += 1
+                if time.monotonic() - started > throttle_timeout:
+                    return response
+                telemetry.count("canvas.retries")
+                if throttles == 1 or throttles % 10 == 0:
+                    print(f"⏳ Canvas rate limit for {url.split('?')[0]}, waiting (throttled {throttles}x)")
+                continue
+            pacer.update(response)
+            if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+                return response
+            reason, delay = f"HTTP {response.status_code}", _backoff(attempt, response)
+            attempt += 1
+        telemetry.count("canvas.retries")
+        print(f"🔁 Canvas {reason} for {url.split('?')[0]}, retrying in {delay:.1f}s ({attempt}/{max_retries})")
+        time.sleep(delay)
 
-    return files
+def _with_per_page(url):
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    if "per_page" in query:
+        return url
+    return urlunsplit(parts._replace(query=urlencode({**query, "per_page": CANVAS_PER_PAGE}, doseq=True)))
 
-def get_course_modules(course_id):
-    url = f"{BASE_URL}/courses/{course_id}/modules"
-    modules = []
+def get_paginated(url, manifest=None):
+    """Every item of a paginated Canvas listing, following its `Link: rel="next"` headers.
 
+    Pages are requested `CANVAS_PER_PAGE` items at a time through canvas_get.
+    With a SyncManifest, each page's ETag from the last sync is sent as
+    If-None-Match and a 304 reuses the stored items. A page that still fails
+    after retries raises requests.HTTPError instead of truncating the listing.
+    """
+    items = []
+    url = _with_per_page(url)
     while url:
-        response = requests.get(url, headers=HEADERS)
-        
-        if response.status_code == 200:
-            data = response.json()
-            modules.extend(data)
-
-            # Check if there's another page
-            if "next" in response.links:
-                url = response.links["next"]["url"]
-            else:
-                url = None
+        cached = manifest.listing(url) if manifest is not None else None
+        response = canvas_get(url, headers={"If-None-Match": cached["etag"]} if cached else {})
+        if response.status_code == 304 and cached:
+            telemetry.count("canvas.not_modified")
+            page = cached["items"]
+            # Trust the 304's own Link header, if it has one, over the stored next page
+            next_url = response.links.get("next", {}).get("url") if "Link" in response.headers else cached["next"]
         else:
-            print("Error:", response.json())
-            break
-
-    return modules
-
-def get_module_items(module_items_url):
-    modules_items = []
-
-    while module_items_url:
-        response = requests.get(module_items_url, headers=HEADERS)
-        
-        if response.status_code == 200:
-            data = response.json()
-            modules_items.extend(data)
-
-            # Check if there's another page
-            if "next" in response.links:
-                module_items_url = response.links["next"]["url"]
-            else:
-                module_items_url = None
-        else:
-            print("Error:", response.json())
-            break
+            response.raise_for_status()
+            page = response.json()
+            next_url = response.links.get("next", {}).get("url")
+            if manifest is not None and response.headers.get("ETag"):
+                manifest.record_listing(url, response.headers["ETag"], page, next_url)
+        items.extend(page)
+        url = next_url
+    return items
+
+def get_all_courses(manifest=None):
+    return get_paginated(f"{BASE_URL}/courses", manifest)
+
+def get_course_files(course_id, manifest=None):
+    return get_paginated(f"{BASE_URL}/courses/{course_id}/files", manifest)
 
-    return modules_items
-        
-def upload_s3(course_name, module_name, file_name, file_url):
+def get_course_modules(course_id, manifest=None):
+    return get_paginated(f"{BASE_URL}/courses/{course_id}/modules", manifest)
+
+def get_module_items(module_items_url, manifest=None):
+    """A module's items; a module that is locked (403) or gone (404) lists as empty.
+
+    Canvas answers these for modules the token can't see, and they don't clear
+    on retry, so they shouldn't mark the whole course incomplete and hold back
+    its tombstoning. Throttling and other errors still raise.
+    """
+    try:
+        return get_paginated(module_items_url, manifest)
+    except requests.HTTPError as e:
+        response = e.response
+        if response is None or response.status_code not in (403, 404) or _is_throttled(response):
+            raise
+        print(f"⚠️ Skipping module items at {module_items_url}: {response.status_code} {response.reason}")
+        telemetry.count("canvas.inaccessible_listing")
+        return []
+
+class CanvasDownloadStream(io.RawIOBase):
+    """Read-only file object over a streamed Canvas download.
+
+    Hands `iter_content` chunks to boto3's upload_fileobj, hashing them on the
+    way through. A dropped connection is resumed with a Range request from the
+    current offset instead of restarting the whole file.
+    """
+    def __init__(self, session, url, chunk_size=STREAM_CHUNK_SIZE, max_retries=3):
+        self.session = session
+        self.url = url
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.sha256 = hashlib.sha256()
+        self.bytes_read = 0
+        self._buffer = b""
+        self._chunks = self._open()
+
+    def _open(self):
+        headers = {"Range": f"bytes={self.bytes_read}-"} if self.bytes_read else {}
+        response = self.session.get(self.url, stream=True, headers=headers)
+        if response.status_code not in (200, 206) or (self.bytes_read and response.status_code != 206):
+            raise requests.HTTPError(f"download returned {response.status_code}", response=response)
+        return response.iter_content(chunk_size=self.chunk_size)
+
+    def _next_chunk(self):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return next(self._chunks, b"")
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+                if attempt == self.max_retries:
+                    raise
+                print(f"🔁 Resuming download at byte {self.bytes_read}")
+                self._chunks = self._open()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = self._next_chunk()
+            if not chunk:
+                break
+            self.sha256.update(chunk)
+            self.bytes_read += len(chunk)
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+def upload_s3(course_name, module_name, file_name, file_url, manifest=None):
+    """Copy one Canvas file into S3.
+
+    Returns a (status, bytes) pair where status is "uploaded", "copied",
+    "skipped" (unchanged since the last sync) or "failed".
+    """
     s3_key = f"{course_name}/{module_name}/{file_name}"
-    print(f"📥 Streaming & uploading: {file_name} → s3://{S3_BUCKET_NAME}/{s3_key}")
-    # 🔹 Stream the file from Canvas
-    response = requests.get(file_url, headers=HEADERS)
+    # 🔹 Fetch the file metadata (cheap) before deciding whether to transfer anything
+    response = canvas_get(file_url)
 
-    if response.status_code == 200:
-        file_metadata = response.json()
-        print("File Metadata:", file_metadata)
-    else:
+    if response.status_code != 200:
         print("Failed to fetch file metadata:", response.status_code)
-        
+        return "failed", 0
+    file_metadata = response.json()
+
+    entry = manifest.lookup(file_metadata.get("id"), file_metadata) if manifest is not None else None
+    if entry is not None:
+        if s3_key in entry["s3_keys"]:
+            manifest.mark_seen(s3_key)
+            return "skipped", 0
+        # Same file linked from another module: server-side copy instead of re-downloading
+        with telemetry.span("s3.copy"):
+            get_s3(S3_RETRIES).copy_object(
+                Bucket=S3_BUCKET_NAME,
+                Key=s3_key,
+                CopySource={"Bucket": S3_BUCKET_NAME, "Key": entry["s3_keys"][0]},
+            )
+        manifest.record(file_metadata["id"], file_metadata, s3_key, entry["sha256"])
+        print(f"📎 Copied unchanged file: {entry['s3_keys'][0]} → {s3_key}")
+        return "copied", 0
+
     download_url = file_metadata.get("url")
     if not download_url:
         print("Download URL not found in metadata.")
-    else:
-        print("Download URL:", download_url)
-        
-        
-    response = requests.get(download_url, headers=HEADERS, stream=True)
-
-    if response.status_code == 200:
-        file_content = response.content
-        file_size = len(file_content)
-        print(f"Downloaded file size: {file_size} bytes")
-    else:
-        print("Failed to download file:", response.status_code)
-    
-
-    print(f"File size: {len(response.content)} bytes")
-    # 🔹 Upload to S3 directly from response content
-    s3.put_object(
-        Bucket=S3_BUCKET_NAME,
-        Key=s3_key,
-        Body=file_content
-    )
-
-
-# Fetch and print all courses
-courses = get_all_courses()
-for course in courses:
-    if "name" in course and course["name"] in ENROLLED_COURSES:
-        try:
-            course_name = course["name"]
-            modules = get_course_modules(course["id"])
+        return "failed", 0
+
+    print(f"📥 Streaming & uploading: {file_name} → s3://{S3_BUCKET_NAME}/{s3_key}")
+    try:
+        stream = CanvasDownloadStream(get_session(), download_url)
+    except requests.RequestException as e:
+        print("Failed to download file:", e)
+        return "failed", 0
+
+    # 🔹 Pipe the download straight into a (multipart) S3 upload; only a few chunks are ever in memory
+    from boto3.s3.transfer import TransferConfig
+
+    with telemetry.span("canvas.file_transfer") as attrs:
+        get_s3(S3_RETRIES).upload_fileobj(stream, S3_BUCKET_NAME, s3_key, Config=TransferConfig(**TRANSFER_SETTINGS))
+        attrs["bytes"] = stream.bytes_read
+    telemetry.count("canvas.bytes_transferred", stream.bytes_read)
+    if manifest is not None:
+        manifest.record(file_metadata["id"], file_metadata, s3_key, stream.sha256.hexdigest())
+    return "uploaded", stream.bytes_read
+
+class CrawlStats:
+    """Thread-safe counters for files and bytes moved during a sync"""
+    def __init__(self):
+        self.counts = {"uploaded": 0, "copied": 0, "skipped": 0, "failed": 0, "deleted": 0}
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, status, size=0):
+        with self._lock:
+            self.counts[status] += 1
+            self.bytes += size
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        files = self.counts["uploaded"] + self.counts["copied"] + self.counts["skipped"]
+        return {
+            **self.counts,
+            "files": files,
+            "bytes": self.bytes,
+            "seconds": elapsed,
+            "files_per_s": files / elapsed,
+            "bytes_per_s": self.bytes / elapsed,
+        }
+
+def sync_courses(max_workers=MAX_WORKERS, enrolled_courses=ENROLLED_COURSES, manifest=None):
+    """Crawl courses → modules → items → files on a bounded worker pool and sync changed files to S3.
+
+    When a SyncManifest is given only new or changed files are transferred, and
+    files that disappeared from a fully-crawled course are removed from S3.
+    """
+    stats = CrawlStats()
+    courses = [course for course in get_all_courses(manifest) if course.get("name") in enrolled_courses]
+    # Courses with any listing/transfer error are excluded from tombstoning
+    incomplete_courses = set()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Each stage is submitted as soon as its parent finishes, so module listings,
+        # item listings and file transfers overlap instead of running one after another
+        module_futures = {pool.submit(get_course_modules, course["id"], manifest): course for course in courses}
+        item_futures = {}
+        for future in as_completed(module_futures):
+            course_name = module_futures[future]["name"]
+            try:
+                modules = future.result()
+            except Exception as e:
+                print(f"Error listing modules for {course_name}: {e}")
+                incomplete_courses.add(course_name)
+                continue
             for module in modules:
-                module_name = module["name"]
-                module_items_url = module['items_url']
-                module_items = get_module_items(module_items_url)
-                for module_item in module_items:
-                    if module_item["type"] == "File":
-                        file_name = module_item["title"]
-                        
-                        file_url = module_item["url"]
-                        
-                        # print(file_name, file_url)
-                        upload_s3(course_name, module_name, file_name, file_url)
-        except:
-            continue
+                future_items = pool.submit(get_module_items, module["items_url"], manifest)
+                item_futures[future_items] = (course_name, module["name"])
+
+        upload_futures = {}
+        for future in as_completed(item_futures):
+            course_name, module_name = item_futures[future]
+            try:
+                module_items = future.result()
+            except Exception as e:
+                print(f"Error listing items for {course_name}/{module_name}: {e}")
+                incomplete_courses.add(course_name)
+                continue
+            for module_item in module_items:
+                if module_item["type"] == "File":
+                    file_name = module_item["title"]
+                    future_upload = pool.submit(upload_s3, course_name, module_name, file_name,
+                                                module_item["url"], manifest)
+                    upload_futures[future_upload] = (course_name, file_name)
+
+        for future in as_completed(upload_futures):
+            course_name, file_name = upload_futures[future]
+            try:
+                status, size = future.result()
+            except Exception as e:
+                print(f"Error uploading {file_name}: {e}")
+                status, size = "failed", 0
+            if status == "failed":
+                incomplete_courses.add(course_name)
+            stats.record(status, size)
 
+    if manifest is not None:
+        complete_courses = {course["name"] for course in courses} - incomplete_courses
+        for s3_key in manifest.tombstone_missing(complete_courses):
+            print(f"🪦 Removing deleted file: s3://{S3_BUCKET_NAME}/{s3_key}")
+            get_s3(S3_RETRIES).delete_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
+            stats.record("deleted")
+        manifest.save()
 
+    report = stats.report()
+    telemetry.observe("canvas.sync", report["seconds"], files=report["files"], bytes=report["bytes"])
+    print(f"📊 Synced {report['files']} files ({report['bytes']} bytes transferred) in {report['seconds']:.2f}s "
+          f"— {report['files_per_s']:.2f} files/s, {report['bytes_per_s'] / 1e6:.2f} MB/s "
+          f"(uploaded {report['uploaded']}, copied {report['copied']}, skipped {report['skipped']}, "
+          f"deleted {report['deleted']}, failed {report['failed']})")
+    return report
 
+if __name__ == "__main__":
+    ensure_bucket()
+    sync_courses(manifest=SyncManifest(s3=get_s3(S3_RETRIES), bucket=S3_BUCKET_NAME).load())
+    telemetry.print_report()
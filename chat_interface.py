@@ -1,11 +1,35 @@
-from langchain import hub
-from langchain.chat_models import init_chat_model
-from langgraph.graph import START, StateGraph
 from langchain_core.documents import Document
 from typing_extensions import List, TypedDict
-from ragatouille import RAGPretrainedModel
+import asyncio
+import json
 import os
-from common import INDEX_NAME, check_if_index_exists, download_index_from_s3
+import threading
+import time
+from common import (check_if_index_exists, describe_s3_error, download_index_from_s3, get_index_dir,
+                    get_local_index_version, load_document_registry, require_secret)
+from answer_cache import CachedChatBot, answer_cache
+from answer_stream import AnswerStream
+from batching_retriever import BatchingRetriever
+from hybrid_retriever import RETRIEVAL_MODE, HybridRetriever
+from lexical_index import BM25Index
+from course_router import CourseRouter
+from index_modes import INDEX_MMAP, index_info, load_searcher_mmap
+from telemetry import format_breakdown, telemetry
+from conversation_memory import PROMPT_TOKEN_BUDGET, ConversationMemory, count_tokens, format_history, trim_documents
+
+PROMPT_REF = os.environ.get("RAG_PROMPT_REF", "dhruvdixit/canvas-rag-1")
+PROMPT_CACHE_PATH = ".prompt_cache.json"
+RETRIEVAL_K = 8
+LLM_REQUESTS_PER_SECOND = float(os.environ.get("LLM_REQUESTS_PER_SECOND", "8"))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))  # default for abatch
+WARMUP_QUERY = "What is the course schedule?"
+
+# ragatouille (torch), langgraph and the langchain chat model integrations are imported by the functions that
+# use them, so importing this module (rag_server, the benchmarks) stays cheap until a chat bot is created
+
+# The loaded index is shared by every chat bot created in this process
+_rag_model = None
+_rag_model_lock = threading.Lock()
 
 # Define TypedDict for state management
 class State(TypedDict):
@@ -13,66 +37,244 @@ class State(TypedDict):
     context: List[Document]
     answer: str
     history: List[dict]
+    summary: str
+    prompt_tokens: int
+    courses: List[str]
 
 def load_rag_model():
-    """Load the RAG model from the existing index"""
-    # Check if the index exists
-    if not check_if_index_exists():
-        print("No RAG index found. Please run rag_indexer.py first to create an index.")
-        return None
-        
-    # Download the index from S3 if needed
-    if download_index_from_s3():
-        # Get the path to the downloaded index
-        curr_dir = os.getcwd()
-        index_path = os.path.join(curr_dir, ".ragatouille", "colbert", "indexes", INDEX_NAME)
-        
-        # Load the index using from_index class method
+    """Load the RAG model from the existing index (once per process)"""
+    global _rag_model
+    with _rag_model_lock:
+        if _rag_model is not None:
+            return _rag_model
+
+        # Check if the index exists
         try:
-            rag = RAGPretrainedModel.from_index(index_path)
-            print("✅ Loaded RAG index!")
-            return rag
+            exists = check_if_index_exists()
         except Exception as e:
-            print(f"Error loading RAG index: {e}")
+            print(f"❌ {describe_s3_error(e)}")
             return None
-    else:
-        print("Failed to download index from S3.")
-        return None
+        if not exists:
+            print("No RAG index found. Please run rag_indexer.py first to create an index.")
+            return None
+
+        # Download the index from S3 if needed
+        if download_index_from_s3():
+            # Load the index using from_index class method
+            try:
+                from ragatouille import RAGPretrainedModel
+
+                _rag_model = RAGPretrainedModel.from_index(get_index_dir())
+                mapped = INDEX_MMAP and load_searcher_mmap(_rag_model)
+                info = index_info(get_index_dir())
+                print(f"✅ Loaded RAG index ({info['nbits']}-bit residuals, "
+                      f"{info['codes_residuals_mb']:.0f} MB{', memory-mapped' if mapped else ''})!")
+                return _rag_model
+            except Exception as e:
+                print(f"Error loading RAG index: {e}")
+                return None
+        else:
+            print("Failed to download index from S3.")
+            return None
+
+def latest_prompt_commit(ref):
+    """Hash of the newest commit of a hub prompt, from its metadata (the prompt itself isn't downloaded)"""
+    from langsmith import Client
+
+    prompt = Client().get_prompt(ref)
+    if prompt is None or not prompt.last_commit_hash:
+        raise ValueError(f"prompt {ref} not found on the hub")
+    return prompt.last_commit_hash
+
+def load_prompt(ref=PROMPT_REF):
+    """Pull the RAG prompt from the hub, reusing a local copy while it is current.
+
+    A ref pinned to a commit ("owner/name:hash") never changes, so its cached
+    copy is reused without asking the hub. Otherwise the hub's latest commit
+    hash is looked up and the prompt is only pulled again when it differs from
+    the cached copy's. If the hub can't be reached the cached copy is used.
+    """
+    from langchain_core.load import dumpd, load
+
+    cached = None
+    if os.path.exists(PROMPT_CACHE_PATH):
+        with open(PROMPT_CACHE_PATH) as f:
+            cached = json.load(f)
+        if cached.get("ref") != ref:
+            cached = None
+    if cached and ":" in ref:
+        return load(cached["prompt"])
+
+    try:
+        from langchain import hub
+
+        require_secret("LANGCHAIN_API_KEY", "Enter your LangChain API key")
+        commit = ref.partition(":")[2] or latest_prompt_commit(ref)
+        if cached and cached.get("commit") == commit:
+            return load(cached["prompt"])
+        prompt = hub.pull(f"{ref.partition(':')[0]}:{commit}")
+    except Exception as e:
+        if cached:
+            print(f"⚠️ Could not check prompt {ref} on the hub ({e}); using cached copy.")
+            return load(cached["prompt"])
+        raise
+    print(f"📝 Pulled prompt {ref} at commit {commit[:8]}")
+    with open(PROMPT_CACHE_PATH, "w") as f:
+        json.dump({"ref": ref, "commit": commit, "fetched_at": time.time(), "prompt": dumpd(prompt)}, f)
+    return prompt
+
+def format_chunk(doc):
+    """A retrieved chunk with the course, file and page it came from, when the index recorded them"""
+    metadata = doc.metadata or {}
+    if not metadata.get("file"):
+        return doc.page_content
+    page = f", page {metadata['page']}" if metadata.get("page") is not None else ""
+    return f"[{metadata['course']} / {metadata['file']}{page}]\n{doc.page_content}"
+
+def record_llm_usage(response, prompt_tokens):
+    """Count one LLM call's tokens (the provider's usage when reported, else our own count); returns output tokens"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    completion_tokens = usage.get("output_tokens") or count_tokens(response.content)
+    telemetry.count("llm.calls")
+    telemetry.count("llm.prompt_tokens", usage.get("input_tokens") or prompt_tokens)
+    telemetry.count("llm.completion_tokens", completion_tokens)
+    return completion_tokens
+
+def build_rag_graph(retriever, llm, prompt, prompt_budget=PROMPT_TOKEN_BUDGET, router=None):
+    """Compile the retrieve → generate graph around any retriever, chat model and prompt.
+
+    `generate` calls `llm.invoke`; under `graph.stream(..., stream_mode="messages")`
+    LangGraph streams the model's tokens from inside that call (see AnswerStream).
+    Both nodes also have async versions, used by `graph.ainvoke` and `graph.abatch`.
+    Retrieved chunks are trimmed so the whole prompt fits in `prompt_budget` tokens.
+    With a CourseRouter, only the course(s) a question is about are searched
+    (the retriever must accept `doc_ids`); `state["courses"]` overrides routing.
+    """
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import START, StateGraph
+
+    def search_scope(state: State):
+        if router is None:
+            return [], {}
+        courses = state.get("courses") or router.route(state["question"])
+        if not courses:
+            return [], {}
+        print(f"🧭 Searching {', '.join(courses)}")
+        return courses, {"doc_ids": router.doc_ids_for(courses)}
+
+    # Define retrieve function
+    def retrieve(state: State):
+        with telemetry.span("chat.retrieve"):
+            courses, scope = search_scope(state)
+            retrieved_docs = retriever.invoke(state["question"], **scope)
+        return {"context": retrieved_docs, "history": state["history"], "courses": courses}
 
-def create_rag_chat_bot():
+    async def aretrieve(state: State):
+        with telemetry.span("chat.retrieve"):
+            courses, scope = search_scope(state)
+            if hasattr(retriever, "ainvoke"):
+                # Concurrent questions meet in the BatchingRetriever and share one encoder pass
+                retrieved_docs = await retriever.ainvoke(state["question"], **scope)
+            else:
+                retrieved_docs = await asyncio.to_thread(retriever.invoke, state["question"], **scope)
+        return {"context": retrieved_docs, "history": state["history"], "courses": courses}
+
+    def build_messages(state: State):
+        formatted_history = format_history(state.get("summary", ""), state["history"])
+        inputs = {"question": state["question"], "history": formatted_history}
+        # Whatever the question, template and history leave over goes to the retrieved chunks
+        base_tokens = count_tokens(prompt.invoke({**inputs, "context": ""}).to_string())
+        docs, context_tokens = trim_documents(state["context"], prompt_budget - base_tokens, render=format_chunk)
+        docs_content = "\n\n".join(format_chunk(doc) for doc in docs)
+        messages = prompt.invoke({**inputs, "context": docs_content})
+        prompt_tokens = count_tokens(messages.to_string())
+        print(f"🧮 Prompt tokens: {prompt_tokens} (history {count_tokens(formatted_history)}, "
+              f"context {context_tokens} from {len(docs)}/{len(state['context'])} chunks)")
+        return messages, prompt_tokens
+
+    # Define generate function
+    def generate(state: State):
+        with telemetry.span("chat.generate"):
+            messages, prompt_tokens = build_messages(state)
+            with telemetry.span("chat.llm", prompt_tokens=prompt_tokens) as attrs:
+                response = llm.invoke(messages)
+                attrs["completion_tokens"] = record_llm_usage(response, prompt_tokens)
+        return {"answer": response.content, "prompt_tokens": prompt_tokens}
+
+    async def agenerate(state: State):
+        with telemetry.span("chat.generate"):
+            messages, prompt_tokens = build_messages(state)
+            with telemetry.span("chat.llm", prompt_tokens=prompt_tokens) as attrs:
+                response = await llm.ainvoke(messages)
+                attrs["completion_tokens"] = record_llm_usage(response, prompt_tokens)
+        return {"answer": response.content, "prompt_tokens": prompt_tokens}
+
+    # Build RAG pipeline graph; graph.ainvoke / graph.abatch run the async versions of each node
+    graph_builder = StateGraph(State).add_sequence([
+        ("retrieve", RunnableLambda(retrieve, afunc=aretrieve)),
+        ("generate", RunnableLambda(generate, afunc=agenerate)),
+    ])
+    graph_builder.add_edge(START, "retrieve")
+    return graph_builder.compile()
+
+def stream_answer(graph, inputs, config=None):
+    """Stream an answer from either a CachedChatBot or a bare compiled graph"""
+    if isinstance(graph, CachedChatBot):
+        return graph.stream(inputs, config=config)
+    return AnswerStream(graph, inputs, config=config)
+
+def create_chat_model(requests_per_second=LLM_REQUESTS_PER_SECOND):
+    """gpt-4o-mini behind a token-bucket rate limiter shared by every call on this model"""
+    from langchain.chat_models import init_chat_model
+    from langchain_core.rate_limiters import InMemoryRateLimiter
+
+    require_secret("OPENAI_API_KEY", "Enter your OpenAI API key")
+    rate_limiter = InMemoryRateLimiter(requests_per_second=requests_per_second, check_every_n_seconds=0.05,
+                                       max_bucket_size=max(1, int(requests_per_second)))
+    return init_chat_model("gpt-4o-mini", model_provider="openai", rate_limiter=rate_limiter)
+
+def build_retriever(rag, k=RETRIEVAL_K, mode=RETRIEVAL_MODE, lexical_index=None):
+    """Batching ColBERT retriever, behind the BM25 stage unless `mode` is "colbert" (see HybridRetriever)"""
+    retriever = BatchingRetriever(rag, k=k)
+    if mode == "colbert":
+        return retriever
+    lexical_index = lexical_index or BM25Index.load(get_index_dir())
+    if lexical_index is None:
+        print(f"⚠️ RETRIEVAL_MODE={mode} needs a BM25 index; rebuild the index. Using ColBERT only.")
+        return retriever
+    return HybridRetriever(retriever, lexical_index, mode=mode, k=k)
+
+def create_rag_chat_bot(use_answer_cache=True):
     # Load the RAG model
     rag = load_rag_model()
     if not rag:
         return None
-        
+
     # Initialize LLM
-    llm = init_chat_model("gpt-4o-mini", model_provider="openai")
+    llm = create_chat_model()
 
     # Pull base RAG prompt layout
-    prompt = hub.pull("dhruvdixit/canvas-rag-1")
+    prompt = load_prompt()
     print(prompt)
-    
-    # Define retrieve function
-    def retrieve(state: State):
-        retriever = rag.as_langchain_retriever(k=8)
-        retrieved_docs = retriever.invoke(state["question"])  
-        return {"context": retrieved_docs, "history": state["history"]}
 
-    # Define generate function
-    def generate(state: State):
-        docs_content = "\n\n".join(doc.page_content for doc in state["context"])
-        formatted_history = "\n".join([f"User: {turn['question']}\nBot: {turn['answer']}" for turn in state["history"]])
-        messages = prompt.invoke({"question": state["question"], 
-                                "context": docs_content,
-                                "history": formatted_history})
-        response = llm.invoke(messages)
-        return {"answer": response.content}
-
-    # Build RAG pipeline graph
-    graph_builder = StateGraph(State).add_sequence([retrieve, generate])
-    graph_builder.add_edge(START, "retrieve")
-    graph = graph_builder.compile()
-    
+    # Built once: the searcher and ColBERT encoder stay loaded between questions, and
+    # questions arriving together from concurrent sessions are searched as one batch
+    retriever = build_retriever(rag)
+
+    # Questions about a specific course only search that course's documents
+    registry = load_document_registry()
+    router = CourseRouter(registry) if registry else None
+
+    graph = build_rag_graph(retriever, llm, prompt, router=router)
+
+    # Warm-up: the first search loads the index into memory and the encoder onto the device
+    started = time.perf_counter()
+    retriever.invoke(WARMUP_QUERY)
+    print(f"🔥 Retriever warmed up in {time.perf_counter() - started:.2f}s")
+
+    if use_answer_cache:
+        # Answers are only reused while the same index version is loaded, and per routed course
+        return CachedChatBot(graph, answer_cache, index_version=get_local_index_version(), router=router)
     return graph
 
 def start_chat_interface():
@@ -84,18 +286,27 @@ def start_chat_interface():
     
     # Interactive chat loop
     print("Welcome to the RAG chatbot! Type 'exit' to quit.\n")
-    history = []
+    memory = ConversationMemory()
     while True:
         user_input = input("You: ")
         if user_input.lower() in ["exit", "quit"]:
+            report = answer_cache.report()
+            print(f"Answer cache: {report['hit_rate']:.0%} hit rate over "
+                  f"{report['exact_hits'] + report['semantic_hits'] + report['misses']} questions")
             print("Goodbye!")
             break
         
-        result = graph.invoke({"question": user_input, "history": history})
-        
-        history.append({"question": user_input, "answer": result['answer']})
+        # Print tokens as they arrive instead of waiting for the whole completion
+        print("Bot: ", end="", flush=True)
+        stream = stream_answer(graph, {"question": user_input, **memory.inputs()})
+        for token in stream:
+            print(token, end="", flush=True)
+        print(f"\n⏱️ first token {stream.ttft_s:.2f}s, total {stream.latency_s:.2f}s"
+              f"{' (cached)' if stream.cached else ''}")
+        print(f"   {format_breakdown(stream.breakdown)}\n")
 
-        print(f"Bot: {result['answer']}\n")
+        # Older turns are folded into a running summary once the history budget is used up
+        memory.add_turn(user_input, stream.answer)
 
 if __name__ == "__main__":
     start_chat_interface()
\ No newline at end of file
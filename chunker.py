@@ -0,0 +1,188 @@
+import hashlib
+import os
+import re
+from collections import Counter
+
+# ColBERT encodes at most 256 wordpieces per passage, roughly 190 words of course text
+CHUNK_MAX_WORDS = int(os.environ.get("CHUNK_MAX_WORDS", "160"))
+CHUNK_OVERLAP_WORDS = int(os.environ.get("CHUNK_OVERLAP_WORDS", "32"))  # shared by consecutive plain-text windows
+# A line on at least this many pages of a file, and on this share of its pages, is a slide header or footer
+BOILERPLATE_MIN_PAGES = 3
+BOILERPLATE_PAGE_RATIO = 0.5
+BOILERPLATE_MAX_WORDS = 15  # longer lines are content even when repeated
+# Chunks whose 64-bit SimHashes differ in at most this many bits are near-duplicates
+SIMHASH_MAX_DISTANCE = int(os.environ.get("SIMHASH_MAX_DISTANCE", "3"))
+SIMHASH_BANDS = 4  # must exceed SIMHASH_MAX_DISTANCE: near-duplicates then agree on at least one 16-bit band
+
+HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*$")
+PAGE_NUMBER = re.compile(r"^(page|slide)?\s*\d+\s*((of|/)\s*\d+)?$", re.IGNORECASE)
+# Page counters inside a repeated header/footer ("Page 3 of 20", "Slide 4", "3/20")
+PAGE_COUNTER = re.compile(r"\b(page|slide)\s*\d+(\s*(of|/)\s*\d+)?\b|\b\d+\s*(of|/)\s*\d+\b", re.IGNORECASE)
+
+def simhash(text):
+    """64-bit SimHash of the word 3-shingles of `text`"""
+    tokens = re.findall(r"\w+", text.lower())
+    shingles = {" ".join(tokens[i:i + 3]) for i in range(max(1, len(tokens) - 2))}
+    bits = [format(int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big"), "064b")
+            for shingle in shingles]
+    # Column-wise vote: a bit is set if most shingle hashes set it
+    return int("".join("1" if column.count("1") * 2 > len(bits) else "0" for column in zip(*bits)), 2)
+
+def _line_key(line):
+    """Header/footer identity of a line: case, spacing and page counters ignored.
+
+    Other numbers count, so "Week 1" and "Week 2" are different lines.
+    """
+    return PAGE_COUNTER.sub("#", " ".join(line.lower().split()))
+
+def _windows(words, max_words, overlap):
+    step = max(1, max_words - overlap)
+    for start in range(0, max(1, len(words) - overlap), step):
+        yield words[start:start + max_words]
+
+class Chunker:
+    """Chunking stage between parsing and indexing.
+
+    Per file, lines repeated on most pages (slide headers, footers, "Page 3 of
+    20") are stripped. Pages with markdown headings (LlamaParse output) are
+    split into heading sections, with small neighbouring sections merged and
+    long ones windowed under their heading; plain-text pages are cut into
+    overlapping windows of `max_words`. Every chunk fits one ColBERT passage,
+    so RAGatouille's own splitter is not needed. Chunks that are near-duplicates
+    (SimHash) of a chunk already kept in the same `scope` (rag_indexer uses the
+    course) are dropped, so a file posted in two courses stays searchable in
+    both. Pass (scope, fingerprint, owner) triples of already-indexed chunks
+    as `seen` to deduplicate an incremental update against the index; the
+    `owner` (rag_indexer uses the S3 key) of every chunk a file's duplicates
+    matched is collected in `duplicates_of`, so that file can be re-chunked
+    once those chunks are gone.
+    """
+    def __init__(self, max_words=CHUNK_MAX_WORDS, overlap=CHUNK_OVERLAP_WORDS,
+                 max_distance=SIMHASH_MAX_DISTANCE, seen=()):
+        self.max_words = max_words
+        self.overlap = overlap
+        self.max_distance = max_distance
+        self.stats = Counter()
+        self.duplicates_of = {}  # owner → owners of the kept chunks its dropped duplicates matched
+        self._bands = {}  # scope → one {band key: [fingerprint]} per band
+        self._owners = {}  # (scope, fingerprint) → owner of the kept chunk
+        for scope, fingerprint, owner in seen:
+            self._remember(fingerprint, scope, owner)
+
+    def _band_keys(self, fingerprint):
+        width = 64 // SIMHASH_BANDS
+        return [(fingerprint >> (band * width)) & ((1 << width) - 1) for band in range(SIMHASH_BANDS)]
+
+    def _remember(self, fingerprint, scope=None, owner=None):
+        bands = self._bands.setdefault(scope, [{} for _ in range(SIMHASH_BANDS)])
+        for band, key in zip(bands, self._band_keys(fingerprint)):
+            band.setdefault(key, []).append(fingerprint)
+        self._owners.setdefault((scope, fingerprint), owner)
+
+    def _match(self, fingerprint, scope=None):
+        """A kept fingerprint in `scope` within `max_distance` bits of this one, or None"""
+        bands = self._bands.get(scope, ())
+        return next((other for band, key in zip(bands, self._band_keys(fingerprint)) for other in band.get(key, ())
+                     if (fingerprint ^ other).bit_count() <= self.max_distance), None)
+
+    def is_duplicate(self, fingerprint, scope=None):
+        return self._match(fingerprint, scope) is not None
+
+    def strip_boilerplate(self, pages):
+        """Drop page numbers and lines repeated across most pages of one file"""
+        page_lines = [text.splitlines() for text in pages]
+        counts = Counter(key for lines in page_lines for key in {_line_key(line) for line in lines if line.strip()})
+        threshold = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_PAGE_RATIO * len(pages))
+        stripped = []
+        for lines in page_lines:
+            kept = []
+            for line in lines:
+                content = line.strip()
+                # Markdown table rows repeat per page by design and carry the table's structure
+                candidate = content and not content.startswith("|") and len(content.split()) <= BOILERPLATE_MAX_WORDS
+                boilerplate = candidate and (PAGE_NUMBER.match(content) or counts[_line_key(line)] >= threshold)
+                if boilerplate:
+                    self.stats["boilerplate_lines"] += 1
+                else:
+                    kept.append(line)
+            stripped.append("\n".join(kept))
+        return stripped
+
+    def _sections(self, text):
+        """(heading path, body) pairs of a markdown page"""
+        path, body, sections = [], [], []
+        for line in text.splitlines():
+            heading = HEADING.match(line.strip())
+            if heading:
+                if body:
+                    sections.append((" > ".join(title for _, title in path), "\n".join(body)))
+                    body = []
+                level = len(heading.group(1))
+                path = [(depth, title) for depth, title in path if depth < level] + [(level, heading.group(2))]
+            elif line.strip():
+                body.append(line)
+        if body or path:
+            sections.append((" > ".join(title for _, title in path), "\n".join(body)))
+        return sections
+
+    def _split_markdown(self, text):
+        chunks, current = [], []
+        for heading, body in self._sections(text):
+            section = f"{heading}\n{body}".strip()
+            words = section.split()
+            if len(words) > self.max_words:
+                if current:
+                    chunks.append("\n\n".join(current))
+                    current = []
+                # Every window of a long section keeps its heading for context
+                budget = max(self.overlap + 1, self.max_words - len(heading.split()))
+                chunks += [f"{heading}\n{' '.join(window)}".strip()
+                           for window in _windows(body.split(), budget, self.overlap)]
+            elif current and sum(len(part.split()) for part in current) + len(words) > self.max_words:
+                chunks.append("\n\n".join(current))
+                current = [section]
+            else:
+                current.append(section)
+        if current:
+            chunks.append("\n\n".join(current))
+        return chunks
+
+    def split(self, text):
+        """Chunks of one (boilerplate-stripped) page"""
+        if any(HEADING.match(line.strip()) for line in text.splitlines()):
+            self.stats["markdown_pages"] += 1
+            return self._split_markdown(text)
+        return [" ".join(window) for window in _windows(text.split(), self.max_words, self.overlap)]
+
+    def chunk_file(self, pages, scope=None, owner=None):
+        """[(chunk text, page, fingerprint)] for one file's [(page text, page number)], duplicates in `scope` removed"""
+        texts = self.strip_boilerplate([text for text, _ in pages])
+        chunks, sources = [], set()
+        for text, (_, page) in zip(texts, pages):
+            self.stats["pages"] += 1
+            for chunk in self.split(text):
+                if not re.search(r"\w", chunk):
+                    continue
+                fingerprint = simhash(chunk)
+                match = self._match(fingerprint, scope)
+                if match is not None:
+                    self.stats["duplicates"] += 1
+                    sources.add(self._owners[(scope, match)])
+                    continue
+                self._remember(fingerprint, scope, owner)
+                self.stats["chunks"] += 1
+                self.stats["words"] += len(chunk.split())
+                chunks.append((chunk, page, fingerprint))
+        # A file's own repeated chunks don't depend on anything else
+        self.duplicates_of[owner] = sources - {owner}
+        return chunks
+
+    def report(self):
+        return {key: self.stats[key] for key in ("pages", "markdown_pages", "chunks", "words", "duplicates",
+                                                 "boilerplate_lines")}
+
+    def print_report(self):
+        report = self.report()
+        print(f"✂️ Chunked {report['pages']} pages ({report['markdown_pages']} markdown) into "
+              f"{report['chunks']} chunks ({report['words']} words); removed {report['duplicates']} near-duplicate "
+              f"chunks and {report['boilerplate_lines']} boilerplate lines")
@@ -1,6 +1,12 @@
-import boto3
+import hashlib
+import json
 import os
+import sys
+import threading
+import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from telemetry import telemetry
 
 # Filter out specific warnings
 warnings.filterwarnings("ignore", category=FutureWarning, module="colbert.utils.amp")
@@ -10,79 +16,358 @@ warnings.filterwarnings("ignore", category=UserWarning, message="User provided d
 S3_BUCKET_NAME = "canvas-files-autodoc"
 S3_INDEX_KEY = "rag-index"  # Directory in S3 where index files will be stored
 INDEX_NAME = "s3-rag-index"  # Name of the index
+INDEX_STATE_FILE = ".s3_sync_state.json"  # Local record of the ETags already on disk
+INDEX_DOWNLOAD_WORKERS = int(os.environ.get("INDEX_DOWNLOAD_WORKERS", "8"))
+TRANSFER_PART_SIZE = 8 * 1024 * 1024  # boto3's default multipart chunk size
+INDEX_POINTER_KEY = f"{S3_INDEX_KEY}/CURRENT"  # JSON pointer to the published index version
+INDEX_MANIFEST_FILE = "manifest.json"  # File list, sizes, hashes and document count of a version
+INDEX_POINTER_TTL = float(os.environ.get("INDEX_POINTER_TTL", "30"))
+DOCUMENT_REGISTRY_FILE = "document_registry.json"  # S3 key → ETag and ColBERT document ids
 
-# Set API keys
-os.environ["OPENAI_API_KEY"] = input("Enter your OpenAI API key: ")
-os.environ["LANGCHAIN_API_KEY"] = input("Enter your LangChain API key: ")
+_secret_lock = threading.Lock()
 
-s3 = boto3.client("s3")
+def require_secret(name, prompt):
+    """The API key in env var `name`, asked for on the terminal the first time it is actually needed.
+
+    Nothing prompts at import time, so entry points that never call a given
+    service never ask for its key. Without a terminal (Streamlit, the HTTP
+    server) a missing key is an error instead of a prompt that blocks forever.
+    """
+    with _secret_lock:
+        if not os.environ.get(name):
+            if not sys.stdin.isatty():
+                raise RuntimeError(f"{name} is not set")
+            os.environ[name] = input(f"{prompt}: ")
+        return os.environ[name]
+
+# Tests and benchmarks assign their own client here, which is then used for every call
+s3 = None
+_s3_clients = {}  # botocore retry settings → client, created on first use
+_s3_lock = threading.Lock()
+
+def get_s3(retries=None):
+    """The shared S3 client, one per botocore `retries` setting (e.g. {"max_attempts": 5, "mode": "standard"})"""
+    with _s3_lock:
+        if s3 is not None:
+            return s3
+        key = json.dumps(retries, sort_keys=True)
+        if key not in _s3_clients:
+            import boto3
+            from botocore.config import Config
+
+            _s3_clients[key] = boto3.client("s3", config=Config(retries=retries) if retries else None)
+        return _s3_clients[key]
+
+def is_internal_key(key):
+    """True for objects the pipeline writes itself (index files, sync manifest)"""
+    return key.startswith(f"{S3_INDEX_KEY}/") or key.startswith(".")
+
+def is_missing_key_error(error):
+    """True for S3's "no such key" (404 from head_object, NoSuchKey from get_object)"""
+    code = getattr(error, "response", {}).get("Error", {}).get("Code")
+    return code in ("404", "NoSuchKey", "NotFound")
+
+# Cached result of resolve_current_index(): (resolved_at, pointer ETag, manifest)
+_current_index_cache = None
+
+def _read_json(key):
+    response = get_s3().get_object(Bucket=S3_BUCKET_NAME, Key=key)
+    return json.loads(response["Body"].read()), response.get("ETag")
+
+def resolve_current_index(refresh=False):
+    """Return the manifest of the published index version, or None if nothing is published.
+
+    The CURRENT pointer is re-checked at most every INDEX_POINTER_TTL seconds and
+    the manifest is only re-read when the pointer's ETag changes.
+    """
+    global _current_index_cache
+    if _current_index_cache and not refresh and time.time() - _current_index_cache[0] < INDEX_POINTER_TTL:
+        return _current_index_cache[2]
+    try:
+        etag = get_s3().head_object(Bucket=S3_BUCKET_NAME, Key=INDEX_POINTER_KEY)["ETag"]
+    except Exception as e:
+        # Any other error (throttling, network) must not look like "nothing published": the caller would fall
+        # back to the legacy listing and delete every local shard that isn't in it
+        if not is_missing_key_error(e):
+            raise
+        _current_index_cache = None
+        return None
+    if _current_index_cache and _current_index_cache[1] == etag:
+        manifest = _current_index_cache[2]
+    else:
+        pointer, etag = _read_json(INDEX_POINTER_KEY)
+        manifest, _ = _read_json(f"{index_version_prefix(pointer['version'])}/{INDEX_MANIFEST_FILE}")
+    _current_index_cache = (time.time(), etag, manifest)
+    return manifest
+
+def index_version_prefix(version):
+    return f"{S3_INDEX_KEY}/versions/{version}"
+
+def list_index_versions():
+    """Completely uploaded versions (with a manifest) under rag-index/versions/, oldest first"""
+    paginator = get_s3().get_paginator('list_objects_v2')
+    versions = set()
+    for page in paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=f"{S3_INDEX_KEY}/versions/"):
+        for obj in page.get('Contents', []):
+            if obj['Key'].endswith(f"/{INDEX_MANIFEST_FILE}"):
+                versions.add(obj['Key'].split("/")[-2])
+    return sorted(versions)
+
+def list_index_version_prefixes():
+    """Every version prefix under rag-index/versions/, oldest first, including uploads that never finished"""
+    paginator = get_s3().get_paginator('list_objects_v2')
+    root = f"{S3_INDEX_KEY}/versions/"
+    versions = set()
+    for page in paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=root, Delimiter="/"):
+        for prefix in page.get('CommonPrefixes', []):
+            versions.add(prefix['Prefix'][len(root):].rstrip("/"))
+    return sorted(versions)
+
+def publish_index_version(version):
+    """Atomically point readers at an uploaded version (also used for rollback)"""
+    global _current_index_cache
+    # Fail before swapping if the version was never completely uploaded
+    get_s3().head_object(Bucket=S3_BUCKET_NAME, Key=f"{index_version_prefix(version)}/{INDEX_MANIFEST_FILE}")
+    get_s3().put_object(
+        Bucket=S3_BUCKET_NAME,
+        Key=INDEX_POINTER_KEY,
+        Body=json.dumps({"version": version, "published_at": time.time()}),
+        ContentType="application/json",
+    )
+    _current_index_cache = None
+    print(f"📌 Published index version {version}")
 
 def check_if_index_exists():
-    """Check if the RAG index already exists in S3"""
+    """Check if the RAG index already exists in S3.
+
+    Errors other than "not found" (credentials, network, throttling) raise, since
+    they don't mean there is no index; see describe_s3_error.
+    """
+    if resolve_current_index() is not None:
+        return True
     try:
-        # Look for the existence of a marker file that indicates a complete index
-        response = s3.head_object(
+        # Indexes uploaded before versioning only have a marker file
+        response = get_s3().head_object(
             Bucket=S3_BUCKET_NAME,
             Key=f"{S3_INDEX_KEY}/index_complete.marker"
         )
         return True
-    except Exception:
+    except Exception as e:
+        if not is_missing_key_error(e):
+            raise
         return False
 
-def download_index_from_s3():
-    """Download the RAG index from S3"""
-    import os
-    from pathlib import Path
-    
-    curr_dir = os.getcwd()
-    index_dir = os.path.join(curr_dir, ".ragatouille", "colbert", "indexes", INDEX_NAME)
-    
-    # Create the directory if it doesn't exist
-    os.makedirs(index_dir, exist_ok=True)
-    
-    # List all objects with the index prefix
-    paginator = s3.get_paginator('list_objects_v2')
-    pages = paginator.paginate(
-        Bucket=S3_BUCKET_NAME, 
-        Prefix=S3_INDEX_KEY
-    )
-    
+def describe_s3_error(error):
+    """What to tell the user when the index bucket can't be checked"""
+    return (f"Couldn't reach the RAG index in s3://{S3_BUCKET_NAME}/{S3_INDEX_KEY}/ ({error}). "
+            f"Check the AWS credentials and region (e.g. `aws s3 ls s3://{S3_BUCKET_NAME}`) and the network, "
+            "then try again.")
+
+def get_index_dir():
+    """Local directory ragatouille loads the index from"""
+    return os.path.join(os.getcwd(), ".ragatouille", "colbert", "indexes", INDEX_NAME)
+
+def get_local_index_version():
+    """Version of the index currently on disk, if it came from a published manifest"""
+    path = os.path.join(get_index_dir(), INDEX_MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f).get("version")
+
+def load_document_registry():
+    """Per-document record (S3 ETag, ColBERT document ids) stored alongside the index"""
+    path = os.path.join(get_index_dir(), DOCUMENT_REGISTRY_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_document_registry(registry):
+    with open(os.path.join(get_index_dir(), DOCUMENT_REGISTRY_FILE), "w") as f:
+        json.dump(registry, f, indent=1)
+
+def _local_etag(path, part_size=TRANSFER_PART_SIZE):
+    """S3-style ETag of a local file (plain md5, or md5-of-part-md5s for multipart uploads)"""
+    part_digests = []
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(part_size), b""):
+            part_digests.append(hashlib.md5(chunk))
+    if len(part_digests) <= 1:
+        return (part_digests[0] if part_digests else hashlib.md5()).hexdigest()
+    combined = hashlib.md5(b"".join(d.digest() for d in part_digests))
+    return f"{combined.hexdigest()}-{len(part_digests)}"
+
+def file_sha256(path):
+    """sha256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _is_current(local_path, obj, state):
+    """True if the local file already matches the remote object"""
+    if not os.path.exists(local_path) or os.path.getsize(local_path) != obj["Size"]:
+        return False
+    known = state.get(local_path)
+    if known and known["checksum"] == obj["checksum"] and known["mtime"] == os.path.getmtime(local_path):
+        return True
+    # No record of this file (or it was touched): fall back to hashing it once
+    local = file_sha256(local_path) if obj["kind"] == "sha256" else _local_etag(local_path)
+    return local == obj["checksum"]
+
+def _download_object(s3_path, local_path, obj):
+    """Download one object, resuming a previous partial download of the same content"""
+    with telemetry.span("s3.download", key=s3_path) as attrs:
+        attrs["bytes"] = _fetch_object(s3_path, local_path, obj)
+    telemetry.count("s3.bytes_downloaded", attrs["bytes"])
+    return attrs["bytes"]
+
+def _part_path(local_path, checksum):
+    """Where a partial download of this content is kept, so only the same content is ever resumed"""
+    return f"{local_path}.{checksum.replace('-', '_')}.part"
+
+def _fetch_object(s3_path, local_path, obj, retry=True):
+    part_path = _part_path(local_path, obj["checksum"])
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset > obj["Size"]:
+        os.remove(part_path)
+        offset = 0
+    if offset < obj["Size"]:
+        request = {"Bucket": S3_BUCKET_NAME, "Key": s3_path}
+        if obj["kind"] == "etag":
+            # Legacy keys are overwritten in place; versioned keys are immutable
+            request["IfMatch"] = f'"{obj["checksum"]}"'
+        if offset:
+            print(f"Resuming s3://{S3_BUCKET_NAME}/{s3_path} at byte {offset}")
+            request["Range"] = f"bytes={offset}-"
+        body = get_s3().get_object(**request)["Body"]
+        with open(part_path, "ab") as f:
+            for chunk in iter(lambda: body.read(1024 * 1024), b""):
+                f.write(chunk)
+    # A resumed file is only as good as the bytes left over from last time, so check the whole thing (legacy
+    # ETags depend on the uploader's part size, so those rely on IfMatch instead)
+    if obj["kind"] == "sha256" and file_sha256(part_path) != obj["checksum"]:
+        os.remove(part_path)
+        if offset and retry:
+            print(f"⚠️ Resumed s3://{S3_BUCKET_NAME}/{s3_path} doesn't match its checksum; downloading it again")
+            return obj["Size"] - offset + _fetch_object(s3_path, local_path, obj, retry=False)
+        raise ValueError(f"s3://{S3_BUCKET_NAME}/{s3_path} doesn't match its checksum {obj['checksum']}")
+    os.replace(part_path, local_path)
+    return obj["Size"] - offset
+
+def _list_legacy_index(index_dir):
+    """Remote files of an index uploaded to the flat rag-index/ prefix"""
+    paginator = get_s3().get_paginator('list_objects_v2')
+    pages = paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=f"{S3_INDEX_KEY}/")
+    remote = {}
     for page in pages:
-        if 'Contents' not in page:
-            continue
-            
-        for obj in page['Contents']:
-            s3_path = obj['Key']
-            # Skip the marker file
-            if s3_path.endswith("index_complete.marker"):
+        for obj in page.get('Contents', []):
+            key = obj['Key']
+            # Skip the marker file and anything belonging to the versioned layout
+            if key.endswith("index_complete.marker") or key == INDEX_POINTER_KEY or "/versions/" in key:
                 continue
-                
-            # Calculate the local path
-            relative_path = os.path.relpath(s3_path, S3_INDEX_KEY)
-            local_path = os.path.join(index_dir, relative_path)
-            
+            relative_path = os.path.relpath(key, S3_INDEX_KEY)
+            remote[os.path.join(index_dir, relative_path)] = {
+                "Key": key, "Size": obj["Size"], "checksum": obj["ETag"].strip('"'), "kind": "etag",
+            }
+    return remote
+
+def download_index_from_s3(max_workers=INDEX_DOWNLOAD_WORKERS):
+    """Download the RAG index from S3, fetching only missing or changed files in parallel"""
+    started = time.perf_counter()
+    index_dir = get_index_dir()
+
+    # Create the directory if it doesn't exist
+    os.makedirs(index_dir, exist_ok=True)
+    state_path = os.path.join(index_dir, INDEX_STATE_FILE)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+
+    # Every file of the published version comes from its manifest, so a rebuild that is
+    # still uploading can never be mixed into what we download
+    manifest = resolve_current_index()
+    if manifest is not None:
+        prefix = index_version_prefix(manifest["version"])
+        remote = {
+            os.path.join(index_dir, relative_path): {
+                "Key": f"{prefix}/{relative_path}", "Size": info["size"], "checksum": info["sha256"], "kind": "sha256",
+            }
+            for relative_path, info in manifest["files"].items()
+        }
+    else:
+        remote = _list_legacy_index(index_dir)
+
+    to_fetch = {path: obj for path, obj in remote.items() if not _is_current(path, obj, state)}
+    version = manifest["version"] if manifest else "legacy"
+    print(f"Index {version}: {len(remote) - len(to_fetch)} files up to date, {len(to_fetch)} to download")
+
+    total_bytes = 0
+    failed = False
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for local_path, obj in to_fetch.items():
             # Create directory structure if it doesn't exist
             os.makedirs(os.path.dirname(local_path), exist_ok=True)
-            
-            print(f"Downloading s3://{S3_BUCKET_NAME}/{s3_path} to {local_path}")
-            
+            futures[pool.submit(_download_object, obj['Key'], local_path, obj)] = obj['Key']
+        for future in as_completed(futures):
             try:
-                s3.download_file(S3_BUCKET_NAME, s3_path, local_path)
+                total_bytes += future.result()
             except Exception as e:
-                print(f"Error downloading {s3_path}: {e}")
-                return False
-    
-    return True
+                print(f"Error downloading {futures[future]}: {e}")
+                failed = True
+
+    # Remember what is on disk so the next start can skip hashing
+    state = {
+        path: {"checksum": obj["checksum"], "mtime": os.path.getmtime(path)}
+        for path, obj in remote.items() if os.path.exists(path)
+    }
+    with open(state_path, "w") as f:
+        json.dump(state, f)
+
+    if not failed:
+        # Drop local shards that aren't part of this version so ColBERT doesn't pick them up, and partial
+        # downloads of content this version doesn't have (they could never be resumed)
+        keep = {INDEX_STATE_FILE, INDEX_MANIFEST_FILE}
+        keep_parts = {_part_path(path, obj["checksum"]) for path, obj in remote.items()}
+        for root, dirs, files in os.walk(index_dir):
+            for file in files:
+                path = os.path.join(root, file)
+                stale_part = file.endswith(".part") and path not in keep_parts
+                if stale_part or (path not in remote and file not in keep and not file.endswith(".part")):
+                    os.remove(path)
+        manifest_path = os.path.join(index_dir, INDEX_MANIFEST_FILE)
+        if manifest is not None:
+            with open(manifest_path, "w") as f:
+                json.dump(manifest, f)
+        elif os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+    elapsed = time.perf_counter() - started
+    telemetry.observe("s3.index_sync", elapsed, files=len(to_fetch), bytes=total_bytes)
+    print(f"📦 Index sync: {total_bytes / 1e6:.1f} MB in {len(to_fetch)} files, {elapsed:.2f}s")
+    return not failed
+
+def list_pdf_objects(bucket=S3_BUCKET_NAME):
+    """Fetch all course files in the S3 bucket as {key: ETag}."""
+    paginator = get_s3().get_paginator('list_objects_v2')
+    pdf_objects = {}
+    for page in paginator.paginate(Bucket=bucket):
+        for obj in page.get("Contents", []):
+            # Skip index and sync bookkeeping
+            if not is_internal_key(obj["Key"]):
+                pdf_objects[obj["Key"]] = obj["ETag"].strip('"')
+    return pdf_objects
 
 def list_pdf_files():
     """Fetch all PDF files from the S3 bucket."""
-    response = s3.list_objects_v2(Bucket=S3_BUCKET_NAME)
-
-    if "Contents" not in response:
+    pdf_files = list(list_pdf_objects())
+    if not pdf_files:
         print("No files found in the bucket.")
         return []
 
-    # Extract full S3 keys (paths) of the PDF files
-    pdf_files = [obj["Key"] for obj in response["Contents"]]
     print(f"✅ Found {len(pdf_files)} PDF files.")
-    return pdf_files
\ No newline at end of file
+    return pdf_files
@@ -0,0 +1,139 @@
+import os
+from functools import lru_cache
+
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "1000"))  # summary + recent turns
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("SUMMARY_TOKEN_BUDGET", "250"))
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "4000"))  # whole prompt, retrieved chunks included
+TOKENIZER_MODEL = os.environ.get("TOKENIZER_MODEL", "gpt-4o-mini")
+
+SUMMARY_PROMPT = """You maintain a running summary of a student's conversation with a course assistant.
+Current summary:
+{summary}
+
+Older turns to fold into the summary:
+{turns}
+
+Write the updated summary in at most {max_words} words. Keep course names, dates, deadlines and any facts
+the student may refer back to; drop greetings and repetition."""
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(TOKENIZER_MODEL)
+    except Exception:
+        # No tiktoken, or its vocabulary can't be downloaded: fall back to an estimate
+        return None
+
+def count_tokens(text):
+    """Tokens in `text` for TOKENIZER_MODEL (≈ 4 characters per token without tiktoken)"""
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_tokens(text, max_tokens):
+    """Cut `text` down to at most `max_tokens` tokens"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+def format_turns(turns):
+    return "\n".join(f"User: {turn['question']}\nBot: {turn['answer']}" for turn in turns)
+
+def format_history(summary, turns):
+    """History block for the prompt: running summary of older turns, then recent turns verbatim"""
+    parts = [f"Summary of the earlier conversation: {summary}"] if summary else []
+    if turns:
+        parts.append(format_turns(turns))
+    return "\n".join(parts)
+
+def trim_documents(docs, max_tokens, render=None, separator="\n\n"):
+    """Keep retrieved chunks, best first, until `max_tokens` is used up.
+
+    What counts is the text the prompt actually shows: `render(doc)` (e.g.
+    chat_interface.format_chunk with its source line; page_content by default),
+    joined by `separator`. Returns (kept docs, tokens used). If even the top
+    chunk doesn't fit its content is truncated rather than dropped, so the
+    answer always has some context.
+    """
+    render = render or (lambda doc: doc.page_content)
+    kept, used = [], 0
+    for doc in docs:
+        tokens = count_tokens(render(doc)) + (count_tokens(separator) if kept else 0)
+        if used + tokens > max_tokens:
+            if not kept and max_tokens > 0:
+                overhead = count_tokens(render(doc.model_copy(update={"page_content": ""})))
+                text = truncate_tokens(doc.page_content, max(0, max_tokens - overhead))
+                kept.append(doc.model_copy(update={"page_content": text}))
+                used = count_tokens(render(kept[0]))
+            break
+        kept.append(doc)
+        used += tokens
+    return kept, used
+
+def extractive_summarizer(summary, turns, max_tokens):
+    """Offline summarizer: keep the questions that were asked, newest last"""
+    asked = "; ".join(turn["question"] for turn in turns)
+    summary = f"{summary} The student also asked: {asked}." if summary else f"The student asked: {asked}."
+    # Drop the oldest material first when over budget
+    while count_tokens(summary) > max_tokens and "; " in summary:
+        summary = summary.split("; ", 1)[1]
+    return truncate_tokens(summary, max_tokens)
+
+def llm_summarizer(llm):
+    """Summarizer that asks `llm` to fold evicted turns into the running summary"""
+    def summarize(summary, turns, max_tokens):
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(empty)", turns=format_turns(turns),
+                                       max_words=max(20, max_tokens * 3 // 4))
+        try:
+            return llm.invoke(prompt).content.strip()
+        except Exception as e:
+            print(f"⚠️ Could not summarize history ({e}); keeping the questions only.")
+            return extractive_summarizer(summary, turns, max_tokens)
+    return summarize
+
+class ConversationMemory:
+    """Token-budgeted chat history for one conversation.
+
+    Recent turns are kept verbatim while summary + turns fit in `budget`
+    tokens. Turns that no longer fit are folded into a running summary, once
+    each, so every turn costs at most one summarization call no matter how
+    long the conversation gets. `summarize(summary, turns, max_tokens)`
+    defaults to gpt-4o-mini, created on first use.
+    """
+    def __init__(self, budget=HISTORY_TOKEN_BUDGET, summary_budget=SUMMARY_TOKEN_BUDGET, summarize=None):
+        self.budget = budget
+        self.summary_budget = min(summary_budget, budget)
+        self._summarize = summarize
+        self.summary = ""
+        self.turns = []
+        self.summarized_turns = 0
+
+    def summarize(self, summary, turns, max_tokens):
+        if self._summarize is None:
+            from langchain.chat_models import init_chat_model
+            self._summarize = llm_summarizer(init_chat_model("gpt-4o-mini", model_provider="openai"))
+        return self._summarize(summary, turns, max_tokens)
+
+    def tokens(self):
+        return count_tokens(format_history(self.summary, self.turns))
+
+    def add_turn(self, question, answer):
+        """Record a finished turn, summarizing the oldest turns if over budget"""
+        self.turns.append({"question": question, "answer": answer})
+        evicted = []
+        # The newest turn always stays verbatim
+        while len(self.turns) > 1 and self.tokens() > self.budget:
+            evicted.append(self.turns.pop(0))
+        if evicted:
+            self.summary = truncate_tokens(self.summarize(self.summary, evicted, self.summary_budget),
+                                           self.summary_budget)
+            self.summarized_turns += len(evicted)
+
+    def inputs(self):
+        """Graph inputs for the next question: recent turns plus the running summary"""
+        return {"history": list(self.turns), "summary": self.summary}
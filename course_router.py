@@ -0,0 +1,79 @@
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+# A course is searched if it scores at least this fraction of the best-scoring course
+ROUTING_RATIO = float(os.environ.get("ROUTING_RATIO", "0.5"))
+# Without the course being named, this many course-specific file/module words are needed to route
+MIN_PATH_MATCHES = 2
+
+STOPWORDS = {
+    "the", "and", "for", "what", "when", "where", "which", "who", "how", "does", "about", "are", "is", "was",
+    "with", "this", "that", "from", "into", "there", "their", "our", "your", "can", "will", "due", "pdf",
+    "online", "course", "class", "module", "lecture", "week", "page", "docx", "pptx", "work",
+}
+
+def words(text):
+    """Content words of `text`, lowercased, with a plural "s" stripped"""
+    found = set()
+    for word in re.findall(r"[a-z]+", text.lower()):
+        if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if len(word) > 2 and word not in STOPWORDS:
+            found.add(word)
+    return found
+
+class CourseRouter:
+    """Route a question to the course(s) it is about, from the names of the indexed files.
+
+    Questions that name a course ("french", "geology") go to the named
+    course(s). Otherwise words from the course's module and file names (the S3
+    key "course/module/file") route the question only if several of them are
+    specific to one course, so a stray "homework" doesn't narrow the search.
+    Words every course shares, like "midterm" or "syllabus", never route.
+    [] means search every course.
+    """
+    def __init__(self, registry, ratio=ROUTING_RATIO):
+        self.ratio = ratio
+        self.doc_ids = defaultdict(list)
+        path_words = defaultdict(set)
+        for key, entry in registry.items():
+            course, _, path = key.partition("/")
+            self.doc_ids[course].extend(entry["doc_ids"])
+            path_words[course] |= words(path)
+        self.name_words = {course: words(course) for course in self.doc_ids}
+        self.path_words = {course: path_words[course] - self.name_words[course] for course in self.doc_ids}
+        self.name_idf = self._idf(self.name_words)
+        self.path_idf = self._idf(self.path_words)
+
+    @staticmethod
+    def _idf(vocabularies):
+        document_frequency = Counter(word for vocabulary in vocabularies.values() for word in vocabulary)
+        return {word: math.log(len(vocabularies) / df) for word, df in document_frequency.items()}
+
+    @property
+    def courses(self):
+        return sorted(self.doc_ids)
+
+    def _top(self, scores):
+        best = max(scores.values(), default=0.0)
+        if best <= 0:
+            return []
+        return sorted(course for course, score in scores.items() if score > 0 and score >= self.ratio * best)
+
+    def route(self, question):
+        """Courses to search for this question; [] means the question isn't specific to any course"""
+        question_words = words(question)
+        named = self._top({course: sum(self.name_idf[word] for word in question_words & vocabulary)
+                           for course, vocabulary in self.name_words.items()})
+        if named:
+            return named
+        specific = {course: [word for word in question_words & vocabulary if self.path_idf[word] > 0]
+                    for course, vocabulary in self.path_words.items()}
+        return self._top({course: sum(self.path_idf[word] for word in matched)
+                          for course, matched in specific.items() if len(matched) >= MIN_PATH_MATCHES})
+
+    def doc_ids_for(self, courses):
+        """ColBERT document ids of every document in `courses`"""
+        return [doc_id for course in courses for doc_id in self.doc_ids.get(course, [])]
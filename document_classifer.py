@@ -1,26 +1,49 @@
-import boto3
+import csv
 import json
 import os
+import time
 from collections import defaultdict
-from langchain.chat_models import init_chat_model
+from common import list_pdf_objects, require_secret
+from local_classifier import LocalFileClassifier
 
-os.environ["OPENAI_API_KEY"] = input("Enter your OpenAI API key: ")
+# Per-file classifications persist here, so only files never seen before cost an LLM call
+CLASSIFICATION_STORE = os.environ.get("CLASSIFICATION_STORE", "relevant_documents.csv")
+STORE_COLUMNS = ["filename", "classification", "source", "classified_at"]
+LABELS = {"syllabus", "schedule", "other"}
+CLASSIFIER_CONCURRENCY = int(os.environ.get("CLASSIFIER_CONCURRENCY", "4"))
+# LlamaParse gets the best-ranked this many syllabi and schedules of each course (0: every one)
+CLASSIFIED_PER_COURSE = int(os.environ.get("CLASSIFIED_PER_COURSE", "1"))
 
 class CourseFileClassifier:
-    def __init__(self, llm=init_chat_model("gpt-4o-mini", model_provider="openai"), s3_bucket_name="canvas-files-autodoc"):
-        self.llm = llm
-        self.s3 = boto3.client("s3")
+    def __init__(self, llm=None, s3_bucket_name="canvas-files-autodoc", store_path=CLASSIFICATION_STORE,
+                 use_local=True):
+        # gpt-4o-mini by default, created the first time a file actually needs the LLM
+        self._llm = llm
         self.s3_bucket_name = s3_bucket_name
+        self.store_path = store_path
+        self.store = self.load_store()
+        # Confident filename-based answers skip the LLM entirely; trained on non-local labels only
+        self.local_classifier = LocalFileClassifier().fit(
+            (file, row["classification"]) for file, row in self.store.items() if row["source"] != "local"
+        ) if use_local else None
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from langchain.chat_models import init_chat_model
+
+            require_secret("OPENAI_API_KEY", "Enter your OpenAI API key")
+            self._llm = init_chat_model("gpt-4o-mini", model_provider="openai")
+        return self._llm
 
     def list_pdf_files(self):
-        response = self.s3.list_objects_v2(Bucket=self.s3_bucket_name)
+        # The same (paginated, index and manifest excluded) file set the indexer sees
+        pdf_files = list_pdf_objects(self.s3_bucket_name)
 
-        if "Contents" not in response:
+        if not pdf_files:
             print("⚠️ No files found in the bucket.")
             return {}
 
-        pdf_files = [obj["Key"] for obj in response["Contents"]]
-
         class_files = defaultdict(list)
         for file in pdf_files:
             class_name = file.split("/")[0]
@@ -28,29 +51,30 @@ class CourseFileClassifier:
 
         return class_files
 
-    def generate_prompt(self, class_files):
-        formatted_class_files = "\n".join(
-            f"**{class_name}**:\n" + "\n".join(f"- {file}" for file in files)
-            for class_name, files in class_files.items()
-        )
+    def generate_prompt(self, class_name, files, known=None):
+        formatted_files = "\n".join(f"- {file}" for file in files)
+        formatted_known = "\n".join(f"- {file}: {label}" for file, label in (known or {}).items()) or "- none"
 
         return f"""
-        You are categorizing course files into **Syllabus** and **Schedule** categories. 
-        Your task is to select **one file per class** that is **most likely** to be:
-        
+        You are categorizing files from the course **{class_name}** into **Syllabus**, **Schedule** or **Other**.
+
         - **Syllabus**: Covers course policies, grading, objectives, and expectations.
         - **Schedule**: Includes dates, deadlines, and a timeline of topics.
-        
-        If **no file in the class fits the category**, do not select a random file—just leave it blank.
-        
-        ### **Files Organized by Class**
-        {formatted_class_files}
+        - **Other**: Anything else (lectures, assignments, exams, guidance documents, ...).
+
+        Only label a file as syllabus or schedule if it is **likely** to be one—otherwise use "other".
+
+        ### **Files Already Identified in This Class**
+        {formatted_known}
+
+        ### **Files to Categorize**
+        {formatted_files}
 
         ### **Output Format (Valid JSON)**
         {{
-            "class_name_1": {{"syllabus": "file_path", "schedule": "file_path"}},
-            "class_name_2": {{"syllabus": null, "schedule": "file_path"}},
-            "class_name_3": {{"syllabus": "file_path", "schedule": null}}
+            "file_path_1": "syllabus",
+            "file_path_2": "schedule",
+            "file_path_3": "other"
         }}
 
         Please only return valid JSON.
@@ -68,25 +92,99 @@ class CourseFileClassifier:
             print("❌ Error: Invalid JSON response from LLM. Response content:\n", raw_text)
             return {}
 
+    def load_store(self):
+        """Read saved classifications (filename → row) from the CSV store"""
+        store = {}
+        if os.path.exists(self.store_path):
+            with open(self.store_path, newline="") as f:
+                for row in csv.DictReader(f):
+                    store[row["filename"]] = {column: row.get(column) or "" for column in STORE_COLUMNS}
+        return store
+
+    def save_store(self):
+        tmp_path = self.store_path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=STORE_COLUMNS)
+            writer.writeheader()
+            for filename in sorted(self.store):
+                writer.writerow(self.store[filename])
+        os.replace(tmp_path, self.store_path)
+
+    def _record(self, file, label, source):
+        self.store[file] = {
+            "filename": file,
+            "classification": label,
+            "source": source,
+            "classified_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+
     def classify_files(self):
+        """Return {file: classification} for every file in the bucket.
+
+        Files missing from the store are first tried with the local classifier;
+        only the ambiguous ones are sent to the LLM, one prompt per course, with
+        the per-course prompts run concurrently.
+        """
         class_files = self.list_pdf_files()
         if not class_files:
             return {}
 
-        prompt_text = self.generate_prompt(class_files)
-        response = self.llm.invoke(prompt_text)
-
-        return self.parse_llm_response(response)
-    
-    def get_classified_set(self):
-        res = set()
-        files = self.classify_files()
-        
-        for course, file_info in files.items():
-            if file_info["syllabus"]:
-                res.add(file_info["syllabus"])
-            if file_info["schedule"]:
-                res.add(file_info["schedule"])
-        
-        return res
-
+        pending = {}
+        local_count = 0
+        for class_name, files in class_files.items():
+            new_files = [file for file in files if file not in self.store]
+            if new_files and self.local_classifier is not None:
+                confident, new_files = self.local_classifier.split(new_files)
+                for file, label in confident.items():
+                    self._record(file, label, "local")
+                local_count += len(confident)
+            if new_files:
+                pending[class_name] = new_files
+        if local_count:
+            print(f"🏷️ Classified {local_count} new files locally")
+
+        if pending:
+            print(f"🏷️ Classifying {sum(map(len, pending.values()))} new files across {len(pending)} courses")
+            prompts = []
+            for class_name, new_files in pending.items():
+                known = {file: self.store[file]["classification"] for file in class_files[class_name]
+                         if file in self.store and self.store[file]["classification"] != "other"}
+                prompts.append(self.generate_prompt(class_name, new_files, known))
+            responses = self.llm.batch(prompts, config={"max_concurrency": CLASSIFIER_CONCURRENCY},
+                                       return_exceptions=True)
+
+            for (class_name, new_files), response in zip(pending.items(), responses):
+                if isinstance(response, Exception):
+                    print(f"❌ Error classifying {class_name}: {response}")
+                    continue
+                labels = self.parse_llm_response(response)
+                for file in new_files:
+                    # Files the LLM skipped stay unclassified and are retried next run
+                    if file not in labels:
+                        continue
+                    label = str(labels[file]).lower() if labels[file] else "other"
+                    self._record(file, label if label in LABELS else "other", "llm")
+        if pending or local_count:
+            self.save_store()
+
+        return {file: self.store[file]["classification"]
+                for files in class_files.values() for file in files if file in self.store}
+
+    def rank(self, file, label):
+        """Sort key of a file among a course's files with `label`: most confidently that label first"""
+        classifier = self.local_classifier or LocalFileClassifier()
+        predicted, confidence = classifier.predict(file)
+        # Ties (e.g. two files named "syllabus") go to the shorter, less decorated name
+        return -(confidence if predicted == label else 0.0), len(file), file
+
+    def get_classified_set(self, per_course=CLASSIFIED_PER_COURSE):
+        """Files worth LlamaParse: the best-ranked `per_course` syllabi and schedules of each course"""
+        by_course = defaultdict(list)
+        for file, label in self.classify_files().items():
+            if label in ("syllabus", "schedule"):
+                by_course[(file.split("/")[0], label)].append(file)
+        selected = set()
+        for (_, label), files in by_course.items():
+            files.sort(key=lambda file: self.rank(file, label))
+            selected.update(files[:per_course] if per_course else files)
+        return selected
@@ -0,0 +1,219 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from common import file_sha256
+from telemetry import telemetry
+
+# Per-stage concurrency limits
+DOWNLOAD_WORKERS = int(os.environ.get("PIPELINE_DOWNLOAD_WORKERS", "8"))
+PARSE_WORKERS = int(os.environ.get("PIPELINE_PARSE_WORKERS", str(os.cpu_count() or 2)))
+REMOTE_PARSE_CONCURRENCY = int(os.environ.get("PIPELINE_REMOTE_CONCURRENCY", "4"))
+# One document per page, with its page_number; part of the parse cache key, like LLAMA_PARSE_SETTINGS
+UNSTRUCTURED_SETTINGS = {"mode": "paged"}
+
+def parse_local(path, source):
+    """Parse a downloaded file with unstructured (runs in a worker process).
+
+    Mirrors what S3FileLoader does after its own download, returning plain
+    (page_content, metadata) pairs so the result pickles cheaply.
+    """
+    from langchain_community.document_loaders import UnstructuredFileLoader
+
+    docs = UnstructuredFileLoader(path, **UNSTRUCTURED_SETTINGS).load()
+    return [(doc.page_content, {**doc.metadata, "source": source}) for doc in docs]
+
+def _timed_local_parse(parse_fn, path, source):
+    started = time.perf_counter()
+    result = parse_fn(path, source)
+    return result, time.perf_counter() - started
+
+class StageTimer:
+    """Busy time, item count and wall-clock span of one pipeline stage"""
+    def __init__(self, name=None):
+        self.name = name
+        self.busy = 0.0
+        self.count = 0
+        self.first = None
+        self.last = None
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        now = time.perf_counter()
+        with self._lock:
+            self.busy += seconds
+            self.count += 1
+            self.first = now - seconds if self.first is None else min(self.first, now - seconds)
+            self.last = now if self.last is None else max(self.last, now)
+        if self.name:
+            telemetry.observe(f"pipeline.{self.name}", seconds)
+
+    def report(self):
+        return {
+            "count": self.count,
+            "busy_s": self.busy,
+            "wall_s": (self.last - self.first) if self.count else 0.0,
+        }
+
+class DocumentPipeline:
+    """Download → parse pipeline over S3 keys with independent stage limits.
+
+    Downloads run on a thread pool, local (unstructured) parsing on a process
+    pool and remote (LlamaParse) parsing as coroutines on a private event loop.
+    `run()` yields (s3_key, docs) as soon as each file is parsed, so the
+    caller can consume documents while the rest are still in flight.
+    """
+    def __init__(self, s3, bucket, remote_parser=None, remote_keys=(),
+                 download_workers=DOWNLOAD_WORKERS, parse_workers=PARSE_WORKERS,
+                 remote_concurrency=REMOTE_PARSE_CONCURRENCY, local_parse_fn=parse_local,
+                 cache=None, local_settings=None, remote_settings=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.remote_parser = remote_parser
+        self.remote_keys = set(remote_keys)
+        self.download_workers = download_workers
+        self.parse_workers = parse_workers
+        self.remote_concurrency = remote_concurrency
+        self.local_parse_fn = local_parse_fn
+        # Optional ParseCache consulted after download, keyed by content hash + parser settings
+        self.cache = cache
+        self.parser_settings = {"unstructured": local_settings or {}, "llamaparse": remote_settings or {}}
+        self.timings = {stage: StageTimer(stage) for stage in ("download", "local_parse", "remote_parse")}
+        self.failed = []
+        self.wall_time = 0.0
+
+    def _download(self, key):
+        started = time.perf_counter()
+        suffix = os.path.splitext(key)[1] or ".pdf"
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+            try:
+                self.s3.download_fileobj(self.bucket, key, temp_file)
+            except Exception:
+                temp_file.close()
+                os.remove(temp_file.name)
+                raise
+        file_hash = file_sha256(temp_file.name) if self.cache is not None else None
+        self.timings["download"].add(time.perf_counter() - started)
+        return temp_file.name, file_hash
+
+    async def _remote_parse(self, semaphore, path):
+        async with semaphore:
+            started = time.perf_counter()
+            docs = await self.remote_parser.aload_data(path)
+            self.timings["remote_parse"].add(time.perf_counter() - started)
+            # An empty result is a failed parse: it must not be cached or indexed as a file with no content
+            if not docs:
+                raise ValueError("LlamaParse returned no pages")
+            return docs
+
+    def run(self, keys):
+        """Yield (s3_key, docs) for every key that downloads and parses successfully"""
+        from langchain_core.documents import Document
+
+        started = time.perf_counter()
+        keys = iter(keys)
+        # Cap files sitting on disk waiting for a parser
+        max_in_flight = self.download_workers + self.parse_workers + self.remote_concurrency
+
+        loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+        loop_thread.start()
+        semaphore = asyncio.Semaphore(self.remote_concurrency)
+
+        download_pool = ThreadPoolExecutor(max_workers=self.download_workers)
+        # Workers are started on demand while the download threads and the event loop thread are running;
+        # forking then could copy locks those threads hold (boto3, logging), so start them from a forkserver
+        parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers,
+                                         mp_context=multiprocessing.get_context("forkserver"))
+        stage = {}  # future → (stage name, key, temp path, cache key)
+        try:
+            def refill():
+                while len(stage) < max_in_flight:
+                    key = next(keys, None)
+                    if key is None:
+                        return
+                    stage[download_pool.submit(self._download, key)] = ("download", key, None, None)
+
+            refill()
+            while stage:
+                done, _ = wait(stage, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key, path, cache_key = stage.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Could not load {key}: {e}")
+                        self.failed.append(key)
+                        if path:
+                            os.remove(path)
+                        continue
+
+                    source = f"s3://{self.bucket}/{key}"
+                    if name == "download":
+                        path, file_hash = result
+                        remote = key in self.remote_keys and self.remote_parser is not None
+                        if self.cache is not None:
+                            parser_name = "llamaparse" if remote else "unstructured"
+                            cache_key = self.cache.key_for(file_hash, parser_name, self.parser_settings[parser_name])
+                            pages = self.cache.get(cache_key)
+                            # An empty entry is a failed LlamaParse job cached by an older version: parse again
+                            if pages:
+                                os.remove(path)
+                                yield key, [Document(page_content=text, metadata=metadata) for text, metadata in pages]
+                                continue
+                        if remote:
+                            print(f"LLAMA PARSE! - {key}")
+                            next_future = asyncio.run_coroutine_threadsafe(self._remote_parse(semaphore, path), loop)
+                            stage[next_future] = ("remote_parse", key, path, cache_key)
+                        else:
+                            print(f"Regular Parse - {key}")
+                            next_future = parse_pool.submit(_timed_local_parse, self.local_parse_fn, path, source)
+                            stage[next_future] = ("local_parse", key, path, cache_key)
+                        continue
+
+                    os.remove(path)
+                    if name == "local_parse":
+                        pages, seconds = result
+                        self.timings["local_parse"].add(seconds)
+                    else:
+                        # LlamaParse returns one document per page
+                        pages = [(doc.text, {**(getattr(doc, "metadata", None) or {}), "page_number": page,
+                                             "source": source})
+                                 for page, doc in enumerate(result, 1)]
+                    if cache_key is not None:
+                        self.cache.put(cache_key, pages)
+                    yield key, [Document(page_content=text, metadata=metadata) for text, metadata in pages]
+                refill()
+        finally:
+            for future, (name, key, path, cache_key) in stage.items():
+                future.cancel()
+                if path and os.path.exists(path):
+                    os.remove(path)
+            download_pool.shutdown(wait=True, cancel_futures=True)
+            parse_pool.shutdown(wait=True, cancel_futures=True)
+            loop.call_soon_threadsafe(loop.stop)
+            loop_thread.join()
+            loop.close()
+            self.wall_time = time.perf_counter() - started
+
+    def report(self):
+        """Per-stage timings for the last run"""
+        return {
+            "wall_s": self.wall_time,
+            "failed": len(self.failed),
+            "cache": self.cache.report() if self.cache is not None else None,
+            **{name: timer.report() for name, timer in self.timings.items()},
+        }
+
+    def print_report(self):
+        if self.cache is not None:
+            self.cache.print_report()
+        report = self.report()
+        print(f"⏱️ Parse pipeline finished in {report['wall_s']:.2f}s ({report['failed']} failed)")
+        for name in self.timings:
+            stage = report[name]
+            print(f"   {name:<13} {stage['count']:>4} files, busy {stage['busy_s']:.2f}s, "
+                  f"span {stage['wall_s']:.2f}s")
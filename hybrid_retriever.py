@@ -0,0 +1,76 @@
+import asyncio
+import os
+from batching_retriever import _to_documents
+from telemetry import telemetry
+
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "colbert")  # colbert | bm25 | rerank | fusion
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "50"))  # BM25 candidates ColBERT scores in rerank mode
+RRF_K = 60  # reciprocal rank fusion constant
+
+MODES = ("colbert", "bm25", "rerank", "fusion")
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=RRF_K):
+    """Merge ranked Document lists by summed 1 / (rrf_k + rank), keyed by document id"""
+    scores, documents = {}, {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc.id or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            # Keep the first (ColBERT passage) version of a document seen in several rankings
+            documents.setdefault(key, doc)
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+class HybridRetriever:
+    """BM25 first stage in front of the ColBERT BatchingRetriever.
+
+    Modes:
+      colbert  full late-interaction search (the BM25 index is unused)
+      bm25     lexical search only
+      rerank   ColBERT scores only the top `candidates` BM25 documents (`rag.rerank`)
+      fusion   reciprocal rank fusion of the ColBERT and BM25 rankings
+    If BM25 finds nothing (no term in common), rerank falls back to full search.
+    """
+    def __init__(self, retriever, lexical_index, mode=RETRIEVAL_MODE, k=8, candidates=RERANK_CANDIDATES):
+        if mode not in MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.retriever = retriever
+        self.lexical_index = lexical_index
+        self.mode = mode
+        self.k = k
+        self.candidates = candidates
+
+    def _lexical(self, question, k, doc_ids):
+        with telemetry.span("bm25.search"):
+            return self.lexical_index.search(question, k, doc_ids)
+
+    def _rerank(self, question, hits):
+        def rerank(rag):
+            ranked = rag.rerank(query=question, documents=[hit["content"] for hit in hits], k=self.k)
+            # rerank only returns the text and its position in `documents`
+            return _to_documents([{**hits[result["result_index"]], "score": result["score"]} for result in ranked])
+        return self.retriever.call(rerank)
+
+    def invoke(self, question, config=None, doc_ids=None):
+        if self.mode == "colbert":
+            return self.retriever.invoke(question, doc_ids=doc_ids)
+        if self.mode == "bm25":
+            return _to_documents(self._lexical(question, self.k, doc_ids))
+        hits = self._lexical(question, self.candidates, doc_ids)
+        if self.mode == "rerank":
+            if not hits:
+                return self.retriever.invoke(question, doc_ids=doc_ids)
+            return self._rerank(question, hits).result()
+        return reciprocal_rank_fusion([self.retriever.invoke(question, doc_ids=doc_ids), _to_documents(hits)], self.k)
+
+    async def ainvoke(self, question, config=None, doc_ids=None):
+        if self.mode == "colbert":
+            return await self.retriever.ainvoke(question, doc_ids=doc_ids)
+        if self.mode == "bm25":
+            return _to_documents(self._lexical(question, self.k, doc_ids))
+        hits = self._lexical(question, self.candidates, doc_ids)
+        if self.mode == "rerank":
+            if not hits:
+                return await self.retriever.ainvoke(question, doc_ids=doc_ids)
+            return await asyncio.wrap_future(self._rerank(question, hits))
+        dense = await self.retriever.ainvoke(question, doc_ids=doc_ids)
+        return reciprocal_rank_fusion([dense, _to_documents(hits)], self.k)
@@ -0,0 +1,110 @@
+import contextlib
+import json
+import os
+
+# Bits per residual dimension when building the index; unset keeps RAGatouille's choice (4 below 10k documents, else 2)
+INDEX_NBITS = int(os.environ["INDEX_NBITS"]) if os.environ.get("INDEX_NBITS") else None
+NBITS_CHOICES = (1, 2, 4)
+# Memory-map the index's codes and residuals instead of reading them into each process (CPU only)
+INDEX_MMAP = os.environ.get("INDEX_MMAP") == "1"
+
+def index_info(index_dir):
+    """Compression and size of the ColBERT index in `index_dir` (from its metadata.json)"""
+    with open(os.path.join(index_dir, "metadata.json")) as f:
+        metadata = json.load(f)
+    size = sum(os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir)
+               if name.endswith((".codes.pt", ".residuals.pt")))
+    return {"nbits": metadata["config"]["nbits"], "num_chunks": metadata["num_chunks"],
+            "num_embeddings": metadata["num_embeddings"], "codes_residuals_mb": size / 1e6}
+
+@contextlib.contextmanager
+def index_nbits(nbits=INDEX_NBITS):
+    """Build (or rebuild) ColBERT indexes inside this block with `nbits` bits per residual dimension.
+
+    RAGatouille's PLAIDModelIndex.build picks nbits from the collection size and
+    merges it into its config with ColBERTConfig.from_existing, so the override
+    is applied to that merge. None leaves RAGatouille's choice alone.
+    """
+    if nbits is None:
+        yield
+        return
+    if nbits not in NBITS_CHOICES:
+        raise ValueError(f"INDEX_NBITS must be one of {', '.join(map(str, NBITS_CHOICES))}, got {nbits}")
+
+    import ragatouille.models.index as plaid
+
+    base = plaid.ColBERTConfig
+
+    class PinnedNbits(base):
+        @classmethod
+        def from_existing(cls, *sources):
+            config = base.from_existing(*sources)
+            config.configure(nbits=nbits)
+            return config
+
+    plaid.ColBERTConfig = PinnedNbits
+    try:
+        yield
+    finally:
+        plaid.ColBERTConfig = base
+
+def load_searcher_mmap(rag):
+    """Create `rag`'s searcher now, with the codes and residuals memory-mapped.
+
+    The files are mapped shared and read-only in practice, so every chat process
+    on a host serves them from the same page cache instead of holding its own
+    copy. RAGatouille creates its searcher lazily without a config, so the flag
+    is passed by wrapping colbert's Searcher for this one call; its ncells/ndocs
+    tuning is unchanged. Returns False (the index loads into RAM as usual) on a
+    GPU host or for a multi-chunk index, which colbert can't map.
+    """
+    import torch
+
+    if torch.cuda.is_available():
+        print("⚠️ Memory-mapped index loading is CPU only; loading the index into memory.")
+        return False
+    model = rag.model
+    if index_info(model.index_path)["num_chunks"] != 1:
+        print("⚠️ Index has several chunks and can't be memory-mapped "
+              "(colbert/utils/coalesce.py merges them); loading it into memory.")
+        return False
+
+    import ragatouille.models.index as plaid
+    from colbert.infra import ColBERTConfig
+
+    searcher = plaid.Searcher
+
+    def mmap_searcher(**kwargs):
+        return searcher(**{**kwargs, "config": ColBERTConfig(load_index_with_mmap=True)})
+
+    plaid.Searcher = mmap_searcher
+    try:
+        model.model_index._load_searcher(model.checkpoint, model.collection, model.index_name)
+    finally:
+        plaid.Searcher = searcher
+    return True
+
+def rebuild_with_nbits(rag, nbits, index_name):
+    """A copy of the loaded index, re-encoded from its own collection with `nbits` bits per residual dimension.
+
+    Compares compression levels on exactly the same passages, ids and metadata,
+    without re-parsing or re-chunking anything. The copy is built under
+    `index_name` in RAGatouille's index root and returned loaded.
+    """
+    from ragatouille import RAGPretrainedModel
+
+    model = rag.model
+    pids = sorted(model.pid_docid_map)
+    doc_ids = [model.pid_docid_map[pid] for pid in pids]
+    metadata = model.docid_metadata_map or {}
+    builder = RAGPretrainedModel.from_pretrained(model.checkpoint)
+    with index_nbits(nbits):
+        index_path = builder.index(
+            collection=[model.collection[pid] for pid in pids],
+            document_ids=doc_ids,
+            document_metadatas=[metadata.get(doc_id, {}) for doc_id in doc_ids],
+            index_name=index_name,
+            split_documents=False,
+            use_faiss=True,
+        )
+    return RAGPretrainedModel.from_index(index_path)
@@ -0,0 +1,97 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+
+LEXICAL_INDEX_FILE = "bm25_index.json"  # saved next to the ColBERT index files
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = {"the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "is", "are", "was", "what", "when",
+             "where", "which", "who", "how", "does", "do", "about", "with", "this", "that", "it", "be", "by", "at"}
+
+def tokenize(text):
+    """Lowercase word and number tokens, minus stopwords (numbers matter: "Lecture 7", "Exam 2")"""
+    return [token for token in re.findall(r"\w+", text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """Okapi BM25 over an inverted index of the same documents ColBERT indexes.
+
+    Postings map each term to {document id: term frequency}, so a query only
+    touches documents that share a term with it. Documents keep their text and
+    metadata so hits have the same shape as RAGatouille search results.
+    """
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.documents = {}  # document id → {"text", "metadata", "length"}
+        self.postings = {}  # term → {document id: term frequency}
+        self.total_length = 0
+
+    def add(self, texts, doc_ids, metadatas=None):
+        for i, (text, doc_id) in enumerate(zip(texts, doc_ids)):
+            if doc_id in self.documents:
+                self.delete([doc_id])
+            counts = Counter(tokenize(text))
+            length = sum(counts.values())
+            self.documents[doc_id] = {"text": text, "metadata": metadatas[i] if metadatas else {}, "length": length}
+            self.total_length += length
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, {})[doc_id] = frequency
+        return self
+
+    def delete(self, doc_ids):
+        for doc_id in doc_ids:
+            document = self.documents.pop(doc_id, None)
+            if document is None:
+                continue
+            self.total_length -= document["length"]
+            for term in set(tokenize(document["text"])):
+                postings = self.postings.get(term, {})
+                postings.pop(doc_id, None)
+                if not postings:
+                    self.postings.pop(term, None)
+
+    def search(self, query, k=8, doc_ids=None):
+        """Top-k hits ({"content", "score", "rank", "document_id", "document_metadata"}), optionally among `doc_ids`"""
+        if not self.documents:
+            return []
+        allowed = set(doc_ids) if doc_ids is not None else None
+        count = len(self.documents)
+        average_length = self.total_length / count or 1.0
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                length = self.documents[doc_id]["length"]
+                norm = frequency + self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / norm
+        return [{"content": self.documents[doc_id]["text"], "score": score, "rank": rank + 1,
+                 "document_id": doc_id, "document_metadata": self.documents[doc_id]["metadata"]}
+                for rank, (doc_id, score) in enumerate(scores.most_common(k))]
+
+    def save(self, index_dir):
+        path = os.path.join(index_dir, LEXICAL_INDEX_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "documents": self.documents}, f)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, index_dir):
+        """Load the index saved in `index_dir`, or None if the ColBERT index was built without one"""
+        path = os.path.join(index_dir, LEXICAL_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        index = cls(data["k1"], data["b"])
+        documents = data["documents"]
+        # Postings are rebuilt on load rather than stored, which keeps the file about half the size
+        index.add([d["text"] for d in documents.values()], list(documents), [d["metadata"] for d in documents.values()])
+        return index
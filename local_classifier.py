@@ -0,0 +1,107 @@
+import csv
+import math
+import re
+from collections import Counter, defaultdict
+
+LABELS = ("syllabus", "schedule", "other")
+# Posterior needed before a file is labelled locally instead of going to the LLM
+CONFIDENCE_THRESHOLD = 0.9
+
+# Filename keywords that decide a label on their own
+RULES = (
+    (re.compile(r"syllabus", re.I), "syllabus"),
+    (re.compile(r"schedule|calendar|timeline", re.I), "schedule"),
+    (re.compile(r"lecture|slides|homework|exam|quiz|solution|lab\b|guidance|reading", re.I), "other"),
+)
+
+def tokenize(path):
+    """Features of an S3 key: words of the file name and of each folder, tagged by position"""
+    segments = path.split("/")
+    # The first segment is the course name, which says nothing about the document type
+    folders, filename = segments[1:-1], segments[-1]
+    filename = re.sub(r"\.(pdf|docx?|pptx?)$", "", filename.strip(), flags=re.I)
+
+    def words(text):
+        return [word for word in re.findall(r"[a-z]+", text.lower()) if len(word) > 1]
+
+    features = [f"f:{word}" for word in words(filename)]
+    features += [f"d:{word}" for folder in folders for word in words(folder)]
+    return features
+
+class LocalFileClassifier:
+    """Keyword rules plus a multinomial naive Bayes model over path tokens.
+
+    `predict` returns (label, confidence); callers should only trust labels
+    whose confidence is at least CONFIDENCE_THRESHOLD and escalate the rest.
+    """
+    def __init__(self, threshold=CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self.label_counts = Counter()
+        self.token_counts = defaultdict(Counter)
+        self.vocabulary = set()
+
+    def fit(self, examples):
+        """Train on (filename, label) pairs"""
+        for filename, label in examples:
+            if label not in LABELS:
+                continue
+            self.label_counts[label] += 1
+            for token in tokenize(filename):
+                self.token_counts[label][token] += 1
+                self.vocabulary.add(token)
+        return self
+
+    @classmethod
+    def from_csv(cls, path, threshold=CONFIDENCE_THRESHOLD):
+        """Train from the classification store, ignoring labels it produced itself"""
+        with open(path, newline="") as f:
+            rows = [row for row in csv.DictReader(f) if row.get("source") != "local"]
+        return cls(threshold).fit((row["filename"], row["classification"]) for row in rows)
+
+    def _posteriors(self, filename):
+        tokens = tokenize(filename)
+        total = sum(self.label_counts.values())
+        vocabulary_size = len(self.vocabulary) + 1
+        log_scores = {}
+        for label in LABELS:
+            if not self.label_counts[label]:
+                continue
+            label_tokens = sum(self.token_counts[label].values())
+            score = math.log(self.label_counts[label] / total)
+            for token in tokens:
+                score += math.log((self.token_counts[label][token] + 1) / (label_tokens + vocabulary_size))
+            log_scores[label] = score
+        if not log_scores:
+            return {}
+        top = max(log_scores.values())
+        exp_scores = {label: math.exp(score - top) for label, score in log_scores.items()}
+        norm = sum(exp_scores.values())
+        return {label: score / norm for label, score in exp_scores.items()}
+
+    def predict(self, filename):
+        """Return (label, confidence) for one S3 key"""
+        segments = filename.split("/")
+        folders, basename = "/".join(segments[1:-1]), segments[-1]
+        folder_label = next((label for pattern, label in RULES[:2] if pattern.search(folders)), None)
+        for pattern, label in RULES:
+            if pattern.search(basename):
+                # e.g. "Meeting Schedule.pdf" filed under "Syllabus/": let the LLM decide
+                if folder_label and folder_label != label:
+                    return label, 0.5
+                return label, 1.0
+        posteriors = self._posteriors(filename)
+        if not posteriors:
+            return "other", 0.0
+        label = max(posteriors, key=posteriors.get)
+        return label, posteriors[label]
+
+    def split(self, filenames):
+        """Partition files into ({file: label} answered locally, [files needing the LLM])"""
+        confident, ambiguous = {}, []
+        for filename in filenames:
+            label, confidence = self.predict(filename)
+            if confidence >= self.threshold:
+                confident[filename] = label
+            else:
+                ambiguous.append(filename)
+        return confident, ambiguous
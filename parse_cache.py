@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import threading
+
+PARSE_CACHE_DIR = os.environ.get("PARSE_CACHE_DIR", ".parse_cache")
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("PARSE_CACHE_MAX_MB", "512")) * 1024 * 1024
+PARSE_CACHE_S3_PREFIX = ".parse-cache"  # dot-prefixed so list_pdf_objects ignores it
+
+class ParseCache:
+    """Content-addressed store of parser output.
+
+    Entries are keyed by the file's sha256 plus the parser name and its
+    settings, and hold the parsed (text, metadata) pages as JSON. The local
+    directory is size-bounded with least-recently-used eviction (file mtime is
+    bumped on every hit); an S3 prefix can be used as a shared second level.
+    """
+    def __init__(self, directory=PARSE_CACHE_DIR, max_bytes=PARSE_CACHE_MAX_BYTES, s3=None, bucket=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.s3 = s3
+        self.bucket = bucket
+        self.stats = {"hits": 0, "s3_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._entries())
+
+    def _entries(self):
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    @staticmethod
+    def key_for(file_hash, parser_name, settings=None):
+        """Cache key for one file parsed by one parser configuration"""
+        descriptor = json.dumps({"sha256": file_hash, "parser": parser_name, "settings": settings or {}},
+                                sort_keys=True)
+        return hashlib.sha256(descriptor.encode()).hexdigest()
+
+    def get(self, key):
+        """Return cached pages as a list of (text, metadata), or None on a miss"""
+        path = self._path(key)
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(path)
+                with open(path) as f:
+                    pages = json.load(f)["pages"]
+                self.stats["hits"] += 1
+                return [tuple(page) for page in pages]
+
+        if self.s3 is not None:
+            try:
+                body = self.s3.get_object(Bucket=self.bucket, Key=f"{PARSE_CACHE_S3_PREFIX}/{key}.json")["Body"].read()
+            except Exception:
+                body = None
+            if body is not None:
+                self._write_local(key, body)
+                with self._lock:
+                    self.stats["s3_hits"] += 1
+                return [tuple(page) for page in json.loads(body)["pages"]]
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key, pages):
+        """Store parsed pages ((text, metadata) pairs)"""
+        body = json.dumps({"pages": [list(page) for page in pages]}, default=str).encode()
+        self._write_local(key, body)
+        if self.s3 is not None:
+            try:
+                self.s3.put_object(Bucket=self.bucket, Key=f"{PARSE_CACHE_S3_PREFIX}/{key}.json", Body=body)
+            except Exception as e:
+                print(f"Could not mirror parse cache entry to S3: {e}")
+        with self._lock:
+            self.stats["writes"] += 1
+
+    def _write_local(self, key, body):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+            self._size += len(body) - previous
+            self._evict()
+
+    def _evict(self):
+        # Caller holds the lock
+        if self._size <= self.max_bytes:
+            return
+        for path in sorted(self._entries(), key=os.path.getmtime):
+            if self._size <= self.max_bytes:
+                break
+            self._size -= os.path.getsize(path)
+            os.remove(path)
+            self.stats["evictions"] += 1
+
+    def report(self):
+        lookups = self.stats["hits"] + self.stats["s3_hits"] + self.stats["misses"]
+        hit_rate = (self.stats["hits"] + self.stats["s3_hits"]) / lookups if lookups else 0.0
+        return {**self.stats, "hit_rate": hit_rate, "size_bytes": self._size}
+
+    def print_report(self):
+        report = self.report()
+        print(f"🗃️ Parse cache: {report['hits']} hits, {report['s3_hits']} S3 hits, {report['misses']} misses "
+              f"({report['hit_rate']:.0%}), {report['evictions']} evictions, {report['size_bytes'] / 1e6:.1f} MB")
@@ -1,166 +1,387 @@
 import os
-from langchain_community.document_loaders import S3FileLoader
-from ragatouille import RAGPretrainedModel
-from common import s3, S3_BUCKET_NAME, S3_INDEX_KEY, INDEX_NAME, check_if_index_exists, download_index_from_s3, list_pdf_files
-from llama_parse import LlamaParse
-import tempfile
+from common import (get_s3, S3_BUCKET_NAME, INDEX_NAME, check_if_index_exists, describe_s3_error,
+                    download_index_from_s3)
+from common import (INDEX_MANIFEST_FILE, INDEX_STATE_FILE, file_sha256, get_index_dir, index_version_prefix,
+                    list_index_version_prefixes, list_index_versions, list_pdf_objects, load_document_registry,
+                    publish_index_version, require_secret, resolve_current_index, save_document_registry)
+import json
+import time
+import uuid
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from document_classifer import CourseFileClassifier
+from chunker import Chunker
+from document_pipeline import UNSTRUCTURED_SETTINGS, DocumentPipeline
+from index_modes import index_info, index_nbits
+from lexical_index import BM25Index
+from parse_cache import ParseCache
+from telemetry import telemetry
 
-parser = LlamaParse(
-    result_type="markdown",
-    api_key=input("Enter your llamaParse API key: "),
-    premium_mode=False
-)
+# Part of the parse cache key, so changing these re-parses affected files
+LLAMA_PARSE_SETTINGS = {"result_type": "markdown", "premium_mode": False}
 
-doc_classifier = CourseFileClassifier()
+_parser = None
+
+def get_parser():
+    """LlamaParse client, created (and its key asked for) only when a file needs it"""
+    global _parser
+    if _parser is None:
+        from llama_parse import LlamaParse
+
+        _parser = LlamaParse(
+            api_key=require_secret("LLAMA_CLOUD_API_KEY", "Enter your llamaParse API key"),
+            # Raise instead of returning [] for a failed job (not part of the cache key: it doesn't change output)
+            ignore_errors=False,
+            **LLAMA_PARSE_SETTINGS
+        )
+    return _parser
+
+_parse_cache = None
+_doc_classifier = None
+
+def get_parse_cache():
+    """Parsed output of every file, keyed by content hash; set PARSE_CACHE_S3=1 to share it through the bucket.
+
+    Created on first use, so importing this module doesn't create .parse_cache/ or an S3 client.
+    """
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = ParseCache(s3=get_s3() if os.environ.get("PARSE_CACHE_S3") == "1" else None,
+                                  bucket=S3_BUCKET_NAME)
+    return _parse_cache
+
+def get_doc_classifier():
+    """File classifier, created (reading the classification store and training the local model) on first use"""
+    global _doc_classifier
+    if _doc_classifier is None:
+        _doc_classifier = CourseFileClassifier()
+    return _doc_classifier
+
+INDEX_UPLOAD_WORKERS = int(os.environ.get("INDEX_UPLOAD_WORKERS", "8"))
+INDEX_KEEP_VERSIONS = int(os.environ.get("INDEX_KEEP_VERSIONS", "5"))  # older versions are pruned after publishing
 
 # index created and uploaded
-def upload_index_to_s3():
-    """Upload the RAG index to S3"""
-    curr_dir = os.getcwd()
-    index_dir = os.path.join(curr_dir, ".ragatouille", "colbert", "indexes", INDEX_NAME)
-    
+def upload_index_to_s3(document_count=None, max_workers=INDEX_UPLOAD_WORKERS):
+    """Upload the RAG index to S3 as a new version and publish it.
+
+    Files go to rag-index/versions/<version>/ in parallel, followed by a manifest
+    (file list, sizes, sha256, document count). Readers only switch over when the
+    CURRENT pointer is swapped at the very end.
+    """
+    index_dir = get_index_dir()
+
     if not os.path.exists(index_dir):
         print(f"Error: Index directory {index_dir} does not exist.")
         return False
 
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + uuid.uuid4().hex[:6]
+    prefix = index_version_prefix(version)
+
     # Upload all files from the index directory
+    local_files = {}
     for root, dirs, files in os.walk(index_dir):
         for file in files:
+            if file in (INDEX_STATE_FILE, INDEX_MANIFEST_FILE) or file.endswith(".part"):
+                continue
             local_path = os.path.join(root, file)
             # Calculate relative path from the index_dir
-            relative_path = os.path.relpath(local_path, index_dir)
-            s3_path = f"{S3_INDEX_KEY}/{relative_path}"
-            
-            print(f"Uploading {local_path} to s3://{S3_BUCKET_NAME}/{s3_path}")
-            
+            local_files[os.path.relpath(local_path, index_dir)] = local_path
+
+    def upload(relative_path):
+        local_path = local_files[relative_path]
+        s3_path = f"{prefix}/{relative_path}"
+        print(f"Uploading {local_path} to s3://{S3_BUCKET_NAME}/{s3_path}")
+        size = os.path.getsize(local_path)
+        with telemetry.span("s3.upload", key=s3_path, bytes=size):
+            get_s3().upload_file(local_path, S3_BUCKET_NAME, s3_path)
+        telemetry.count("s3.bytes_uploaded", size)
+        return {"size": size, "sha256": file_sha256(local_path)}
+
+    manifest = {"version": version, "created_at": time.time(), "document_count": document_count, "files": {}}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(upload, relative_path): relative_path for relative_path in local_files}
+        for future in as_completed(futures):
             try:
-                s3.upload_file(local_path, S3_BUCKET_NAME, s3_path)
+                manifest["files"][futures[future]] = future.result()
             except Exception as e:
-                print(f"Error uploading {local_path}: {e}")
+                print(f"Error uploading {local_files[futures[future]]}: {e}")
                 return False
-    
-    # Create a marker file to indicate the index is complete
-    s3.put_object(
+
+    get_s3().put_object(
         Bucket=S3_BUCKET_NAME,
-        Key=f"{S3_INDEX_KEY}/index_complete.marker",
-        Body="Index upload completed"
+        Key=f"{prefix}/{INDEX_MANIFEST_FILE}",
+        Body=json.dumps(manifest, indent=1),
+        ContentType="application/json",
     )
-    
+    # Atomic swap: readers see either the previous version or this one, never a mix
+    publish_index_version(version)
+    with open(os.path.join(index_dir, INDEX_MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+    prune_index_versions()
     return True
 
+def prune_index_versions(keep=INDEX_KEEP_VERSIONS):
+    """Delete all but the newest `keep` version prefixes (the published one is always kept).
+
+    Prefixes are listed directly, so uploads that failed before writing their
+    manifest are pruned too once they fall out of the newest `keep`.
+    """
+    current = resolve_current_index(refresh=True)
+    versions = list_index_version_prefixes()
+    for version in versions[:-keep] if keep else []:
+        if current and version == current["version"]:
+            continue
+        paginator = get_s3().get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=f"{index_version_prefix(version)}/"):
+            for obj in page.get('Contents', []):
+                get_s3().delete_object(Bucket=S3_BUCKET_NAME, Key=obj['Key'])
+        print(f"🧹 Removed old index version {version}")
+
 # index exists so downloading
 def download_and_process_pdfs(pdf_files):
-    """Download PDFs from S3, process them, and return document texts."""
-    all_docs = []
-    important_files = doc_classifier.get_classified_set()
-    for pdf_file in pdf_files:
-        try:
-            if str(pdf_file) in important_files:
-                print(f"LLAMA PARSE! - {str(pdf_file)}")
-                # llama parse it
-                # Create a temporary file to store the downloaded PDF
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                    # Download the file from S3
-                    s3.download_fileobj(S3_BUCKET_NAME, pdf_file, temp_file)
-                    temp_file_path = temp_file.name
-                
-                docs = parser.load_data(temp_file_path)
-                # print(docs)
-                # put all document texts into one big text so it matches regular parse output
-                # texts = ""
-                all_docs.extend(docs)
-                # for doc in docs:
-                #     print(doc.text)
-                os.remove(temp_file_path)
-                # return
-            else:  
-                # print(f"Processing {pdf_file}")
-                print(f"Regular Parse - {str(pdf_file)}")
-                loader = S3FileLoader(S3_BUCKET_NAME, pdf_file)
-                docs = loader.load()
-                # for doc in docs:
-                #     all_docs.extend(doc.page_content)
-                all_docs.extend(docs)
-                        
-            # add regular + llama texts to all_docs
-            
-            
-        except:
-            print(f"Could not load {pdf_file}")
-    return all_docs
+    """Download PDFs from S3 and parse them, yielding (s3_key, docs) as each file finishes.
+
+    Downloads, local parsing and LlamaParse calls run as separate stages with
+    their own concurrency limits (see document_pipeline.py).
+    """
+    important_files = get_doc_classifier().get_classified_set()
+    pipeline = DocumentPipeline(
+        get_s3(), S3_BUCKET_NAME,
+        remote_parser=get_parser() if important_files else None,
+        remote_keys=important_files,
+        cache=get_parse_cache(),
+        local_settings=UNSTRUCTURED_SETTINGS,
+        remote_settings=LLAMA_PARSE_SETTINGS,
+    )
+    yield from pipeline.run(pdf_files)
+    pipeline.print_report()
+
+def course_of(pdf_file):
+    """Course of an S3 key ("course/module/file")"""
+    return pdf_file.split("/")[0]
+
+def document_metadata(pdf_file, page):
+    """Course, module, file and page (when known) of one indexed document, from its S3 key ("course/module/file")"""
+    parts = pdf_file.split("/")
+    metadata = {
+        "source_key": pdf_file,
+        "course": course_of(pdf_file),
+        "module": "/".join(parts[1:-1]),
+        "file": parts[-1],
+    }
+    if page is not None:
+        metadata["page"] = page
+    return metadata
+
+def to_collection(processed_pdfs, chunker):
+    """Chunk (s3_key, docs) pairs into texts, stable ids ("<s3 key>#<n>") and per-chunk metadata.
+
+    Also returns registry entries: each file's chunk ids and their SimHash
+    fingerprints, so later incremental updates deduplicate against them, and
+    the files whose chunks its dropped duplicates matched (`duplicates_of`).
+    """
+    doc_texts, doc_ids, doc_metadatas, registry = [], [], [], {}
+    for pdf_file, docs in processed_pdfs:
+        pages = []
+        for i, doc in enumerate(docs):
+            text = getattr(doc, "page_content", None)
+            # Parsers report page_number; parse cache entries from before that are one document per page,
+            # unless the file came back as a single document, whose page is unknown
+            page = (getattr(doc, "metadata", None) or {}).get("page_number", i + 1 if len(docs) > 1 else None)
+            pages.append((doc.text if text is None else text, page))
+        entry = registry[pdf_file] = {"doc_ids": [], "fingerprints": []}
+        with telemetry.span("index.chunk", file=pdf_file):
+            # Deduplicated within the course only, so the course filter finds a file posted in several courses
+            chunks = chunker.chunk_file(pages, scope=course_of(pdf_file), owner=pdf_file)
+        for i, (chunk, page, fingerprint) in enumerate(chunks):
+            doc_texts.append(f"Document: {chunk}")
+            doc_ids.append(f"{pdf_file}#{i}")
+            doc_metadatas.append(document_metadata(pdf_file, page))
+            entry["doc_ids"].append(doc_ids[-1])
+            entry["fingerprints"].append(fingerprint)
+        entry["duplicates_of"] = sorted(chunker.duplicates_of.get(pdf_file, ()))
+    return doc_texts, doc_ids, doc_metadatas, registry
+
+def print_index_report(chunker):
+    chunker.print_report()
+    info = index_info(get_index_dir())
+    print(f"📦 Index: {info['num_embeddings']} token embeddings, {info['codes_residuals_mb']:.1f} MB of "
+          f"{info['nbits']}-bit codes and residuals")
 
 def ingest_pdfs_into_rag():
     """Fetch PDFs, process them, and ingest into RAG model."""
-    pdf_files = list_pdf_files()
-    if not pdf_files:
+    pdf_objects = list_pdf_objects()
+    if not pdf_objects:
         print("No PDFs found in S3.")
         return None
 
-    docs = download_and_process_pdfs(pdf_files)
-    
-    doc_texts = []
-    for doc in docs:
-        try:
-            doc_texts.append(f"Document: {doc.page_content}")
-        except:
-            doc_texts.append(f"Document: {doc.text}")
-    # doc_texts = [
-    # f"Document: {doc.metadata['source']} | {doc.page_content}"
-    # for doc in docs
-    # ]
-    
-    # put them in as texts in download_and_process_pdfs
-    # doc_texts = docs
-    
+    chunker = Chunker()
+    doc_texts, doc_ids, doc_metadatas, doc_id_map = to_collection(download_and_process_pdfs(list(pdf_objects)), chunker)
+
     # Initialize a new RAG model for indexing
+    from ragatouille import RAGPretrainedModel
+
     rag = RAGPretrainedModel.from_pretrained("colbert-ir/colbertv2.0")
 
     # Index into RAG
     # Note: ragatouille will save the index in ~/.ragatouille/colbert/indexes/INDEX_NAME
-    rag.index(
-        collection=doc_texts,
-        index_name=INDEX_NAME,
-        split_documents=True,
-        use_faiss=True,
-    )
-    
+    # INDEX_NBITS trades index size (and RAM on the chat hosts) for retrieval quality
+    with index_nbits(), telemetry.span("colbert.index", chunks=len(doc_texts)):
+        rag.index(
+            collection=doc_texts,
+            document_ids=doc_ids,
+            document_metadatas=doc_metadatas,
+            index_name=INDEX_NAME,
+            # Chunks already fit one ColBERT passage (chunker.py)
+            split_documents=False,
+            use_faiss=True,
+        )
+    save_document_registry({
+        pdf_file: {"etag": pdf_objects[pdf_file], **entry} for pdf_file, entry in doc_id_map.items()
+    })
+    print_index_report(chunker)
+    # BM25 first stage over the same documents, uploaded with the rest of the index
+    BM25Index().add(doc_texts, doc_ids, doc_metadatas).save(get_index_dir())
+
     # After successful indexing, upload to S3
-    if upload_index_to_s3():
+    if upload_index_to_s3(document_count=len(doc_texts)):
         print("🚀 PDF documents successfully indexed into RAG and saved to S3!")
         return rag
     else:
         print("⚠️ Failed to upload index to S3.")
         return None
 
-def initialize_rag():
-    """Initialize the RAG model by either loading the existing index or creating a new one."""
+def dependent_files(registry, stale):
+    """Unchanged files whose dropped duplicates matched chunks of a `stale` file, directly or through another"""
+    stale, dependents = set(stale), []
+    while True:
+        found = [key for key, entry in registry.items()
+                 if key not in stale and stale.intersection(entry.get("duplicates_of", ()))]
+        if not found:
+            return dependents
+        stale.update(found)
+        dependents += found
+
+def update_rag_index(rag):
+    """Bring a loaded index up to date with the bucket, encoding only the delta.
+
+    Documents whose S3 ETag changed are removed and re-added, new ones are added,
+    and documents no longer in the bucket are deleted. Files with chunks dropped
+    as duplicates of a changed or deleted file's chunks are re-chunked too, so
+    those chunks come back. Returns None if the index has no registry (built
+    before incremental indexing) so the caller can rebuild.
+    """
+    registry = load_document_registry()
+    if registry is None:
+        print("No document registry found alongside the index.")
+        return None
+
+    pdf_objects = list_pdf_objects()
+    added = [key for key in pdf_objects if key not in registry]
+    changed = [key for key in pdf_objects if key in registry and registry[key]["etag"] != pdf_objects[key]]
+    deleted = [key for key in registry if key not in pdf_objects]
+    dependents = dependent_files(registry, changed + deleted)
+    print(f"Index delta: {len(added)} new, {len(changed)} changed, {len(deleted)} deleted, "
+          f"{len(dependents)} re-chunked for dropped duplicates, "
+          f"{len(registry) - len(changed) - len(deleted) - len(dependents)} unchanged")
+    if not (added or changed or deleted):
+        return rag
+    changed += dependents
+
+    stale_ids = [doc_id for key in changed + deleted for doc_id in registry[key]["doc_ids"]]
+    if stale_ids:
+        with telemetry.span("colbert.delete_from_index", chunks=len(stale_ids)):
+            rag.delete_from_index(document_ids=stale_ids)
+    for key in changed + deleted:
+        del registry[key]
+
+    # Deduplicate new chunks against the ones already indexed (registries from before chunking have no fingerprints)
+    chunker = Chunker(seen=[(course_of(key), fp, key) for key, entry in registry.items()
+                            for fp in entry.get("fingerprints", [])])
+    doc_texts, doc_ids, doc_metadatas, doc_id_map = to_collection(download_and_process_pdfs(added + changed), chunker)
+    if doc_texts:
+        # RAGatouille rebuilds the whole index when many documents are added; keep the chosen nbits
+        with index_nbits(), telemetry.span("colbert.add_to_index", chunks=len(doc_texts)):
+            rag.add_to_index(
+                new_collection=doc_texts,
+                new_document_ids=doc_ids,
+                new_document_metadatas=doc_metadatas,
+                split_documents=False,
+            )
+    for pdf_file, entry in doc_id_map.items():
+        registry[pdf_file] = {"etag": pdf_objects[pdf_file], **entry}
+    save_document_registry(registry)
+    print_index_report(chunker)
+
+    lexical_index = BM25Index.load(get_index_dir())
+    if lexical_index is not None:
+        lexical_index.delete(stale_ids)
+        lexical_index.add(doc_texts, doc_ids, doc_metadatas).save(get_index_dir())
+    else:
+        print("⚠️ Index has no BM25 stage yet; run with --rebuild to create one.")
+
+    document_count = sum(len(entry["doc_ids"]) for entry in registry.values())
+    if upload_index_to_s3(document_count=document_count):
+        print("🚀 Index updated incrementally and saved to S3!")
+        return rag
+    print("⚠️ Failed to upload index to S3.")
+    return None
+
+def initialize_rag(rebuild=False):
+    """Initialize the RAG model by updating the existing index in place or creating a new one."""
     # Check if the index already exists in S3
-    if check_if_index_exists():
+    try:
+        exists = not rebuild and check_if_index_exists()
+    except Exception as e:
+        print(f"❌ {describe_s3_error(e)}")
+        return None
+    if exists:
         print("Existing RAG index found in S3. Downloading...")
-        
+
         # Download the index from S3
         if download_index_from_s3():
             print("🔄 Downloaded existing RAG index from S3!")
-            
-            # Get the path to the downloaded index
-            curr_dir = os.getcwd()
-            index_path = os.path.join(curr_dir, ".ragatouille", "colbert", "indexes", INDEX_NAME)
-            
+
             # Load the index using from_index class method
-            rag = RAGPretrainedModel.from_index(index_path)
+            from ragatouille import RAGPretrainedModel
+
+            rag = RAGPretrainedModel.from_index(get_index_dir())
             print("✅ Loaded existing RAG index!")
-            return rag
+            try:
+                updated = update_rag_index(rag)
+            except Exception as e:
+                print(f"⚠️ Incremental update failed ({e}).")
+                updated = None
+            if updated is not None:
+                return updated
+            print("Falling back to a full rebuild...")
+            return ingest_pdfs_into_rag()
         else:
             print("⚠️ Failed to download index from S3. Creating a new index...")
             return ingest_pdfs_into_rag()
     else:
-        print("No existing RAG index found in S3. Creating a new index...")
+        print("Creating a new RAG index...")
         return ingest_pdfs_into_rag()
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Build the RAG index and publish it to S3")
+    arg_parser.add_argument("--list-versions", action="store_true", help="list published index versions")
+    arg_parser.add_argument("--rollback", metavar="VERSION", help="point readers at an earlier index version")
+    arg_parser.add_argument("--rebuild", action="store_true", help="re-encode every document instead of the delta")
+    args = arg_parser.parse_args()
+
+    if args.list_versions:
+        current = resolve_current_index()
+        for version in list_index_versions():
+            print(("* " if current and current["version"] == version else "  ") + version)
+        raise SystemExit(0)
+    if args.rollback:
+        publish_index_version(args.rollback)
+        raise SystemExit(0)
+
     print("Starting PDF ingestion and RAG index creation...")
-    rag = initialize_rag()
+    rag = initialize_rag(rebuild=args.rebuild)
+    telemetry.print_report()
     if rag:
         print("Index creation complete! You can now run the chat interface.")
     else:
@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telemetry import telemetry
+
+RAG_SERVER_HOST = os.environ.get("RAG_SERVER_HOST", "127.0.0.1")
+RAG_SERVER_PORT = int(os.environ.get("RAG_SERVER_PORT", "8000"))
+
+class RAGService:
+    """Runs the chat bot's async API on one background event loop.
+
+    HTTP handler threads hand their questions to this loop, so concurrent
+    requests share the batching retriever and overlap their LLM calls (the
+    chat model's rate limiter still applies). `max_concurrency` caps the
+    number of questions in flight.
+    """
+    def __init__(self, bot, max_concurrency):
+        self.bot = bot
+        self.max_concurrency = max_concurrency
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True, name="rag-service")
+        self._thread.start()
+        self._slots = asyncio.run_coroutine_threadsafe(self._make_semaphore(), self.loop).result()
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_concurrency)
+
+    async def _ask(self, inputs):
+        async with self._slots:
+            return await self.bot.ainvoke(inputs)
+
+    def ask(self, inputs):
+        return asyncio.run_coroutine_threadsafe(self._ask(inputs), self.loop).result()
+
+    def batch(self, inputs_list):
+        config = {"max_concurrency": self.max_concurrency}
+        if hasattr(self.bot, "cache"):
+            coroutine = self.bot.abatch(inputs_list, config=config)
+        else:
+            coroutine = self.bot.abatch(inputs_list, config=config, return_exceptions=True)
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+def to_response(result):
+    """JSON-safe subset of a graph result"""
+    if isinstance(result, Exception):
+        return {"answer": None, "error": str(result)}
+    keys = ("answer", "cached", "latency_s", "prompt_tokens", "courses", "error")
+    response = {key: result[key] for key in keys if key in result}
+    response["sources"] = [doc.metadata for doc in result.get("context") or []]
+    return response
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, content_type="application/json"):
+            payload = body.encode() if isinstance(body, str) else json.dumps(body, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/health":
+                return self._send(200, {"status": "ok"})
+            if self.path == "/stats":
+                stats = {}
+                if hasattr(service.bot, "cache"):
+                    stats["answer_cache"] = service.bot.cache.report()
+                stats["telemetry"] = telemetry.report()
+                return self._send(200, stats)
+            if self.path == "/metrics":
+                return self._send(200, telemetry.prometheus(), "text/plain; version=0.0.4")
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except json.JSONDecodeError:
+                return self._send(400, {"error": "invalid JSON"})
+
+            # Stateless: callers send their own (already budgeted) history and summary
+            def inputs(question):
+                return {"question": question, "history": body.get("history", []), "summary": body.get("summary", "")}
+
+            questions = body.get("questions")
+            try:
+                if self.path == "/ask" and isinstance(body.get("question"), str):
+                    return self._send(200, to_response(service.ask(inputs(body["question"]))))
+                if (self.path == "/batch" and isinstance(questions, list)
+                        and all(isinstance(question, str) for question in questions)):
+                    results = service.batch([inputs(question) for question in questions])
+                    return self._send(200, {"results": [to_response(result) for result in results]})
+            except Exception as e:
+                # e.g. the LLM provider's rate limit (429): tell the client to retry instead of dropping the connection
+                status = 503 if getattr(e, "status_code", None) == 429 else 500
+                return self._send(status, {"answer": None, "error": str(e)})
+            self._send(400, {"error": "POST /ask {\"question\": ...} or /batch {\"questions\": [\"...\", ...]}"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def serve(bot, host=RAG_SERVER_HOST, port=RAG_SERVER_PORT, max_concurrency=None):
+    """Serve `bot` over HTTP until interrupted"""
+    from chat_interface import LLM_MAX_CONCURRENCY
+
+    service = RAGService(bot, max_concurrency or LLM_MAX_CONCURRENCY)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"🌐 Serving the RAG chatbot on http://{host}:{server.server_port} (POST /ask, POST /batch)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Serve the RAG chatbot over HTTP")
+    arg_parser.add_argument("--host", default=RAG_SERVER_HOST)
+    arg_parser.add_argument("--port", type=int, default=RAG_SERVER_PORT)
+    arg_parser.add_argument("--max-concurrency", type=int, help="questions in flight at once")
+    args = arg_parser.parse_args()
+
+    from chat_interface import create_rag_chat_bot
+
+    bot = create_rag_chat_bot()
+    if not bot:
+        print("Failed to create RAG chatbot.")
+        raise SystemExit(1)
+    serve(bot, args.host, args.port, args.max_concurrency)
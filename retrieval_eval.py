@@ -0,0 +1,161 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from common import INDEX_NAME, get_index_dir, load_document_registry
+from course_router import CourseRouter
+from hybrid_retriever import MODES
+from index_modes import NBITS_CHOICES, index_info, rebuild_with_nbits
+from lexical_index import BM25Index
+from telemetry import telemetry
+
+EVAL_WORKERS = int(os.environ.get("EVAL_WORKERS", "8"))  # questions in flight; concurrent searches are batched
+EVAL_K_VALUES = (4, 8, 16)
+# gpt-4o-mini input price (USD per million tokens), for the prompt cost of each configuration
+PROMPT_PRICE_PER_MTOK = float(os.environ.get("EVAL_PROMPT_PRICE_PER_MTOK", "0.15"))
+
+def load_questions(path):
+    """Labelled questions from a JSON-lines file.
+
+    One object per line: {"question": ..., "expected_sources": [S3 keys of the
+    files that answer it], "course": optional course name}. Blank lines and
+    lines starting with # are skipped.
+    """
+    questions = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            question = json.loads(line)
+            if not question.get("question") or not question.get("expected_sources"):
+                raise ValueError(f"{path}:{line_number}: needs \"question\" and \"expected_sources\"")
+            questions.append(question)
+    return questions
+
+def source_of(doc):
+    """S3 key of the file a retrieved chunk came from"""
+    return doc.metadata.get("source_key") or (doc.id or "").split("#")[0]
+
+def score(sources, expected):
+    """Recall (share of expected files among `sources`) and reciprocal rank of the first relevant chunk"""
+    expected = set(expected)
+    first = next((rank for rank, source in enumerate(sources, 1) if source in expected), None)
+    return len(expected & set(sources)) / len(expected), 1 / first if first else 0.0
+
+def percentiles_ms(samples):
+    samples = sorted(samples)
+    pick = lambda q: 1000 * samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+def no_answer_model():
+    """Chat model that answers instantly with nothing, so only retrieval and prompt assembly are measured"""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    return FakeListChatModel(responses=[""])
+
+def evaluate(graph, questions, workers=EVAL_WORKERS):
+    """Run every question through the graph's retrieve → prompt steps on a worker pool and score the results"""
+    def run(question):
+        with telemetry.trace("eval.question") as trace:
+            state = graph.invoke({"question": question["question"], "history": []})
+        recall, reciprocal_rank = score([source_of(doc) for doc in state["context"]], question["expected_sources"])
+        routed = question["course"] in state.get("courses", []) if question.get("course") else None
+        return recall, reciprocal_rank, trace.breakdown().get("chat.retrieve", 0.0), state["prompt_tokens"], routed
+
+    started = time.perf_counter()
+    # The graph prints per-question details; only the summary is wanted here
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run, questions))
+    elapsed = time.perf_counter() - started
+
+    recalls, reciprocal_ranks, latencies, prompt_tokens, routed = zip(*results)
+    mean_prompt_tokens = sum(prompt_tokens) / len(results)
+    routed = [hit for hit in routed if hit is not None]
+    return {
+        "questions": len(results),
+        "recall": sum(recalls) / len(results),
+        "mrr": sum(reciprocal_ranks) / len(results),
+        "retrieval": percentiles_ms(latencies),
+        "questions_per_s": len(results) / elapsed,
+        "mean_prompt_tokens": mean_prompt_tokens,
+        "prompt_cost_per_1k_questions": mean_prompt_tokens * PROMPT_PRICE_PER_MTOK / 1000,
+        "routing_accuracy": sum(routed) / len(routed) if routed else None,
+    }
+
+def sweep(rag, questions, k_values=EVAL_K_VALUES, modes=("colbert",), nbits_values=(None,), routing=(True,),
+          workers=EVAL_WORKERS):
+    """Evaluate every combination of index compression, retrieval mode, k and routing.
+
+    nbits None is the loaded index; other values re-encode a copy of it (see
+    index_modes.rebuild_with_nbits). Each configuration gets a fresh, warmed
+    retriever and the real prompt, so prompt tokens match what a chat turn sends.
+    """
+    from chat_interface import WARMUP_QUERY, build_rag_graph, build_retriever, load_prompt
+
+    prompt = load_prompt()
+    llm = no_answer_model()
+    lexical_index = BM25Index.load(get_index_dir())
+    registry = load_document_registry()
+    router = CourseRouter(registry) if registry else None
+    if router is None and any(routing):
+        print("⚠️ No document registry; evaluating without course routing.")
+        routing = (False,)
+
+    results = []
+    for nbits in nbits_values:
+        if nbits is None:
+            index_rag, index_nbits = rag, index_info(get_index_dir())["nbits"]
+        else:
+            print(f"🧪 Re-encoding the index with {nbits}-bit residuals...")
+            index_rag, index_nbits = rebuild_with_nbits(rag, nbits, f"{INDEX_NAME}-eval-{nbits}bit"), nbits
+        for mode in modes:
+            for k in k_values:
+                for routed in routing:
+                    retriever = build_retriever(index_rag, k=k, mode=mode, lexical_index=lexical_index)
+                    retriever.invoke(WARMUP_QUERY)
+                    graph = build_rag_graph(retriever, llm, prompt, router=router if routed else None)
+                    config = {"nbits": index_nbits, "mode": mode, "k": k, "routing": routed}
+                    result = {**config, **evaluate(graph, questions, workers)}
+                    results.append(result)
+                    print_result(result)
+    return results
+
+def print_result(result):
+    latency = result["retrieval"]
+    print(f"📏 {result['nbits']}-bit {result['mode']:<7} k={result['k']:<3} "
+          f"routing={'on ' if result['routing'] else 'off'}  recall {result['recall']:.3f}  MRR {result['mrr']:.3f}  "
+          f"retrieval p50 {latency['p50_ms']:.0f} ms p95 {latency['p95_ms']:.0f} ms  "
+          f"{result['mean_prompt_tokens']:.0f} prompt tokens "
+          f"(${result['prompt_cost_per_1k_questions']:.3f}/1k questions)")
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Measure retrieval quality, latency and prompt cost on a "
+                                                     "labelled question set, sweeping k and index settings")
+    arg_parser.add_argument("questions", help="JSON-lines file of {question, expected_sources, course}")
+    arg_parser.add_argument("--k", type=int, nargs="+", default=list(EVAL_K_VALUES))
+    arg_parser.add_argument("--modes", nargs="+", choices=MODES, default=["colbert"])
+    arg_parser.add_argument("--nbits", type=int, nargs="+", choices=NBITS_CHOICES,
+                            help="also re-encode the index at these compression levels")
+    arg_parser.add_argument("--routing", choices=["on", "off", "both"], default="on")
+    arg_parser.add_argument("--workers", type=int, default=EVAL_WORKERS)
+    arg_parser.add_argument("--output", help="write the results as JSON to this file")
+    args = arg_parser.parse_args()
+
+    from chat_interface import load_rag_model
+
+    eval_questions = load_questions(args.questions)
+    rag = load_rag_model()
+    if rag is None:
+        raise SystemExit(1)
+    print(f"Evaluating {len(eval_questions)} questions...")
+    eval_results = sweep(rag, eval_questions, k_values=args.k, modes=args.modes,
+                         nbits_values=[None] + (args.nbits or []),
+                         routing={"on": (True,), "off": (False,), "both": (True, False)}[args.routing],
+                         workers=args.workers)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(eval_results, f, indent=1)
+        print(f"💾 Results written to {args.output}")
@@ -1,22 +1,49 @@
 import streamlit as st
-from chat_interface import create_rag_chat_bot
+from chat_interface import create_rag_chat_bot, stream_answer
+from answer_cache import answer_cache
+from conversation_memory import ConversationMemory
+from telemetry import format_breakdown
 
 st.title("RAG Chatbot")
 
-# Initialize session state for chat history, input, and RAG model
+@st.cache_resource(show_spinner="Loading the course index...")
+def get_chat_bot():
+    """One index, retriever and graph per server process, shared by every browser session"""
+    return create_rag_chat_bot()
+
+rag_model = get_chat_bot()
+if rag_model is None:
+    st.error("Failed to create the RAG chatbot. Run rag_indexer.py to build the index first.")
+    get_chat_bot.clear()
+    st.stop()
+
+# Shared across sessions: repeated questions from any student are answered from the cache
+cache_report = answer_cache.report()
+st.sidebar.metric("Answer cache hit rate", f"{cache_report['hit_rate']:.0%}")
+st.sidebar.caption(f"{cache_report['entries']} cached answers")
+
+# Initialize per-session state: chat history and input
 if "history" not in st.session_state:
     st.session_state.history = []
+if "memory" not in st.session_state:
+    # What the model sees: recent turns verbatim plus a running summary, within a token budget
+    st.session_state.memory = ConversationMemory()
 if "input_key" not in st.session_state:
     st.session_state.input_key = "input_0"
-if "rag_model" not in st.session_state:
-    # Load the RAG model only once and store it in session state
-    st.session_state.rag_model = create_rag_chat_bot()
 
 # Display chat history
 for chat in st.session_state.history:
     st.write(f"**You:** {chat['question']}")
     st.write(f"**Bot:** {chat['answer']}")
     st.write("---")
+if "last_metrics" in st.session_state:
+    last = st.session_state.last_metrics
+    st.sidebar.metric("Time to first token", f"{last['ttft_s']:.2f}s",
+                      help=f"Full answer in {last['latency_s']:.2f}s" + (" (cached)" if last["cached"] else ""))
+    if last["prompt_tokens"]:
+        st.sidebar.metric("Prompt tokens", last["prompt_tokens"])
+    if last.get("breakdown"):
+        st.sidebar.caption(f"Last turn: {format_breakdown(last['breakdown'])}")
 
 # User input
 user_input = st.text_input("You: ", key=st.session_state.input_key)
@@ -26,14 +53,15 @@ if user_input:
     if user_input.lower() in ["exit", "quit"]:
         st.write("Goodbye!")
     else:
-        # Invoke the RAG chatbot
-        result = st.session_state.rag_model.invoke({"question": user_input, "history": st.session_state.history})
-        
+        # Stream the RAG chatbot's answer into the page as tokens arrive
+        st.write("**Bot:**")
+        stream = stream_answer(rag_model, {"question": user_input, **st.session_state.memory.inputs()})
+        st.write_stream(stream)
+
         # Update chat history
-        st.session_state.history.append({"question": user_input, "answer": result['answer']})
-        
-        # Display the bot's response
-        st.write(f"**Bot:** {result['answer']}")
+        st.session_state.history.append({"question": user_input, "answer": stream.answer})
+        st.session_state.memory.add_turn(user_input, stream.answer)
+        st.session_state.last_metrics = stream.metrics()
         
         # Clear the input box by updating the input key
         st.session_state.input_key = "input_" + str(len(st.session_state.history))
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import time
+
+# Local manifest path; optionally mirrored to S3 so a fresh host can resume the delta
+MANIFEST_PATH = os.environ.get("CANVAS_SYNC_MANIFEST", ".canvas_sync_manifest.json")
+MANIFEST_S3_KEY = ".sync/manifest.json"
+
+class SyncManifest:
+    """Record of every Canvas file already copied to S3, keyed by Canvas file id.
+
+    Each entry holds the Canvas `updated_at`, `size`, the sha256 of the uploaded
+    bytes and the S3 keys the file was written to. Entries for files that
+    disappear from Canvas are tombstoned rather than dropped. The ETag and items
+    of every listing page are kept too, for conditional requests next sync;
+    pages not requested during a sync are dropped when it is saved.
+    """
+    def __init__(self, path=MANIFEST_PATH, s3=None, bucket=None):
+        self.path = path
+        self.s3 = s3
+        self.bucket = bucket
+        self.entries = {}
+        self.listings = {}
+        self.seen_keys = set()
+        self.seen_listings = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the manifest from disk, falling back to the S3 mirror"""
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            self.entries, self.listings = data.get("files", {}), data.get("listings", {})
+        elif self.s3 is not None:
+            try:
+                data = json.loads(self.s3.get_object(Bucket=self.bucket, Key=MANIFEST_S3_KEY)["Body"].read())
+                self.entries, self.listings = data.get("files", {}), data.get("listings", {})
+            except Exception:
+                self.entries, self.listings = {}, {}
+        print(f"📒 Loaded sync manifest with {len(self.entries)} files")
+        return self
+
+    def save(self):
+        """Write the manifest locally (atomically) and mirror it to S3"""
+        with self._lock:
+            self.listings = {url: page for url, page in self.listings.items() if url in self.seen_listings}
+            payload = json.dumps({"version": 1, "saved_at": time.time(), "files": self.entries,
+                                  "listings": self.listings}, indent=1)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+        if self.s3 is not None:
+            self.s3.put_object(Bucket=self.bucket, Key=MANIFEST_S3_KEY, Body=payload.encode())
+
+    def get(self, file_id):
+        with self._lock:
+            return self.entries.get(str(file_id))
+
+    def lookup(self, file_id, metadata):
+        """Return the live entry for a file if its Canvas metadata is unchanged"""
+        entry = self.get(file_id)
+        if not entry or entry.get("deleted_at"):
+            return None
+        if entry.get("updated_at") != metadata.get("updated_at") or entry.get("size") != metadata.get("size"):
+            return None
+        return entry
+
+    def listing(self, url):
+        """The stored {"etag", "items", "next"} of a Canvas listing page, if any"""
+        with self._lock:
+            page = self.listings.get(url)
+            if page is not None:
+                self.seen_listings.add(url)
+            return page
+
+    def record_listing(self, url, etag, items, next_url):
+        with self._lock:
+            self.listings[url] = {"etag": etag, "items": items, "next": next_url}
+            self.seen_listings.add(url)
+
+    def mark_seen(self, s3_key):
+        with self._lock:
+            self.seen_keys.add(s3_key)
+
+    def record(self, file_id, metadata, s3_key, sha256):
+        """Store the metadata and content hash of a file now present at s3_key"""
+        with self._lock:
+            entry = self.entries.get(str(file_id), {})
+            keys = [] if entry.get("sha256") != sha256 else entry.get("s3_keys", [])
+            entry.update({
+                "updated_at": metadata.get("updated_at"),
+                "size": metadata.get("size"),
+                "sha256": sha256,
+                "s3_keys": sorted(set(keys) | {s3_key}),
+                "synced_at": time.time(),
+            })
+            entry.pop("deleted_at", None)
+            self.entries[str(file_id)] = entry
+            self.seen_keys.add(s3_key)
+
+    def tombstone_missing(self, courses):
+        """Tombstone keys in fully-listed courses that weren't seen this run.
+
+        Returns the S3 keys that should be removed from the bucket.
+        """
+        removed = []
+        with self._lock:
+            for entry in self.entries.values():
+                if entry.get("deleted_at"):
+                    continue
+                stale = [key for key in entry.get("s3_keys", [])
+                         if key.split("/", 1)[0] in courses and key not in self.seen_keys]
+                if not stale:
+                    continue
+                removed.extend(stale)
+                entry["s3_keys"] = [key for key in entry["s3_keys"] if key not in stale]
+                if not entry["s3_keys"]:
+                    entry["deleted_at"] = time.time()
+        return removed
@@ -0,0 +1,183 @@
+import atexit
+import contextlib
+import contextvars
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+# Spans and counters are always kept in memory; set TELEMETRY_DIR to also write spans.jsonl and metrics.prom there
+TELEMETRY_DIR = os.environ.get("TELEMETRY_DIR")
+TELEMETRY_EXPORT_INTERVAL = float(os.environ.get("TELEMETRY_EXPORT_INTERVAL", "10"))  # seconds between metrics.prom
+# cProfile every span with this name (e.g. "chat.turn"); profiles are written to TELEMETRY_DIR (or .telemetry/)
+TELEMETRY_PROFILE = os.environ.get("TELEMETRY_PROFILE")
+
+_trace = contextvars.ContextVar("telemetry_trace", default=None)
+
+class Trace:
+    """Spans recorded while one unit of work (a chat turn, an index build) runs"""
+    def __init__(self, name):
+        self.name = name
+        self.id = uuid.uuid4().hex[:16]
+        self.spans = []
+        self.duration_s = None
+        self._lock = threading.Lock()
+
+    def add(self, name, duration_s):
+        with self._lock:
+            self.spans.append((name, duration_s))
+
+    def breakdown(self):
+        """Seconds per span name (nested spans are also counted in their parents), plus the total"""
+        totals = defaultdict(float)
+        with self._lock:
+            for name, duration_s in self.spans:
+                totals[name] += duration_s
+        return {**totals, "total": self.duration_s}
+
+class Telemetry:
+    """Timing spans and counters for the crawl, index and chat pipelines.
+
+    `span` times a block, `observe` records a duration measured elsewhere (e.g.
+    requests' `response.elapsed`) and `count` adds to a counter. Per-name span
+    count/sum/max and the counters are exported as Prometheus text; individual
+    spans are appended to a JSON-lines file. Spans inside a `trace` (and in
+    threads or tasks started from it with the context copied, as LangGraph
+    does for its nodes) are also collected on that Trace for a per-turn
+    breakdown.
+    """
+    def __init__(self, directory=TELEMETRY_DIR, profile=TELEMETRY_PROFILE, export_interval=TELEMETRY_EXPORT_INTERVAL):
+        self.directory = directory
+        self.profile = profile
+        self.export_interval = export_interval
+        self.spans = defaultdict(lambda: {"count": 0, "sum_s": 0.0, "max_s": 0.0})
+        self.counters = defaultdict(float)
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._events = None
+        self._last_export = 0.0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._events = open(os.path.join(directory, "spans.jsonl"), "a", buffering=1)
+            atexit.register(self.export)
+
+    def observe(self, name, duration_s, **attrs):
+        with self._lock:
+            stats = self.spans[name]
+            stats["count"] += 1
+            stats["sum_s"] += duration_s
+            stats["max_s"] = max(stats["max_s"], duration_s)
+        trace = _trace.get()
+        if trace is not None:
+            trace.add(name, duration_s)
+        if self._events is not None:
+            event = {"ts": time.time(), "span": name, "duration_s": round(duration_s, 6),
+                     "trace": trace.id if trace else None, **attrs}
+            with self._lock:
+                self._events.write(json.dumps(event, default=str) + "\n")
+            if time.monotonic() - self._last_export > self.export_interval:
+                self.export()
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        """Time the block; `attrs` (sizes, batch counts, ...) go to the JSON-lines record"""
+        profiler = None
+        if self.profile == name and self._profiling.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            duration_s = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+                self._profiling.release()
+                self._dump_profile(name, profiler)
+            self.observe(name, duration_s, **attrs)
+
+    @contextlib.contextmanager
+    def trace(self, name, **attrs):
+        """A span that also collects every span recorded inside it (see Trace.breakdown)"""
+        trace = Trace(name)
+        with self.span(name, **attrs):
+            token = _trace.set(trace)
+            started = time.perf_counter()
+            try:
+                yield trace
+            finally:
+                trace.duration_s = time.perf_counter() - started
+                try:
+                    _trace.reset(token)
+                except ValueError:
+                    # A generator closed from another context (e.g. garbage-collected elsewhere)
+                    _trace.set(None)
+
+    def _dump_profile(self, name, profiler):
+        directory = self.directory or ".telemetry"
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.prof")
+        profiler.dump_stats(path)
+        print(f"🔬 Profile of {name} written to {path} (python -m pstats {path})")
+
+    def report(self):
+        with self._lock:
+            return {"spans": {name: {**stats, "mean_s": stats["sum_s"] / stats["count"]}
+                              for name, stats in self.spans.items()},
+                    "counters": dict(self.counters)}
+
+    def print_report(self):
+        """Where the time went, slowest span total first"""
+        report = self.report()
+        print("⏱️ Time by span:")
+        for name, stats in sorted(report["spans"].items(), key=lambda item: item[1]["sum_s"], reverse=True):
+            print(f"   {name:<26} {stats['count']:>6}x  total {stats['sum_s']:8.2f}s  mean {stats['mean_s']:.3f}s  "
+                  f"max {stats['max_s']:.3f}s")
+        for name, value in sorted(report["counters"].items()):
+            print(f"   {name:<26} {value:g}")
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        def metric(name):
+            return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+        report = self.report()
+        lines = ["# TYPE canvas_span_seconds summary"]
+        for name, stats in sorted(report["spans"].items()):
+            lines.append(f'canvas_span_seconds_count{{span="{name}"}} {stats["count"]}')
+            lines.append(f'canvas_span_seconds_sum{{span="{name}"}} {stats["sum_s"]:.6f}')
+        lines.append("# TYPE canvas_span_max_seconds gauge")
+        for name, stats in sorted(report["spans"].items()):
+            lines.append(f'canvas_span_max_seconds{{span="{name}"}} {stats["max_s"]:.6f}')
+        for name, value in sorted(report["counters"].items()):
+            lines += [f"# TYPE canvas_{metric(name)}_total counter", f"canvas_{metric(name)}_total {value:g}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """Rewrite metrics.prom in TELEMETRY_DIR (a no-op without one)"""
+        if not self.directory:
+            return
+        with self._export_lock:
+            self._last_export = time.monotonic()
+            path = os.path.join(self.directory, "metrics.prom")
+            with open(f"{path}.tmp", "w") as f:
+                f.write(self.prometheus())
+            os.replace(f"{path}.tmp", path)
+
+def format_breakdown(breakdown):
+    """Trace.breakdown() as one line, e.g. retrieve 0.04s · generate 1.21s · llm 1.18s · total 1.27s"""
+    parts = [f"{name.split('.')[-1]} {seconds:.2f}s" for name, seconds in breakdown.items()
+             if name != "total" and seconds is not None]
+    return " · ".join(parts + [f"total {breakdown['total']:.2f}s"])
+
+# Process-wide instance used by every module
+telemetry = Telemetry()